@@ -1,5 +1,7 @@
+import asyncio
 import os
-from modules.funciones import leer_csv
+from modules.funciones import leer_csv, leer_texto
+from modules.catalogo import Catalogo
 from modules.ia import generar_respuesta
 
 # -----------------------------
@@ -13,16 +15,21 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 general = leer_csv(os.path.join(BASE_DIR, "data", "general.csv"))
 carreras = leer_csv(os.path.join(BASE_DIR, "data", "carreras.csv"))
 materias = leer_csv(os.path.join(BASE_DIR, "data", "materias.csv"))
+informe = leer_texto(os.path.join(BASE_DIR, "data", "informe_institucional.txt"))
+catalogo = Catalogo(general, carreras, materias, informe, directorio=os.path.join(BASE_DIR, "data"))
 
 # -----------------------------
 # Chat en consola
 # -----------------------------
-print("AulaBot: ¡Hola! Soy tu asistente educativo. Escribe 'salir' para terminar la conversación.")
+async def chat_consola():
+    print("AulaBot: ¡Hola! Soy tu asistente educativo. Escribe 'salir' para terminar la conversación.")
 
-while True:
-    mensaje = input("Tú: ")
-    if mensaje.lower() == "salir":
-        print("AulaBot: ¡Hasta luego!")
-        break
-    respuesta = generar_respuesta(mensaje, general, carreras, materias)
-    print(f"AulaBot: {respuesta}")
+    while True:
+        mensaje = await asyncio.to_thread(input, "Tú: ")
+        if mensaje.lower() == "salir":
+            print("AulaBot: ¡Hasta luego!")
+            break
+        respuesta = await generar_respuesta(mensaje, "consola", catalogo)
+        print(f"AulaBot: {respuesta}")
+
+asyncio.run(chat_consola())
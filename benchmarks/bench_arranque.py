@@ -0,0 +1,133 @@
+"""
+Arranque de un worker: tiempo de `import main`, hasta quedar listo (lifespan:
+catálogo + calentamiento, lo que espera /readyz), latencia de los primeros
+mensajes de un alumno y memoria residente del proceso.
+
+Cada escenario corre en un proceso nuevo (como un worker de uvicorn recién
+creado) y se repite varias veces; se reporta la mediana.
+  - antes:     CSV + índice BM25 construido al arrancar, con google.generativeai,
+               thefuzz y numpy importados de entrada (como hacía modules/ia.py)
+  - despues:   data/catalogo.snap por mmap y librerías importadas al primer uso
+  - calentado: como despues, más el calentamiento (modules/arranque.py)
+  - gemini:    como calentado, con GEMINI_API_KEY (configuración de producción):
+               el SDK se importa en el arranque, en un hilo, no en `import main`
+               (clave falsa y sin la llamada de prueba: no sale a la red)
+
+Uso:
+    python -m benchmarks.bench_arranque [--repeticiones 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from modules.recarga import compilar_snapshot
+
+_HIJO = r"""
+import json, os, sys, time
+sys.path.insert(0, {raiz!r})
+os.chdir({raiz!r})
+inicio = time.perf_counter()
+for modulo in {previos!r}:
+    try:
+        __import__(modulo)
+    except ImportError:
+        pass
+import main
+segundos = time.perf_counter() - inicio
+
+import asyncio
+from modules.ia import fijar_sin_llm, generar_respuesta
+
+async def _arrancar():
+    async with main.lifespan(main.app):
+        while not main.calentamiento.listo:
+            await asyncio.sleep(0.001)
+        listo = time.perf_counter() - inicio
+        fijar_sin_llm()  # se mide la cascada, no el LLM (gemini: la clave es falsa)
+        tiempos = []
+        for mensaje in ("hola", "Ana", "materias de sistemas", "3", "mision"):
+            t = time.perf_counter()
+            await generar_respuesta(mensaje, "alumno", main.vigilante.actual)
+            tiempos.append(time.perf_counter() - t)
+        return listo, tiempos
+
+listo, tiempos = asyncio.run(_arrancar())
+
+def _kb(archivo, campos):
+    total = 0
+    try:
+        with open(archivo) as f:
+            for linea in f:
+                nombre, _, valor = linea.partition(":")
+                if nombre in campos:
+                    total += int(valor.split()[0])
+    except OSError:
+        return None
+    return total
+
+print(json.dumps({{
+    "segundos": segundos,
+    "listo": listo,
+    "primero": tiempos[0],
+    "mensajes": sum(tiempos),
+    "rss_kb": _kb("/proc/self/status", ("VmRSS",)),
+    "privada_kb": _kb("/proc/self/smaps_rollup", ("Private_Clean", "Private_Dirty")),
+    "con_snapshot": any(type(f).__name__ == "FilaSnapshot" for f in main.vigilante.actual.general[:1]),
+}}))
+"""
+
+ESCENARIOS = {
+    "antes": ({"AULABOT_SNAPSHOT": "0", "AULABOT_CALENTAR": "0"}, ["google.generativeai", "thefuzz.process", "numpy"]),
+    "despues": ({"AULABOT_SNAPSHOT": "1", "AULABOT_CALENTAR": "0"}, []),
+    "calentado": ({"AULABOT_SNAPSHOT": "1", "AULABOT_CALENTAR": "1"}, []),
+    "gemini": ({"AULABOT_SNAPSHOT": "1", "AULABOT_CALENTAR": "1", "AULABOT_CALENTAR_LLM": "0",
+                "GEMINI_API_KEY": "clave-falsa"}, []),
+}
+
+
+def medir(nombre, repeticiones):
+    extra, previos = ESCENARIOS[nombre]
+    entorno = {k: v for k, v in os.environ.items()
+               if k not in ("GEMINI_API_KEY", "AULABOT_LLM_URL", "AULABOT_LLM_FALSO")}
+    entorno.update(extra)
+    codigo = _HIJO.format(raiz=RAIZ, previos=previos)
+    resultados = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", codigo], env=entorno, capture_output=True, text=True, check=True)
+        resultados.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+    return {
+        "segundos": statistics.median(r["segundos"] for r in resultados),
+        "listo": statistics.median(r["listo"] for r in resultados),
+        "primero": statistics.median(r["primero"] for r in resultados),
+        "mensajes": statistics.median(r["mensajes"] for r in resultados),
+        "rss_kb": statistics.median(r["rss_kb"] or 0 for r in resultados),
+        "privada_kb": statistics.median(r["privada_kb"] or 0 for r in resultados),
+        "con_snapshot": resultados[-1]["con_snapshot"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    ruta = compilar_snapshot(os.path.join(RAIZ, "data"))
+    print(f"Snapshot: {ruta} ({os.path.getsize(ruta)} bytes)\n")
+
+    print(f"{'escenario':<10} {'import main':>12} {'listo':>10} {'1er msj':>10} {'5 msjs':>10} "
+          f"{'RSS':>10} {'privada':>10}  snapshot")
+    for nombre in ESCENARIOS:
+        r = medir(nombre, args.repeticiones)
+        print(f"{nombre:<10} {r['segundos'] * 1000:>10.1f}ms {r['listo'] * 1000:>8.1f}ms "
+              f"{r['primero'] * 1000:>8.2f}ms {r['mensajes'] * 1000:>8.2f}ms {r['rss_kb'] / 1024:>8.1f}MB "
+              f"{r['privada_kb'] / 1024:>8.1f}MB  {'sí' if r['con_snapshot'] else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Varios campus en un proceso: 50 campus sintéticos (copias de data/ con
+carreras, claves y materias renombradas, y su propio sinonimos.json) servidos
+desde un RegistroCampus con distintos topes de campus cargados.
+
+Las peticiones siguen una distribución Zipf (pocos campus concentran el
+tráfico, como en la realidad) y cada una hace el trabajo que depende del
+campus: detección de intención/carrera con sus sinónimos, paso 8 de materia,
+búsqueda BM25, la lista de carreras renderizada, la búsqueda en lo aprendido
+del campus (cada uno trae un aprendido.json de --aprendidas preguntas) y, una
+de cada diez, una pregunta sin respuesta. Cada escenario corre en un proceso
+nuevo y reporta:
+  - cargas / descargas y latencia de obtener() en frío (carga) y en caliente
+  - almacenes de lo aprendido vivos e hilos escritores de preguntas sin
+    respuesta al final (deben seguir al tope de campus cargados, no al total)
+  - RSS al final y en el pico; con --tracemalloc también la memoria de Python
+    (mucho más lento: tracemalloc encarece cada carga)
+
+Cada campus lleva su catalogo.snap compilado (como en producción); con
+--sin-snapshot se cargan desde los CSV.
+
+Uso:
+    python -m benchmarks.bench_campus [--campus 50] [--peticiones 5000] [--topes 50,16,8] [--aprendidas 2000]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+MENSAJES = ["que carreras hay", "materias de sistemas", "jefe de industrial", "hay becas",
+            "calculo diferencial", "info de mecatronica", "cuanto cuesta la inscripcion",
+            "programacion orientada a objetos", "que es bioquimica", "horario de la biblioteca"]
+
+
+# -----------------------------
+# Campus sintéticos
+# -----------------------------
+def _reescribir_csv(origen, destino, cambiar):
+    with open(origen, newline="", encoding="utf-8") as f:
+        lector = csv.DictReader(f)
+        campos = lector.fieldnames
+        filas = [cambiar(dict(fila)) for fila in lector]
+    with open(destino, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=campos)
+        escritor.writeheader()
+        escritor.writerows(filas)
+
+
+def _aprendido(destino, n, sufijo):
+    preguntas = {f"¿{MENSAJES[i % len(MENSAJES)]} {i}{sufijo}?": f"Respuesta {i}{sufijo}." for i in range(n)}
+    with open(os.path.join(destino, "aprendido.json"), "w", encoding="utf-8") as f:
+        json.dump(preguntas, f, ensure_ascii=False)
+
+
+def generar_campus(directorio, cantidad, snapshot=True, aprendidas=0):
+    from modules.recarga import compilar_snapshot
+    from modules.sinonimos import INTENCIONES, SINONIMOS_CARRERAS
+
+    data = os.path.join(RAIZ, "data")
+    for archivo in ("general.csv", "carreras.csv", "materias.csv", "informe_institucional.txt"):
+        shutil.copy(os.path.join(data, archivo), directorio)
+    for n in range(cantidad):
+        sufijo = f" C{n:02d}"
+        destino = os.path.join(directorio, "campus", f"c{n:02d}")
+        os.makedirs(destino)
+        shutil.copy(os.path.join(data, "informe_institucional.txt"), destino)
+        shutil.copy(os.path.join(data, "general.csv"), destino)
+
+        def carrera(fila):
+            fila["nombre"] += sufijo
+            fila["clave"] += f"-{n:02d}"
+            return fila
+
+        def materia(fila):
+            fila["carrera"] = (fila.get("carrera") or "") + sufijo
+            fila["materia"] = (fila.get("materia") or "") + sufijo
+            return fila
+
+        _reescribir_csv(os.path.join(data, "carreras.csv"), os.path.join(destino, "carreras.csv"), carrera)
+        _reescribir_csv(os.path.join(data, "materias.csv"), os.path.join(destino, "materias.csv"), materia)
+        sinonimos = {
+            "intenciones": INTENCIONES,
+            "carreras": {nombre + sufijo: lista + [f"campus{n:02d}"] for nombre, lista in SINONIMOS_CARRERAS.items()},
+        }
+        with open(os.path.join(destino, "sinonimos.json"), "w", encoding="utf-8") as f:
+            json.dump(sinonimos, f, ensure_ascii=False)
+        if aprendidas:
+            _aprendido(destino, aprendidas, sufijo)
+        if snapshot:
+            compilar_snapshot(destino)
+    if snapshot:
+        compilar_snapshot(directorio)
+
+
+# -----------------------------
+# Un escenario (proceso hijo)
+# -----------------------------
+def _rss_kb(campo="VmRSS"):
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith(campo + ":"):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def _escenario(directorio, campus, peticiones, max_cargados, semilla, medir_python):
+    from modules.campus import RegistroCampus
+    from modules.funciones import _almacenes, cache_render, listar_carreras
+    from modules.normalizacion import limpiar_texto
+
+    registro = RegistroCampus(directorio, max_cargados=max_cargados, ttl=0, intervalo=0)
+    if medir_python:
+        tracemalloc.start()
+    base_rss = _rss_kb()
+
+    azar = random.Random(semilla)
+    ids = [f"c{n:02d}" for n in range(campus)]
+    pesos = [1 / (i + 1) ** 1.1 for i in range(campus)]
+    frio, caliente = [], []
+    inicio = time.perf_counter()
+    for _ in range(peticiones):
+        id_campus = azar.choices(ids, pesos)[0]
+        cargas = registro.cargas
+        t = time.perf_counter()
+        catalogo = await registro.obtener(id_campus)
+        (frio if registro.cargas != cargas else caliente).append(time.perf_counter() - t)
+
+        mensaje = limpiar_texto(azar.choice(MENSAJES))
+        _, carrera = catalogo.detector.detectar(mensaje)
+        catalogo.mejor_materia(carrera or catalogo.carreras[0]["nombre"], mensaje)
+        catalogo.indice.buscar(mensaje)
+        listar_carreras(catalogo)
+        catalogo.conocimiento.buscar(mensaje)
+        if azar.random() < 0.1:
+            catalogo.ignorancia.registrar(mensaje)
+    total = time.perf_counter() - inicio
+    time.sleep(0.2)  # los hilos de los campus descargados hacen su último vaciado y salen
+
+    actual_py, pico_py = tracemalloc.get_traced_memory() if medir_python else (None, None)
+    return {
+        "max_cargados": max_cargados,
+        "peticiones_s": round(peticiones / total),
+        "cargas": registro.cargas,
+        "descargas": registro.descargas,
+        "cargados_al_final": len(registro.estado()["cargados"]),
+        "obtener_frio_ms": round(statistics.median(frio) * 1000, 2) if frio else None,
+        "obtener_caliente_us": round(statistics.median(caliente) * 1e6, 2) if caliente else None,
+        "py_final_mb": round(actual_py / 2**20, 1) if medir_python else None,
+        "py_pico_mb": round(pico_py / 2**20, 1) if medir_python else None,
+        "rss_final_mb": round((_rss_kb() - base_rss) / 1024, 1) if base_rss else None,
+        "rss_pico_mb": round(_rss_kb("VmHWM") / 1024, 1) if base_rss else None,
+        "cache_render": cache_render.estadisticas()["entradas"],
+        # Incluye los del campus por defecto
+        "almacenes": len(_almacenes),
+        "hilos_ignorancia": sum(h.name == "aulabot-ignorancia" for h in threading.enumerate()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campus", type=int, default=50)
+    parser.add_argument("--peticiones", type=int, default=5000)
+    parser.add_argument("--topes", default="50,16,8")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--tracemalloc", action="store_true")
+    parser.add_argument("--sin-snapshot", action="store_true")
+    parser.add_argument("--aprendidas", type=int, default=2000, help="preguntas en el aprendido.json de cada campus")
+    parser.add_argument("--hijo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        directorio, tope = args.hijo.rsplit(":", 1)
+        resultado = asyncio.run(_escenario(directorio, args.campus, args.peticiones, int(tope), args.semilla,
+                                           args.tracemalloc))
+        print(json.dumps(resultado))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="aulabot-campus-") as directorio:
+        inicio = time.perf_counter()
+        generar_campus(directorio, args.campus, snapshot=not args.sin_snapshot, aprendidas=args.aprendidas)
+        print(f"{args.campus} campus generados en {time.perf_counter() - inicio:.1f} s "
+              f"({args.peticiones} peticiones Zipf por escenario)\n")
+
+        entorno = {**os.environ, "AULABOT_SNAPSHOT": "0" if args.sin_snapshot else "1"}
+        opciones = ["--tracemalloc"] if args.tracemalloc else []
+        columnas = ("max_cargados", "peticiones_s", "cargas", "descargas", "cargados_al_final",
+                    "obtener_frio_ms", "obtener_caliente_us", "py_final_mb", "py_pico_mb",
+                    "rss_final_mb", "rss_pico_mb", "cache_render", "almacenes", "hilos_ignorancia")
+        print("  ".join(f"{c:>12}" for c in columnas))
+        for tope in args.topes.split(","):
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_campus", "--campus", str(args.campus),
+                 "--peticiones", str(args.peticiones), "--semilla", str(args.semilla),
+                 "--hijo", f"{directorio}:{tope}", *opciones],
+                cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True,
+            )
+            resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+            print("  ".join(f"{str(resultado[c]):>12}" for c in columnas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Carga y regresión del flujo de chat completo.
+
+Simula sesiones de varios turnos (nombre, carrera, filtro por semestre,
+afirmaciones, preguntas institucionales y generales) contra:
+  - directo: generar_respuesta() en el mismo proceso
+  - http:    POST /chat (la app en proceso vía ASGI, o un servidor con --url)
+
+El LLM es BackendFalso (determinista, latencia configurable) y los textos
+aleatorios usan una semilla fija. Reporta rendimiento, latencias p50/p95/p99,
+memoria asignada por petición y por sesión, y qué etapa respondió. El
+resultado se guarda en JSON para comparar entre commits:
+
+    python -m benchmarks.bench_carga --salida antes.json
+    git checkout otra-rama
+    python -m benchmarks.bench_carga --salida despues.json --comparar antes.json
+
+El bot corre sobre una copia de data/ en un directorio temporal (solo el
+catálogo, sin lo aprendido): lo que escribe (aprendido.*, preguntas sin
+respuesta) no toca data/ y cada corrida empieza igual.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+CARRERAS = ["sistemas", "industrial", "mecatronica", "bioquimica", "gestion empresarial",
+            "nanotecnologia", "innovacion agricola", "tics", "animacion", "automotrices"]
+INSTITUCIONALES = ["cual es la mision", "cuanto cuesta la inscripcion", "requisitos de titulacion",
+                   "hay becas", "historia del tecnologico", "donde esta la cafeteria",
+                   "que deportes hay", "cual es el reglamento"]
+GENERALES = ["que es la fotosintesis", "quien escribio el quijote", "como funciona un motor electrico",
+             "que es un agujero negro", "para que sirve el algebra lineal", "que es la inflacion"]
+NOMBRES = ["Ana", "Luis", "María", "Jorge", "Sofía", "Pedro", "Lucía", "Diego"]
+
+# Métricas que se comparan con --comparar (True = más alto es mejor)
+COMPARABLES = {
+    "directo.mensajes_por_s": True,
+    "directo.latencia_ms.p50": False,
+    "directo.latencia_ms.p95": False,
+    "directo.latencia_ms.p99": False,
+    "http.mensajes_por_s": True,
+    "http.latencia_ms.p50": False,
+    "http.latencia_ms.p99": False,
+    "asignaciones.pico_kb_por_peticion": False,
+    "memoria.bytes_por_sesion": False,
+}
+
+
+def guion_sesion(azar):
+    """Turnos de una sesión realista (determinista para una semilla dada)."""
+    carrera, otra = azar.sample(CARRERAS, 2)
+    semestres = azar.sample(range(1, 10), 2)
+    return [
+        "hola",
+        azar.choice(NOMBRES),
+        "que carreras hay",
+        f"materias de {carrera}",
+        str(semestres[0]),
+        f"semestre {semestres[1]}",
+        "no",
+        f"quiero saber de {otra}",
+        "si",
+        azar.choice(INSTITUCIONALES),
+        azar.choice(INSTITUCIONALES),
+        f"quien es el jefe de {carrera}",
+        azar.choice(GENERALES),
+    ]
+
+
+def percentiles(valores):
+    if len(valores) < 2:
+        v = valores[0] if valores else 0.0
+        return {"p50": v, "p95": v, "p99": v, "max": v}
+    cortes = statistics.quantiles(valores, n=100, method="inclusive")
+    return {"p50": cortes[49], "p95": cortes[94], "p99": cortes[98], "max": max(valores)}
+
+
+async def correr_sesiones(enviar, guiones, concurrencia, prefijo):
+    """Cada sesión avanza turno por turno; hasta `concurrencia` sesiones a la vez."""
+    latencias = []
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def sesion(i, turnos):
+        async with semaforo:
+            for mensaje in turnos:
+                inicio = time.perf_counter()
+                await enviar(mensaje, f"{prefijo}_{i}")
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(sesion(i, t) for i, t in enumerate(guiones)))
+    total = time.perf_counter() - inicio
+    return {
+        "mensajes": len(latencias),
+        "segundos": total,
+        "mensajes_por_s": len(latencias) / total if total else 0.0,
+        "latencia_ms": percentiles(latencias),
+    }
+
+
+async def medir_asignaciones(generar_respuesta, catalogo, guiones):
+    """Pico de memoria asignada por petición y memoria que queda retenida (tracemalloc)."""
+    picos, retenidos = [], []
+    tracemalloc.start()
+    for i, turnos in enumerate(guiones):
+        for mensaje in turnos:
+            antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await generar_respuesta(mensaje, f"asig_{i}", catalogo)
+            actual, pico = tracemalloc.get_traced_memory()
+            picos.append(pico - antes)
+            retenidos.append(actual - antes)
+    tracemalloc.stop()
+    return {
+        "peticiones": len(picos),
+        "pico_kb_por_peticion": statistics.mean(picos) / 1024,
+        "pico_kb_p95": percentiles(picos)["p95"] / 1024,
+        "retenido_bytes_por_peticion": statistics.mean(retenidos),
+    }
+
+
+async def medir_sesiones(generar_respuesta, catalogo, n):
+    """Bytes por sesión guardada (saludo + nombre; mismos textos para no llenar cachés)."""
+    for mensaje in ("hola", "Ana"):
+        await generar_respuesta(mensaje, "calentamiento", catalogo)
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    for i in range(n):
+        await generar_respuesta("hola", f"mem_{i}", catalogo)
+        await generar_respuesta("Ana", f"mem_{i}", catalogo)
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"sesiones": n, "bytes_por_sesion": (despues - antes) / n}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _valor(resultado, ruta):
+    for parte in ruta.split("."):
+        if not isinstance(resultado, dict) or parte not in resultado:
+            return None
+        resultado = resultado[parte]
+    return resultado
+
+
+def comparar(actual, base, tolerancia):
+    """Imprime las diferencias contra `base`; devuelve las métricas que empeoraron más que `tolerancia`."""
+    print(f"\nComparación contra {base.get('commit') or 'base'} (tolerancia {tolerancia:.0%}):")
+    peores = []
+    for ruta, mayor_es_mejor in COMPARABLES.items():
+        nuevo, viejo = _valor(actual, ruta), _valor(base, ruta)
+        if nuevo is None or viejo in (None, 0):
+            continue
+        cambio = (nuevo - viejo) / viejo
+        empeora = -cambio if mayor_es_mejor else cambio
+        marca = "  ⚠️" if empeora > tolerancia else ""
+        print(f"  {ruta:<38} {viejo:>12.2f} -> {nuevo:>12.2f}  ({cambio:+.1%}){marca}")
+        if empeora > tolerancia:
+            peores.append(ruta)
+    return peores
+
+
+def copiar_datos(destino):
+    """Copia el catálogo de data/ (con mtimes: el snapshot sigue vigente) sin lo aprendido ni los campus."""
+    datos = os.path.join(destino, "data")
+    shutil.copytree(os.path.join(RAIZ, "data"), datos, ignore=shutil.ignore_patterns(
+        "aprendido.*", "preguntas_sin_respuesta.*", "*.lock", "*.tmp", "campus"))
+    return datos
+
+
+async def ejecutar(args, datos):
+    import modules.metricas as metricas
+    from modules.ia import generar_respuesta
+    from modules.recarga import cargar_catalogo
+
+    catalogo = cargar_catalogo(datos)
+    azar = random.Random(args.semilla)
+    guiones = [guion_sesion(azar) for _ in range(args.sesiones)]
+    resultado = {}
+
+    random.seed(args.semilla)
+    etapas_antes = dict(metricas.respuestas._valores)
+
+    async def directo(mensaje, user_id):
+        return await generar_respuesta(mensaje, user_id, catalogo)
+
+    resultado["directo"] = await correr_sesiones(directo, guiones, args.concurrencia, "directo")
+    resultado["etapas"] = {
+        llave[0]: valor - etapas_antes.get(llave, 0)
+        for llave, valor in sorted(metricas.respuestas._valores.items())
+        if valor - etapas_antes.get(llave, 0)
+    }
+
+    if not args.sin_http:
+        import httpx
+        if args.url:
+            cliente = httpx.AsyncClient(base_url=args.url, timeout=60)
+            arranque = contextlib.nullcontext()
+        else:
+            import main
+            main.DATA_DIR = datos  # la app en proceso también usa la copia
+            cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=60)
+            arranque = main.lifespan(main.app)  # ASGITransport no corre el lifespan (carga del catálogo)
+        async with arranque, cliente:
+            async def http(mensaje, user_id):
+                r = await cliente.post("/chat", json={"usuario_id": user_id, "mensaje": mensaje})
+                r.raise_for_status()
+            resultado["http"] = await correr_sesiones(http, guiones, args.concurrencia, "http")
+
+    resultado["asignaciones"] = await medir_asignaciones(generar_respuesta, catalogo, guiones[:args.sesiones_asignaciones])
+    resultado["memoria"] = await medir_sesiones(generar_respuesta, catalogo, args.sesiones_memoria)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sesiones", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--latencia-llm", type=float, default=0.05, help="segundos del LLM falso")
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--almacen", default="memoria", help="AULABOT_SESIONES (ej. sqlite:/tmp/s.db)")
+    parser.add_argument("--url", help="servidor ya levantado; si no, la app corre en proceso")
+    parser.add_argument("--sin-http", action="store_true")
+    parser.add_argument("--sesiones-asignaciones", type=int, default=20)
+    parser.add_argument("--sesiones-memoria", type=int, default=5000)
+    parser.add_argument("--salida", help="archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    parser.add_argument("--con-admision", action="store_true",
+                        help="mantener los límites de llamadas al LLM (por defecto se desactivan)")
+    args = parser.parse_args()
+
+    # Antes de importar modules.*: el almacén se crea al importar (y el gateway lee el entorno)
+    os.environ["AULABOT_LLM_FALSO"] = str(args.latencia_llm)
+    os.environ["AULABOT_SESIONES"] = args.almacen
+    os.environ.setdefault("AULABOT_RECARGA_INTERVALO", "0")
+    if not args.con_admision:
+        # Se mide el flujo, no el control de admisión (0 = sin límite)
+        os.environ.setdefault("AULABOT_LLM_RAFAGA", "0")
+        os.environ.setdefault("AULABOT_LLM_RAFAGA_USUARIO", "0")
+        os.environ.setdefault("AULABOT_LLM_MAX_COLA", str(10 ** 9))
+    salida = os.path.abspath(args.salida) if args.salida else None
+    base = os.path.abspath(args.comparar) if args.comparar else None
+    temporal = tempfile.mkdtemp(prefix="aulabot_bench_")
+    os.chdir(temporal)
+    datos = copiar_datos(temporal)
+
+    resultado = {
+        "commit": _commit(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("salida", "comparar")},
+        **asyncio.run(ejecutar(args, datos)),
+    }
+
+    for modo in ("directo", "http"):
+        if modo in resultado:
+            r = resultado[modo]
+            lat = r["latencia_ms"]
+            print(f"{modo:<8} {r['mensajes']:>6} msgs  {r['mensajes_por_s']:>8.1f} msg/s  "
+                  f"p50 {lat['p50']:.2f}ms  p95 {lat['p95']:.2f}ms  p99 {lat['p99']:.2f}ms")
+    a = resultado["asignaciones"]
+    print(f"asignación: pico {a['pico_kb_por_peticion']:.1f} KB/petición (p95 {a['pico_kb_p95']:.1f} KB), "
+          f"retenido {a['retenido_bytes_por_peticion']:.0f} B/petición")
+    print(f"memoria:    {resultado['memoria']['bytes_por_sesion']:.0f} B/sesión")
+    print("etapas:     " + ", ".join(f"{k}={v}" for k, v in resultado["etapas"].items()))
+
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados en {salida}")
+
+    if base:
+        with open(base, encoding="utf-8") as f:
+            peores = comparar(resultado, json.load(f), args.tolerancia)
+        if peores:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Micro-benchmark del detector de intenciones/carreras.
+
+Compara detectar_mejor_coincidencia() (referencia) contra DetectorCoincidencias
+sobre un corpus de regresión y verifica que el top-1 sea idéntico.
+
+Uso:
+    python -m benchmarks.bench_coincidencias [--repeticiones 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thefuzz import fuzz, process
+
+from modules.funciones import leer_csv
+from modules.normalizacion import limpiar_texto
+from modules.sinonimos import INTENCIONES, SINONIMOS_CARRERAS
+from modules.coincidencias import DetectorCoincidencias
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FRASES = [
+    "hola", "Hola, buenos días", "¿qué carreras tienen?", "materias de sistemas",
+    "quiero ver la reticula de industrial", "¿Cuánto cuesta la ficha?", "dónde están ubicados",
+    "jefe de division de mecatronica", "quien es el jefe de sistemas", "si", "no gracias",
+    "sí por favor", "becas", "servicio social", "que sabes hacer", "mision y vision",
+    "deportes y cafeteria", "me interesa la robotica", "carrera de animacion 3d",
+    "plan de estudios de bioquimica", "ok", "reiniciar", "Ana María", "3", "quinto semestre",
+    "que es la nanotecnologia", "informacion de gestion empresarial", "tics redes",
+    "automotriz", "cual es el reglamento", "¿?", "🙂", "",
+]
+
+
+def detectar_mejor_coincidencia(texto_usuario, diccionario):
+    """Versión de referencia (sin precálculo), como la tenía modules/ia.py."""
+    texto_usuario = limpiar_texto(texto_usuario)
+    mejor_opcion, mejor_score = None, 0
+    for clave, sinonimos in diccionario.items():
+        match, score = process.extractOne(texto_usuario, sinonimos, scorer=fuzz.token_set_ratio)
+        if score > mejor_score:
+            mejor_score = score
+            mejor_opcion = clave
+    return mejor_opcion if mejor_score >= 70 else None
+
+
+def _con_errores(texto, rng):
+    """Introduce un error de dedo (borrar, duplicar o intercambiar una letra)."""
+    if len(texto) < 3:
+        return texto
+    i = rng.randrange(1, len(texto) - 1)
+    op = rng.choice(("borrar", "duplicar", "intercambiar"))
+    if op == "borrar":
+        return texto[:i] + texto[i + 1:]
+    if op == "duplicar":
+        return texto[:i] + texto[i] + texto[i:]
+    return texto[:i - 1] + texto[i] + texto[i - 1] + texto[i + 1:]
+
+
+def construir_corpus(semilla=0):
+    rng = random.Random(semilla)
+    corpus = list(FRASES)
+    for sinonimos in list(INTENCIONES.values()) + list(SINONIMOS_CARRERAS.values()):
+        corpus.extend(sinonimos)
+    corpus.extend(SINONIMOS_CARRERAS)
+    corpus.extend(f["palabra_clave"] for f in leer_csv(os.path.join(BASE_DIR, "data", "general.csv")))
+    corpus.extend(f["materia"] for f in leer_csv(os.path.join(BASE_DIR, "data", "materias.csv"))[:80])
+    corpus.extend(_con_errores(t, rng) for t in list(corpus))
+    corpus.extend(f"{rng.choice(FRASES)} {rng.choice(corpus)}" for _ in range(200))
+    return [limpiar_texto(t) for t in corpus]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = construir_corpus()
+    detector = DetectorCoincidencias(INTENCIONES, SINONIMOS_CARRERAS)
+
+    # 1. Regresión: mismo top-1 que la implementación original
+    diferencias = []
+    for mensaje in corpus:
+        esperado = (detectar_mejor_coincidencia(mensaje, INTENCIONES), detectar_mejor_coincidencia(mensaje, SINONIMOS_CARRERAS))
+        obtenido = tuple(detector._detectar(mensaje))
+        if esperado != obtenido:
+            diferencias.append((mensaje, esperado, obtenido))
+    por_lote = DetectorCoincidencias(INTENCIONES, SINONIMOS_CARRERAS).match_many(corpus)
+    diferencias += [(m, detector._detectar(m), d) for m, d in zip(corpus, por_lote) if d != detector._detectar(m)]
+    print(f"Corpus: {len(corpus)} mensajes, diferencias de top-1: {len(diferencias)}")
+    for mensaje, esperado, obtenido in diferencias[:10]:
+        print(f"  {mensaje!r}: referencia={esperado} detector={obtenido}")
+
+    # 2. Tiempo por mensaje (sin caché, y con caché caliente)
+    def medir(funcion):
+        mejor = float("inf")
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            for mensaje in corpus:
+                funcion(mensaje)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor / len(corpus) * 1e6
+
+    referencia = medir(lambda m: (detectar_mejor_coincidencia(m, INTENCIONES), detectar_mejor_coincidencia(m, SINONIMOS_CARRERAS)))
+    sin_cache = medir(detector._detectar)
+
+    # Lote (cdist): detector nuevo en cada repetición para no medir la caché
+    lote = float("inf")
+    for _ in range(args.repeticiones):
+        en_lote = DetectorCoincidencias(INTENCIONES, SINONIMOS_CARRERAS)
+        inicio = time.perf_counter()
+        en_lote.match_many(corpus)
+        lote = min(lote, time.perf_counter() - inicio)
+    lote = lote / len(corpus) * 1e6
+    detector.match_many(corpus)
+    con_cache = medir(detector.detectar)
+
+    print(f"Referencia (thefuzz x2):  {referencia:8.1f} µs/mensaje")
+    print(f"Detector sin caché:       {sin_cache:8.1f} µs/mensaje  ({referencia / sin_cache:.1f}x)")
+    print(f"Detector por lote:        {lote:8.1f} µs/mensaje  ({referencia / lote:.1f}x)")
+    print(f"Detector con caché:       {con_cache:8.1f} µs/mensaje  ({referencia / con_cache:.1f}x)")
+    return 1 if diferencias else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Depuración del conocimiento aprendido a escala: N preguntas sintéticas
+(100k por defecto) generadas a partir de preguntas base con variantes
+realistas (acentos, signos, artículos, orden, erratas, plural).
+
+Como se sabe de qué base salió cada variante, se reporta la calidad del
+agrupamiento por pares (precisión y exhaustividad), además de:
+  - tiempo por fase, comparaciones hechas y memoria pico (tracemalloc)
+  - tamaño del almacén antes y después
+  - el todos-contra-todos (n²) medido en una muestra y extrapolado a N
+  - costo de una búsqueda del paso 2 (KnowledgeStore.buscar) antes y después
+  - preguntas que quedan vacías al normalizar ("¿Es la?", "por favor"): van
+    mezcladas en los datos y, aparte, como última forma de un bloque de MinHash
+  - que un worker con la vista de antes de la depuración no devuelva los
+    duplicados al compactar después de reemplazar()
+
+Uso:
+    python -m benchmarks.bench_depuracion [--entradas 100000] [--muestra 2000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.conocimiento import KnowledgeStore
+from modules.depuracion import UMBRAL_FUSION, _parecidas, agrupar, depurar, depurar_archivo, forma_normalizada
+
+INTERROGATIVAS = ["cuánto cuesta", "cuándo es", "dónde se tramita", "quién atiende", "qué requisitos tiene",
+                  "cómo pago", "hasta cuándo hay", "qué horario tiene"]
+OBJETOS = ["la ficha", "la inscripción", "el examen de admisión", "la beca", "la credencial", "el seguro",
+           "la constancia", "el kárdex", "la titulación", "la residencia", "el servicio social", "la baja temporal",
+           "la reinscripción", "el curso de verano", "la convalidación", "el certificado", "la biblioteca",
+           "la cafetería", "el laboratorio", "el centro de idiomas", "la tutoría", "la movilidad", "el estacionamiento",
+           "el gimnasio", "la enfermería", "la caja", "el departamento escolar", "la extraescolar", "el uniforme",
+           "la graduación"]
+CALIFICATIVOS = ["", "de inglés", "de sistemas", "de industrial", "de mecatrónica", "de bioquímica",
+                 "de gestión empresarial", "del semestre 3", "del semestre 7", "en línea", "para foráneos",
+                 "de nuevo ingreso", "de posgrado", "en vacaciones", "del turno vespertino", "de la extensión"]
+# Solo relleno y signos: su forma normalizada es "" (todas son el mismo grupo)
+VACIAS = ["¿Es la?", "por favor", "???", "¿Y el?", "Oye, porfa", "¡Es de la!", "de los", "..."]
+
+
+def _errata(azar, texto):
+    i = azar.randrange(len(texto))
+    if not texto[i].isalpha():
+        return texto
+    return texto[:i] + azar.choice("abcdefghijklmnopqrstuvwxyz") + texto[i + 1:]
+
+
+def _variante(azar, base):
+    texto = base
+    if azar.random() < 0.5:
+        texto = texto.replace("á", "a").replace("é", "e").replace("í", "i").replace("ó", "o").replace("ú", "u")
+    if azar.random() < 0.3:
+        texto = texto.replace(" la ", " ").replace(" el ", " ")
+    if azar.random() < 0.2:
+        palabras = texto.split()
+        corte = azar.randrange(1, len(palabras))
+        texto = " ".join(palabras[corte:] + palabras[:corte])
+    if azar.random() < 0.25:
+        texto = _errata(azar, texto)
+    if azar.random() < 0.5:
+        texto = azar.choice(["¿", "", "oye ", "porfa "]) + texto + azar.choice(["?", "??", "", " porfavor", "!"])
+    if azar.random() < 0.3:
+        texto = texto.capitalize()
+    return texto
+
+
+def generar(entradas, semilla):
+    azar = random.Random(semilla)
+    bases = [" ".join(p for p in (i, o, c) if p) for i in INTERROGATIVAS for o in OBJETOS for c in CALIFICATIVOS]
+    azar.shuffle(bases)
+    datos, origen = {}, {}
+    while len(datos) < entradas:
+        k = min(int(azar.paretovariate(1.2)) - 1, len(bases) - 1)  # pocas bases muy repetidas
+        k = azar.randrange(len(bases)) if azar.random() < 0.6 else k
+        pregunta = _variante(azar, bases[k])
+        if pregunta not in datos:
+            datos[pregunta] = f"Respuesta sobre {bases[k]}." + (" (ampliada)" if azar.random() < 0.1 else "")
+            origen[pregunta] = k
+    for pregunta in VACIAS:
+        datos[pregunta] = "No entendí la pregunta."
+        origen[pregunta] = -1
+    return datos, origen, bases
+
+
+def verificar_reemplazo(datos):
+    """
+    Depura en su lugar mientras un worker tiene cargada la versión anterior
+    (intervalo_sync largo); ese worker aprende algo y compacta. Devuelve
+    (entradas esperadas, entradas finales).
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "aprendido.json")
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False)
+        worker = KnowledgeStore(ruta, intervalo_sync=3600)
+        worker.buscar("calentar")
+        depurar_archivo(ruta)
+        depuradas = len(KnowledgeStore(ruta).todo())
+        worker.agregar("¿hay estacionamiento para bicicletas?", "Sí, junto al edificio A.")
+        worker.compactar()
+        return depuradas + 1, len(KnowledgeStore(ruta).todo())
+
+
+def verificar_vacias():
+    """Una forma vacía al final (del bloque y de la lista) no rompe MinHash ni se une a otras."""
+    preguntas = ["¿Cuánto cuesta la ficha?", "cuanto cuesta ficha", "¿Dónde se tramita la beca?", *VACIAS]
+    grupos, _ = agrupar(preguntas)
+    vacias = {len(preguntas) - len(VACIAS) + i for i in range(len(VACIAS))}
+    return sorted(map(sorted, grupos)) == sorted([[0, 1], [2], sorted(vacias)])
+
+
+# -----------------------------
+# Calidad por pares
+# -----------------------------
+def _pares(conteos):
+    return sum(n * (n - 1) // 2 for n in conteos)
+
+
+def calidad(grupos, preguntas, origen):
+    verdaderos = _pares(Counter(origen[p] for p in preguntas).values())
+    predichos = sum(_pares([len(g)]) for g in grupos)
+    aciertos = sum(_pares(Counter(origen[preguntas[i]] for i in g).values()) for g in grupos)
+    return aciertos / predichos if predichos else 1.0, aciertos / verdaderos if verdaderos else 1.0
+
+
+def todos_contra_todos(preguntas, umbral):
+    formas = [forma_normalizada(p) for p in preguntas]
+    inicio = time.perf_counter()
+    for i in range(len(formas)):
+        for j in range(i + 1, len(formas)):
+            _parecidas(formas[i], formas[j], umbral)
+    return time.perf_counter() - inicio
+
+
+def _buscar_us(datos, consultas):
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "aprendido.json")
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False)
+        almacen = KnowledgeStore(ruta)
+        almacen.buscar("calentar")
+        inicio = time.perf_counter()
+        for c in consultas:
+            almacen.buscar(c)
+        return (time.perf_counter() - inicio) / len(consultas) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entradas", type=int, default=100_000)
+    parser.add_argument("--muestra", type=int, default=2000, help="tamaño para medir el n²")
+    parser.add_argument("--umbral", type=int, default=UMBRAL_FUSION)
+    parser.add_argument("--semilla", type=int, default=3)
+    args = parser.parse_args()
+
+    datos, origen, bases = generar(args.entradas, args.semilla)
+    preguntas = list(datos)
+    print(f"{len(datos)} preguntas aprendidas sintéticas ({len(bases)} preguntas base)\n")
+
+    compactado, est = depurar(datos, args.umbral)
+    for llave, valor in est.items():
+        print(f"  {llave:<28} {valor}")
+    # Segunda corrida solo para la memoria (tracemalloc vuelve lento todo lo demás)
+    tracemalloc.start()
+    depurar(datos, args.umbral)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {'memoria_pico_mb':<28} {pico / 2**20:.1f}")
+
+    grupos, _ = agrupar(preguntas, args.umbral)
+    precision, exhaustividad = calidad(grupos, preguntas, origen)
+    print(f"\nPares: precisión {precision:.3f}, exhaustividad {exhaustividad:.3f} "
+          f"(bases reales: {len(set(origen.values()))}, grupos: {len(grupos)})")
+
+    antes = len(json.dumps(datos, ensure_ascii=False).encode("utf-8"))
+    despues = len(json.dumps(compactado, ensure_ascii=False).encode("utf-8"))
+    print(f"Almacén: {antes / 2**20:.1f} MB -> {despues / 2**20:.1f} MB")
+
+    muestra = random.Random(args.semilla).sample(preguntas, min(args.muestra, len(preguntas)))
+    segundos = todos_contra_todos(muestra, args.umbral)
+    extrapolado = segundos * (len(preguntas) / len(muestra)) ** 2
+    print(f"n² en {len(muestra)}: {segundos:.1f} s -> extrapolado a {len(preguntas)}: {extrapolado / 60:.0f} min "
+          f"(MinHash/LSH: {est['segundos_total']:.1f} s)")
+
+    # Variantes nuevas (no guardadas tal cual): la búsqueda recorre el índice fuzzy
+    azar = random.Random(args.semilla + 1)
+    consultas = [_variante(azar, azar.choice(bases)) for _ in range(50)]
+    print(f"Búsqueda paso 2: {_buscar_us(datos, consultas) / 1000:.1f} ms antes, "
+          f"{_buscar_us(compactado, consultas) / 1000:.1f} ms después")
+    print(f"Formas vacías ({len(VACIAS)}, una al final): {'ok' if verificar_vacias() else 'MAL'}")
+    esperadas, finales = verificar_reemplazo(dict(list(datos.items())[:5000]))
+    print(f"Compactación de un worker viejo tras reemplazar(): {finales} entradas (esperadas {esperadas}) "
+          f"{'ok' if finales == esperadas else 'MAL'}")
+
+
+if __name__ == "__main__":
+    main()
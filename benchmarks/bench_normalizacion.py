@@ -0,0 +1,144 @@
+"""
+Costo de normalización por mensaje: NFD en cada llamada (antes) contra la
+tabla de translate + LRU y los campos del catálogo ya preprocesados (después).
+
+Primero verifica paridad:
+  - quitar_acentos() == NFD sin marcas, sobre todo el catálogo, el corpus de
+    regresión y todos los caracteres del plano básico
+  - Catalogo.mejor_materia() == thefuzz.extractOne(token_set_ratio) del paso 8
+  - normalizar() / tokenizar() dan lo mismo que con NFD
+
+Uso:
+    python -m benchmarks.bench_normalizacion [--repeticiones 5]
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thefuzz import fuzz, process
+
+from benchmarks.bench_coincidencias import FRASES, construir_corpus
+from modules.cache_respuestas import CacheRespuestas, normalizar
+from modules.normalizacion import limpiar_texto, quitar_acentos
+from modules.recarga import cargar_catalogo
+from modules.recuperacion import tokenizar
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_NO_ALFANUMERICO = re.compile(r"[^\w⟨⟩]+")
+
+
+# -----------------------------
+# Versiones anteriores (referencia)
+# -----------------------------
+def limpiar_nfd(texto):
+    texto = texto.lower()
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+
+def normalizar_nfd(texto):
+    return " ".join(_NO_ALFANUMERICO.sub(" ", limpiar_nfd(texto)).split())
+
+
+def materia_thefuzz(catalogo, carrera, mensaje_limpio):
+    nombres = catalogo.nombres_materias(carrera)
+    return process.extractOne(mensaje_limpio, nombres, scorer=fuzz.token_set_ratio) if nombres else (None, 0)
+
+
+# -----------------------------
+# Paridad
+# -----------------------------
+def verificar(catalogo, mensajes):
+    textos = list(mensajes)
+    for filas in (catalogo.general, catalogo.carreras, catalogo.materias):
+        for fila in filas:
+            textos.extend(v for v in fila.values() if v)
+    textos.extend(catalogo.indice.textos)
+    textos.append("".join(chr(i) for i in range(0xD800)))
+    textos.append("".join(chr(i) for i in range(0xE000, 0x10000)))
+
+    diferencias = sum(limpiar_nfd(t) != limpiar_texto(t) for t in textos)
+    diferencias += sum(normalizar_nfd(t) != normalizar(t) for t in textos)
+    diferencias += sum(tokenizar(t) != _tokenizar_nfd(t) for t in textos)
+    materias = 0
+    for carrera in catalogo.carreras:
+        for m in mensajes:
+            materias += 1
+            if tuple(materia_thefuzz(catalogo, carrera['nombre'], m)) != catalogo.mejor_materia(carrera['nombre'], m):
+                diferencias += 1
+    return len(textos), materias, diferencias
+
+
+def _tokenizar_nfd(texto):
+    import modules.recuperacion as r
+    tokens = []
+    for t in r._PALABRA.findall(limpiar_nfd(texto)):
+        if len(t) > 4 and t.endswith("s"):
+            t = t[:-1]
+        if len(t) < 2 or t in r.STOPWORDS:
+            continue
+        tokens.append(t)
+    return tokens
+
+
+# -----------------------------
+# Costo por mensaje
+# -----------------------------
+def por_mensaje(funcion, mensajes, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for m in mensajes:
+            funcion(m)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / len(mensajes) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    catalogo = cargar_catalogo(os.path.join(BASE_DIR, "data"))
+    crudos = FRASES + [m for m in construir_corpus() if m]
+    mensajes = [limpiar_nfd(m) for m in crudos]
+    textos, materias, diferencias = verificar(catalogo, mensajes)
+    print(f"Paridad: {textos} textos, {materias} búsquedas de materia, diferencias: {diferencias}\n")
+
+    carrera = catalogo.carreras[0]['nombre']
+    info = catalogo.carrera(carrera)
+    contexto = f"Carrera: {info['nombre']}. Descripción: {info['descripcion']}. Perfil: {info.get('perfil_egreso', '')}."
+
+    def antes(m):
+        limpio = limpiar_nfd(m)
+        materia_thefuzz(catalogo, carrera, limpio)
+        hashlib.sha1(normalizar_nfd(contexto).encode("utf-8")).hexdigest()
+        normalizar_nfd(m)
+
+    def despues(m):
+        limpio = limpiar_texto(m)
+        catalogo.mejor_materia(carrera, limpio)
+        CacheRespuestas.llave(contexto, m)
+
+    filas = [
+        ("limpiar_texto (NFD)", lambda m: limpiar_nfd(m)),
+        ("limpiar_texto (translate, sin LRU)", lambda m: quitar_acentos(m.lower())),
+        ("limpiar_texto (LRU caliente)", limpiar_texto),
+        ("paso 8 materia (thefuzz)", lambda m: materia_thefuzz(catalogo, carrera, m)),
+        ("paso 8 materia (precalculada)", lambda m: catalogo.mejor_materia(carrera, m)),
+        ("llave caché LLM (NFD)", lambda m: (hashlib.sha1(normalizar_nfd(contexto).encode("utf-8")).hexdigest(), normalizar_nfd(m))),
+        ("llave caché LLM (translate + huella)", lambda m: CacheRespuestas.llave(contexto, m)),
+        ("mensaje completo antes", antes),
+        ("mensaje completo después", despues),
+    ]
+    for nombre, funcion in filas:
+        print(f"{nombre:<38} {por_mensaje(funcion, crudos, args.repeticiones):>9.1f} µs/mensaje")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Memoria por sesión: diccionario suelto (formato anterior) vs Sesion con __slots__.
+
+Crea N sesiones dentro de un MemoriaLRU y mide con tracemalloc los bytes
+asignados por sesión, además del costo de un ciclo obtener + guardar.
+También mide sesiones tras 1, 4, 50 y 500 turnos de plática: con el anillo
+de historial y el resumen acotado, la memoria y el bloque del prompt dejan
+de crecer a partir de TURNOS_HISTORIAL.
+
+Uso:
+    python -m benchmarks.bench_sesiones [--sesiones 100000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.memoria import MemoriaLRU, Sesion, actualizar_conversacion, guardar_memoria, obtener_memoria
+import modules.memoria as memoria
+
+
+def _sesion_dict(i):
+    """Estructura que usaba obtener_memoria() antes de Sesion (incluye el nombre del alumno)."""
+    return {
+        'carrera_seleccionada': "Ingeniería Industrial" if i % 2 else None,
+        'modo_materias': bool(i % 3),
+        'ultimo_tema': None,
+        'conversacion': [],
+        'contexto_anterior': None,
+        'nombre_usuario': f"Alumno {i}",
+        'esperando_nombre': False,
+    }
+
+
+def _sesion_slots(i):
+    return Sesion(f"Alumno {i}", False, "Ingeniería Industrial" if i % 2 else None, bool(i % 3))
+
+
+def bytes_por_sesion(fabrica, n):
+    ids = [f"usuario_{i}" for i in range(n)]
+    store = MemoriaLRU(max_sesiones=n, ttl=3600)
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    for i, user_id in enumerate(ids):
+        store.guardar(user_id, fabrica(i))
+    despues = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(s.size_diff for s in despues.compare_to(antes, "filename"))
+    return total / n
+
+
+def _sesion_con_platica(turnos):
+    def fabrica(i):
+        sesion = _sesion_slots(i)
+        for t in range(turnos):
+            actualizar_conversacion(sesion, f"pregunta {t} del alumno {i} sobre calculo y fisica",
+                                    "respuesta larga del bot con varias materias " * 20)
+        return sesion
+    return fabrica
+
+
+def ciclo_lectura_escritura(n):
+    memoria.store = MemoriaLRU(max_sesiones=n, ttl=3600)
+    for i in range(n):
+        s = obtener_memoria(f"u{i}")
+        s.nombre_usuario = f"Alumno {i}"
+        guardar_memoria(f"u{i}", s)
+    inicio = time.perf_counter()
+    for i in range(n):
+        s = obtener_memoria(f"u{i}")
+        s.modo_materias = not s.modo_materias
+        guardar_memoria(f"u{i}", s)
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sesiones", type=int, default=100_000)
+    args = parser.parse_args()
+
+    dict_b = bytes_por_sesion(_sesion_dict, args.sesiones)
+    slots_b = bytes_por_sesion(_sesion_slots, args.sesiones)
+    print(f"Sesiones: {args.sesiones}")
+    print(f"dict (formato anterior): {dict_b:8.0f} bytes/sesión")
+    print(f"Sesion (__slots__):      {slots_b:8.0f} bytes/sesión  ({dict_b / slots_b:.1f}x menos)")
+    print(f"obtener + guardar:       {ciclo_lectura_escritura(args.sesiones):8.2f} µs/mensaje")
+
+    n = max(args.sesiones // 20, 1)
+    print(f"\nCon historial ({n} sesiones):")
+    for turnos in (1, 4, 50, 500):
+        fabrica = _sesion_con_platica(turnos)
+        prompt = len(fabrica(0).contexto_conversacion())
+        print(f"  {turnos:>4} turnos: {bytes_por_sesion(fabrica, n):8.0f} bytes/sesión, bloque del prompt {prompt} caracteres")
+
+
+if __name__ == "__main__":
+    main()
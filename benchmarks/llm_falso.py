@@ -0,0 +1,52 @@
+"""
+Servidor LLM falso para pruebas locales del gateway (modules/llm.py).
+
+Responde POST {"prompt": ...} con {"texto": ...} después de una latencia
+configurable (más un jitter opcional), sin salir a la red.
+
+Uso:
+    python -m benchmarks.llm_falso --puerto 8089 --latencia 0.5
+    AULABOT_LLM_URL=http://127.0.0.1:8089/ uvicorn main:app
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def crear_manejador(latencia, jitter):
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive para probar reutilización de conexión
+
+        def do_POST(self):
+            cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            prompt = json.loads(cuerpo or b"{}").get("prompt", "")
+            time.sleep(latencia + random.uniform(0, jitter))
+            datos = json.dumps({"texto": f"[LLM falso] {' '.join(prompt.split())[:200]}"}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def log_message(self, *args):
+            pass
+
+    return Manejador
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puerto", type=int, default=8089)
+    parser.add_argument("--latencia", type=float, default=0.5, help="segundos por respuesta")
+    parser.add_argument("--jitter", type=float, default=0.0, help="segundos extra aleatorios")
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.puerto), crear_manejador(args.latencia, args.jitter))
+    print(f"LLM falso en http://127.0.0.1:{args.puerto}/ (latencia {args.latencia}s)")
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Verificación de la caché de respuestas del LLM: el nombre del alumno se
+cambia por el marcador y de vuelta sin tocar otras palabras, aunque el
+nombre sea parte de palabras comunes ("Ing" en "Ingeniería", "Ana" en
+"Mariana Anaya", "Al" en "Alimentarias"). Con AULABOT_CACHE_LLM, dos
+workers que persisten sobre el mismo archivo no se pisan las entradas.
+
+Uso:
+    python -m benchmarks.verificar_cache
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.cache_respuestas import CacheRespuestas
+
+CONTEXTO = "Las carreras son: Ingeniería Industrial, Ingeniería en Industrias Alimentarias."
+
+# (nombre que guarda, respuesta del LLM, nombre que lee, respuesta esperada)
+CASOS = [
+    ("Ing", "¡Claro, Ing! Te recomiendo Ingeniería Industrial.",
+     "Pedro", "¡Claro, Pedro! Te recomiendo Ingeniería Industrial."),
+    ("Ana", "Ana, la jefa de división es Mariana Anaya.",
+     "Luis", "Luis, la jefa de división es Mariana Anaya."),
+    ("Al", "Al: Industrias Alimentarias está en el edificio Altamira.",
+     "Jo", "Jo: Industrias Alimentarias está en el edificio Altamira."),
+    # El nombre no aparece ni en la pregunta ni en la respuesta: no se toca nada
+    ("Jo", "Ingeniería Industrial dura nueve semestres.",
+     "Ana", "Ingeniería Industrial dura nueve semestres."),
+]
+
+
+def main():
+    fallas = 0
+    for guarda, respuesta, lee, esperada in CASOS:
+        cache = CacheRespuestas(ttl=60)
+        cache.guardar(CONTEXTO, f"Dile a {guarda} la lista amablemente.", respuesta, guarda)
+        obtenida = cache.obtener(CONTEXTO, f"Dile a {lee} la lista amablemente.", lee)
+        ok = obtenida == esperada
+        fallas += not ok
+        print(f"{'ok ' if ok else 'MAL'} {guarda!r} -> {lee!r}: {obtenida!r}")
+        if not ok:
+            print(f"    esperada: {esperada!r}")
+
+    # Una pregunta sin el nombre no comparte llave con otra que sí lo trae
+    cache = CacheRespuestas(ttl=60)
+    cache.guardar(CONTEXTO, "Explícale la materia a Ana.", "Ana, es de primer semestre.", "Ana")
+    otra = cache.obtener(CONTEXTO, "Explícale la materia.", "Luis")
+    fallas += otra is not None
+    print(f"{'ok ' if otra is None else 'MAL'} pregunta sin nombre no reutiliza la de Ana: {otra!r}")
+
+    # Dos workers con el mismo archivo: cada uno persiste lo suyo (como al apagar)
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "cache_llm.json")
+        a, b = CacheRespuestas(ttl=60, ruta=ruta), CacheRespuestas(ttl=60, ruta=ruta)
+        a.guardar(CONTEXTO, "¿Cuánto dura Industrial?", "Nueve semestres.")
+        b.guardar(CONTEXTO, "¿Dónde está Alimentarias?", "En el edificio Altamira.")
+        a.persistir()
+        b.persistir()
+        nuevo = CacheRespuestas(ttl=60, ruta=ruta)
+        vistas = [nuevo.obtener(CONTEXTO, "¿Cuánto dura Industrial?"), nuevo.obtener(CONTEXTO, "¿Dónde está Alimentarias?")]
+        ok = vistas == ["Nueve semestres.", "En el edificio Altamira."]
+        fallas += not ok
+        print(f"{'ok ' if ok else 'MAL'} dos workers persisten sin pisarse: {vistas!r}")
+
+    total = len(CASOS) + 2
+    print(f"\n{total - fallas}/{total} casos correctos")
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Verificación del KnowledgeStore compartido por varios workers: dos almacenes
+sobre el mismo aprendido.json, uno con la vista vieja (intervalo_sync largo)
+mientras el otro compacta. Ninguna pregunta aprendida se debe perder ni
+quedar sin indexar.
+
+Uso:
+    python -m benchmarks.verificar_conocimiento
+"""
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.conocimiento import KnowledgeStore
+
+PREGUNTAS = {
+    "q1": "¿cuánto cuesta la ficha?",
+    "q2": "¿dónde queda la biblioteca?",
+    "q3": "¿cuándo abre la cafetería?",
+    "q4": "¿quién atiende servicios escolares?",
+}
+
+
+def _en_disco(ruta):
+    """Lo que un worker nuevo vería: JSON + log."""
+    return KnowledgeStore(ruta).todo()
+
+
+def main():
+    fallas = 0
+
+    def comprobar(nombre, ok, detalle=""):
+        nonlocal fallas
+        fallas += not ok
+        print(f"{'ok ' if ok else 'MAL'} {nombre}{': ' + detalle if detalle else ''}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "aprendido.json")
+        a = KnowledgeStore(ruta, compactar_cada=2, intervalo_sync=3600)
+        b = KnowledgeStore(ruta, compactar_cada=2, intervalo_sync=3600)
+
+        a.agregar(PREGUNTAS["q1"], "r1")
+        b.buscar("calentar")                  # B carga su vista (y ya no relee en una hora)
+        a.agregar(PREGUNTAS["q2"], "r2")      # A compacta: JSON nuevo y log vacío
+        b.agregar(PREGUNTAS["q3"], "r3")      # B tiene el offset de antes de la compactación
+        comprobar("B indexa su propia entrada tras la compactación de A",
+                  b.buscar(PREGUNTAS["q3"]) == "r3")
+        b.agregar(PREGUNTAS["q4"], "r4")      # B compacta con su vista
+        with open(ruta, encoding="utf-8") as f:
+            archivo = json.load(f)
+        faltan = [q for q, p in PREGUNTAS.items() if p not in archivo]
+        comprobar("la compactación de B conserva lo de A", not faltan, f"faltan {faltan}" if faltan else "")
+        comprobar("un worker nuevo ve las 4", len(_en_disco(ruta)) == 4)
+
+        # A compacta otra vez con su vista (ya vieja respecto a B)
+        a.agregar("¿hay estacionamiento?", "r5")
+        a.compactar()
+        total = _en_disco(ruta)
+        comprobar("la segunda compactación de A conserva lo de B",
+                  all(p in total for p in PREGUNTAS.values()) and len(total) == 5, f"{len(total)} entradas")
+
+    print(f"\n{4 - fallas}/4 casos correctos")
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Verificación del GatewayLLM con BackendFalso (sin red): agrupación de
+prompts iguales, plazo vencido, paso del lugar por prioridad (CSV antes que
+general), cancelación sin perder lugares, saturado() y StreamIncompleto
+cuando un fragmento no llega a tiempo.
+
+Uso:
+    python -m benchmarks.verificar_gateway
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.llm import (PRIORIDAD_CSV, PRIORIDAD_GENERAL, BackendFalso, GatewayLLM, SemaforoPrioridad,
+                         StreamIncompleto)
+
+
+class BackendAnotado(BackendFalso):
+    """BackendFalso que anota el orden en que le llegan los prompts."""
+
+    def __init__(self, latencia=0.0, latencia_fragmento=0.02):
+        super().__init__(latencia, latencia_fragmento)
+        self.orden = []
+
+    async def generar(self, prompt):
+        self.orden.append(prompt)
+        return await super().generar(prompt)
+
+
+class BackendRoto(BackendFalso):
+    async def generar(self, prompt):
+        self.llamadas += 1
+        raise RuntimeError("se cayó la conexión")
+
+
+# -----------------------------
+# Casos (cada uno devuelve (ok, detalle))
+# -----------------------------
+async def agrupacion():
+    backend = BackendFalso(latencia=0.05)
+    gateway = GatewayLLM(backend, max_concurrencia=4)
+    respuestas = await asyncio.gather(*(gateway.generar("¿cuánto cuesta la ficha?") for _ in range(10)))
+    ok = backend.llamadas == 1 and gateway.agrupadas == 9 and len(set(respuestas)) == 1 and respuestas[0]
+    return ok, f"llamadas al backend={backend.llamadas}, agrupadas={gateway.agrupadas}"
+
+
+async def plazo_vencido():
+    backend = BackendFalso(latencia=0.2)
+    gateway = GatewayLLM(backend, timeout=1.0)
+    respuesta = await gateway.generar("lento", timeout=0.05)
+    en_vuelo = gateway.estadisticas()["en_vuelo"]  # la llamada sigue para otros clientes
+    await asyncio.sleep(0.25)
+    ok = respuesta is None and gateway.vencidas == 1 and en_vuelo == 1 and gateway.estadisticas()["en_vuelo"] == 0
+    return ok, f"respuesta={respuesta!r}, vencidas={gateway.vencidas}, en vuelo durante/después={en_vuelo}/{gateway.estadisticas()['en_vuelo']}"
+
+
+async def error_del_backend():
+    gateway = GatewayLLM(BackendRoto())
+    respuesta = await gateway.generar("falla")
+    await asyncio.sleep(0)  # el callback que cuenta el error
+    ok = respuesta is None and gateway.errores == 1
+    return ok, f"respuesta={respuesta!r}, errores={gateway.errores}"
+
+
+async def prioridad():
+    backend = BackendAnotado(latencia=0.05)
+    gateway = GatewayLLM(backend, max_concurrencia=1)
+    ocupa = asyncio.ensure_future(gateway.generar("ocupa", prioridad=PRIORIDAD_GENERAL))
+    await asyncio.sleep(0.01)
+    # El general llega primero, pero el lugar que se libere es para el CSV
+    general = asyncio.ensure_future(gateway.generar("general", prioridad=PRIORIDAD_GENERAL))
+    await asyncio.sleep(0.01)
+    csv = asyncio.ensure_future(gateway.generar("csv", prioridad=PRIORIDAD_CSV))
+    await asyncio.gather(ocupa, general, csv)
+    ok = backend.orden == ["ocupa", "csv", "general"] and gateway._semaforo.ocupados == 0
+    return ok, f"orden={backend.orden}, ocupados al final={gateway._semaforo.ocupados}"
+
+
+async def cancelacion_en_espera():
+    semaforo = SemaforoPrioridad(1)
+    await semaforo.adquirir()
+    # Cancelado mientras espera
+    esperando = asyncio.ensure_future(semaforo.adquirir())
+    await asyncio.sleep(0)
+    esperando.cancel()
+    await asyncio.gather(esperando, return_exceptions=True)
+    # Cancelado justo después de recibir el lugar (antes de llegar a correr)
+    recibe = asyncio.ensure_future(semaforo.adquirir())
+    siguiente = asyncio.ensure_future(semaforo.adquirir())
+    await asyncio.sleep(0)
+    semaforo.liberar()
+    recibe.cancel()
+    await asyncio.gather(recibe, return_exceptions=True)
+    await asyncio.sleep(0)
+    paso = siguiente.done() and not siguiente.cancelled()
+    semaforo.liberar()
+    ok = paso and semaforo.ocupados == 0 and semaforo.en_espera() == 0
+    return ok, f"el lugar pasó al siguiente={paso}, ocupados={semaforo.ocupados}"
+
+
+async def cancelacion_en_stream():
+    gateway = GatewayLLM(BackendFalso(latencia=0.0, latencia_fragmento=0.05), max_concurrencia=1)
+
+    async def consumir():
+        async for _ in gateway.generar_stream("un texto largo que llega en muchos fragmentos"):
+            pass
+
+    tarea = asyncio.ensure_future(consumir())
+    await asyncio.sleep(0.08)
+    ocupados_antes = gateway._semaforo.ocupados
+    tarea.cancel()
+    await asyncio.gather(tarea, return_exceptions=True)
+    # El lugar liberado sirve a la siguiente llamada
+    respuesta = await gateway.generar("después", timeout=0.5)
+    ok = ocupados_antes == 1 and gateway._semaforo.ocupados == 0 and respuesta is not None
+    return ok, f"ocupados durante/después={ocupados_antes}/{gateway._semaforo.ocupados}, siguiente={respuesta is not None}"
+
+
+async def saturacion():
+    gateway = GatewayLLM(BackendFalso(latencia=0.1), max_concurrencia=1, max_cola=2)
+    estados = [gateway.saturado()]
+    tareas = [asyncio.ensure_future(gateway.generar("ocupa", prioridad=PRIORIDAD_GENERAL))]
+    await asyncio.sleep(0)
+    # Las del CSV esperando no cuentan para saturado()
+    tareas += [asyncio.ensure_future(gateway.generar(f"csv {i}", prioridad=PRIORIDAD_CSV)) for i in range(3)]
+    await asyncio.sleep(0)
+    estados.append(gateway.saturado())
+    for i in range(2):
+        tareas.append(asyncio.ensure_future(gateway.generar(f"general {i}", prioridad=PRIORIDAD_GENERAL)))
+        await asyncio.sleep(0)
+        estados.append(gateway.saturado())
+    await asyncio.gather(*tareas)
+    estados.append(gateway.saturado())
+    ok = estados == [False, False, False, True, False]
+    return ok, f"saturado: vacío, 3 CSV en cola, 1 general, 2 generales, al final = {estados}"
+
+
+async def stream_incompleto():
+    gateway = GatewayLLM(BackendFalso(latencia=0.0, latencia_fragmento=0.2))
+    partes, lanzada = [], None
+    try:
+        async for fragmento in gateway.generar_stream("dos palabras o más", timeout=0.05):
+            partes.append(fragmento)
+    except StreamIncompleto as e:
+        lanzada = e
+    ok = lanzada is not None and len(partes) == 1 and gateway.vencidas == 1 and gateway._semaforo.ocupados == 0
+    return ok, f"fragmentos antes del corte={len(partes)}, excepción={lanzada!r}, vencidas={gateway.vencidas}"
+
+
+CASOS = [agrupacion, plazo_vencido, error_del_backend, prioridad, cancelacion_en_espera, cancelacion_en_stream,
+         saturacion, stream_incompleto]
+
+
+async def correr():
+    fallas = 0
+    for caso in CASOS:
+        ok, detalle = await caso()
+        fallas += not ok
+        print(f"{'ok ' if ok else 'MAL'} {caso.__name__}: {detalle}")
+    print(f"\n{len(CASOS) - fallas}/{len(CASOS)} casos correctos")
+    return fallas
+
+
+def main():
+    return 1 if asyncio.run(correr()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,58 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+import hmac
 import os
-import sys
+import time
 
 # Importar tus módulos locales
-from modules.ia import generar_respuesta
-from modules.funciones import leer_csv
+from modules.ia import cache_llm, generar_respuesta, generar_respuesta_stream, generar_respuestas_lote
+from modules.campus import RegistroCampus, indicadores as indicadores_campus
+from modules.arranque import Calentamiento, indicadores as indicadores_arranque
+from modules.funciones import vaciar_ignorancia
+from modules import metricas
 
 # -----------------------------
 # 1. Configuración Inicial
 # -----------------------------
-app = FastAPI(title="AulaBot API", version="2.0")
+@asynccontextmanager
+async def lifespan(app):
+    global registro, vigilante
+    try:
+        # Índices precalculados; se reemplazan en caliente cuando cambia data/.
+        # Los demás campus (data/campus/<id>/) se cargan al primer uso.
+        with calentamiento.fase("catalogo"):
+            registro = await asyncio.to_thread(RegistroCampus, DATA_DIR)
+        vigilante = registro.principal
+        indicadores_campus(registro)
+        print("✅ Base de datos cargada correctamente.")
+    except Exception as e:
+        # Sin datos no se arranca: la excepción aborta el inicio de uvicorn
+        print(f"❌ Error crítico al cargar datos: {e}")
+        calentamiento.estado = "error"
+        raise
+
+    # Revisión periódica de data/ y de cada campus cargado; descarga de inactivos
+    tareas = [
+        asyncio.create_task(registro.vigilar()),
+        # Lo demás se calienta ya con el servidor escuchando (/readyz en 503 mientras tanto)
+        asyncio.create_task(calentamiento.ejecutar(vigilante.actual)),
+    ]
+    yield
+    calentamiento.detener()
+    for tarea in tareas:
+        tarea.cancel()
+    # Lo que quede en las colas de preguntas sin respuesta (una por campus)
+    await asyncio.to_thread(vaciar_ignorancia)
+    # Las respuestas del LLM que aún no llegaban a disco (AULABOT_CACHE_LLM)
+    await asyncio.to_thread(cache_llm.persistir)
+
+app = FastAPI(title="AulaBot API", version="2.0", lifespan=lifespan)
 
 # Configuración CORS (Permite que tu App Flutter y Web se conecten)
 app.add_middleware(
@@ -23,6 +63,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia por ruta (plantilla de la ruta, no la URL: pocas series)
+@app.middleware("http")
+async def medir_http(request: Request, call_next):
+    inicio = time.perf_counter()
+    codigo = 500
+    try:
+        respuesta = await call_next(request)
+        codigo = respuesta.status_code
+        return respuesta
+    finally:
+        ruta = request.scope.get("route")
+        metricas.duracion_http.observar(
+            time.perf_counter() - inicio,
+            ruta=ruta.path if ruta else "sin_ruta",
+            codigo=codigo,
+        )
+
 # -----------------------------
 # 2. Modelos de Datos (Pydantic)
 # -----------------------------
@@ -36,43 +93,56 @@ class RespuestaBot(BaseModel):
     respuesta: str
     estado: str = "ok"
 
+# Tope de mensajes por llamada a /chat/batch
+MAX_LOTE = 500
+
 # -----------------------------
 # 3. Carga de Datos Robusta
 # -----------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
 
-try:
-    # Construir rutas absolutas para evitar errores en la nube
-    path_general = os.path.join(BASE_DIR, "data", "general.csv")
-    path_carreras = os.path.join(BASE_DIR, "data", "carreras.csv")
-    path_materias = os.path.join(BASE_DIR, "data", "materias.csv")
+# /admin/* exige la cabecera X-Admin-Token; sin token configurado no hay administración
+ADMIN_TOKEN = os.getenv("AULABOT_ADMIN_TOKEN")
 
-    # Cargar los archivos
-    general = leer_csv(path_general)
-    carreras = leer_csv(path_carreras)
-    materias = leer_csv(path_materias)
-    print("✅ Base de datos cargada correctamente.")
-
-except Exception as e:
-    print(f"❌ Error crítico al cargar datos: {e}")
-    # Detener el servidor si no hay datos (evita que arranque roto)
-    sys.exit(1)
+# El catálogo se carga en el lifespan (ver arriba), no al importar
+registro = None
+vigilante = None
+calentamiento = Calentamiento()
+indicadores_arranque(calentamiento)
 
 # -----------------------------
 # 4. Endpoints (Rutas)
 # -----------------------------
 
+# Campus de la petición: /c/{campus}/..., cabecera X-Campus o el por defecto
+async def resolver_campus(campus: Optional[str] = None, x_campus: Optional[str] = Header(None)):
+    nombre = (campus or x_campus or registro.por_defecto).strip().lower()
+    catalogo = await registro.obtener(nombre)
+    if catalogo is None:
+        raise HTTPException(status_code=404, detail=f"Campus desconocido: {nombre}")
+    return nombre, catalogo
+
+def _sesion(campus, usuario_id):
+    """
+    Sesión (y fichas de admisión) por campus. Todos llevan prefijo, también el
+    por defecto: un usuario_id como "tecx:alumno1" no alcanza la sesión de otro
+    campus (los id de campus no llevan ":").
+    """
+    return f"{campus}:{usuario_id}"
+
 # Ruta Raíz: Sirve el frontend web (opcional, pero útil para pruebas rápidas)
 @app.get("/")
 async def read_index():
-    file_path = os.path.join(BASE_DIR, "index.html")
+    file_path = os.path.join(BASE_DIR, "static", "index.html")
     if os.path.exists(file_path):
         return FileResponse(file_path)
     return {"mensaje": "AulaBot API activa. Usa /docs para ver la documentación."}
 
 # Ruta de Chat PRO: Usa POST y Modelos
 @app.post("/chat", response_model=RespuestaBot)
-def chat_endpoint(datos: MensajeUsuario):
+@app.post("/c/{campus}/chat", response_model=RespuestaBot)
+async def chat_endpoint(datos: MensajeUsuario, sede=Depends(resolver_campus)):
     """
     Recibe un mensaje y un ID de usuario, devuelve la respuesta de la IA.
     """
@@ -80,15 +150,14 @@ def chat_endpoint(datos: MensajeUsuario):
     if not datos.mensaje.strip():
         raise HTTPException(status_code=400, detail="El mensaje no puede estar vacío")
 
+    campus, catalogo = sede
     try:
         # 2. Llamar a la lógica de IA (pasando el ID de usuario)
         # NOTA: Asegúrate de actualizar generar_respuesta en ia.py para aceptar usuario_id
-        respuesta_texto = generar_respuesta(
+        respuesta_texto = await generar_respuesta(
             datos.mensaje, 
-            datos.usuario_id, 
-            general, 
-            carreras, 
-            materias
+            _sesion(campus, datos.usuario_id), 
+            catalogo
         )
         
         # 3. Devolver respuesta estructurada
@@ -96,4 +165,131 @@ def chat_endpoint(datos: MensajeUsuario):
 
     except Exception as e:
         print(f"Error interno en chat: {e}")
-        raise HTTPException(status_code=500, detail="Error interno del servidor")
\ No newline at end of file
+        metricas.errores.inc(ruta="/chat")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+# Ruta de Chat en streaming: el texto llega por fragmentos (web y App)
+@app.post("/chat/stream")
+@app.post("/c/{campus}/chat/stream")
+async def chat_stream_endpoint(datos: MensajeUsuario, sede=Depends(resolver_campus)):
+    """
+    Igual que /chat, pero responde texto plano conforme se genera
+    (el primer fragmento sale antes de que el LLM termine).
+    """
+    if not datos.mensaje.strip():
+        raise HTTPException(status_code=400, detail="El mensaje no puede estar vacío")
+
+    campus, catalogo = sede  # el mismo catálogo durante todo el stream
+    usuario = _sesion(campus, datos.usuario_id)
+
+    async def fragmentos():
+        try:
+            async for fragmento in generar_respuesta_stream(datos.mensaje, usuario, catalogo):
+                yield fragmento
+        except Exception as e:
+            # Las cabeceras ya se enviaron: solo queda avisar dentro del texto
+            print(f"Error interno en chat stream: {e}")
+            metricas.errores.inc(ruta="/chat/stream")
+            yield "\n⚠️ Error interno del servidor"
+
+    return StreamingResponse(fragmentos(), media_type="text/plain; charset=utf-8")
+
+# Ruta de Chat por lotes: QA nocturno y sincronización offline de la App
+@app.post("/chat/batch", response_model=List[RespuestaBot])
+@app.post("/c/{campus}/chat/batch", response_model=List[RespuestaBot])
+async def chat_batch_endpoint(lote: List[MensajeUsuario], sede=Depends(resolver_campus)):
+    """
+    Recibe varios mensajes (de uno o varios usuarios) y devuelve una
+    respuesta por mensaje, en el mismo orden.
+    """
+    if len(lote) > MAX_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_LOTE} mensajes por lote")
+
+    campus, catalogo = sede
+    validos = [i for i, datos in enumerate(lote) if datos.mensaje.strip()]
+    textos = await generar_respuestas_lote(
+        [(lote[i].mensaje, _sesion(campus, lote[i].usuario_id)) for i in validos],
+        catalogo
+    )
+
+    respuestas = [RespuestaBot(respuesta="El mensaje no puede estar vacío", estado="error") for _ in lote]
+    for i, texto in zip(validos, textos):
+        respuestas[i] = RespuestaBot(respuesta=texto) if texto is not None else RespuestaBot(respuesta="Error interno del servidor", estado="error")
+    return respuestas
+
+# -----------------------------
+# 5. Administración
+# -----------------------------
+def _verificar_admin(token):
+    # Cerrado por defecto: la API acepta cualquier origen (CORS "*")
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Administración deshabilitada (define AULABOT_ADMIN_TOKEN)")
+    if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+@app.get("/admin/catalogo")
+async def admin_catalogo(x_admin_token: str = Header(None)):
+    """Versión del catálogo vigente, cuándo se cargó y cuánto tardó."""
+    _verificar_admin(x_admin_token)
+    return vigilante.estado()
+
+@app.post("/admin/catalogo/recargar")
+async def admin_recargar(x_admin_token: str = Header(None)):
+    """Fuerza la recarga de data/ sin esperar a la siguiente revisión."""
+    _verificar_admin(x_admin_token)
+    if not await vigilante.recargar():
+        raise HTTPException(status_code=500, detail=f"No se pudo recargar: {vigilante.ultimo_error}")
+    return vigilante.estado()
+
+@app.get("/admin/campus")
+async def admin_campus(x_admin_token: str = Header(None)):
+    """Campus cargados en memoria, su uso reciente y las descargas por LRU/inactividad."""
+    _verificar_admin(x_admin_token)
+    return registro.estado()
+
+# Preguntas que ningún paso pudo contestar (material para general.csv)
+@app.get("/admin/preguntas_sin_respuesta")
+async def admin_preguntas_sin_respuesta(n: int = 20, campus: Optional[str] = None, x_admin_token: str = Header(None)):
+    _verificar_admin(x_admin_token)
+    catalogo = await registro.obtener((campus or "").strip().lower())
+    if catalogo is None:
+        raise HTTPException(status_code=404, detail=f"Campus desconocido: {campus}")
+    ignorancia = catalogo.ignorancia
+    return {"preguntas": await asyncio.to_thread(ignorancia.top, n), **ignorancia.estadisticas()}
+
+# Perfilador por muestreo del hilo del event loop (encender solo mientras se investiga)
+@app.post("/admin/perfilador/iniciar")
+async def admin_perfilador_iniciar(intervalo_ms: float = 5.0, x_admin_token: str = Header(None)):
+    _verificar_admin(x_admin_token)
+    metricas.perfilador.iniciar(max(intervalo_ms, 1.0) / 1000)
+    return metricas.perfilador.estado()
+
+@app.post("/admin/perfilador/detener")
+async def admin_perfilador_detener(x_admin_token: str = Header(None)):
+    _verificar_admin(x_admin_token)
+    metricas.perfilador.detener()
+    return metricas.perfilador.estado()
+
+@app.get("/admin/perfilador", response_class=PlainTextResponse)
+async def admin_perfilador(limite: int = 200, x_admin_token: str = Header(None)):
+    """Pilas muestreadas en formato colapsado (flamegraph.pl / speedscope)."""
+    _verificar_admin(x_admin_token)
+    return metricas.perfilador.colapsado(limite)
+
+# -----------------------------
+# 6. Salud y métricas
+# -----------------------------
+@app.get("/healthz")
+async def healthz():
+    """El proceso vive y atiende el event loop (no dice si ya calentó)."""
+    return {"estado": "vivo", "activo_s": calentamiento.a_dict()["activo_s"]}
+
+@app.get("/readyz")
+async def readyz():
+    """200 solo cuando el worker terminó de calentar; 503 antes y al apagarse."""
+    return JSONResponse(calentamiento.a_dict(), status_code=200 if calentamiento.listo else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Contadores e histogramas en formato de texto de Prometheus."""
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,62 @@
+# ---------------------------------------------------------
+# Control de admisión al LLM
+# ---------------------------------------------------------
+# Cada llamada al LLM (que no salga de la caché) gasta una ficha de la
+# cubeta del usuario y otra de la cubeta global. Sin fichas no se llama:
+#   - respuestas con contexto del CSV -> se entrega el contexto tal cual
+#   - preguntas abiertas              -> respuesta local (BM25) o aviso
+# Las cubetas viven en el mismo almacén que las sesiones (memoria.store).
+# El usuario del mensaje en curso se fija en una contextvar, igual que el
+# cronómetro de etapas, para no pasarlo por toda la cascada.
+import contextvars
+import os
+
+from modules.metricas import llm_no_admitidas
+
+RAFAGA_USUARIO = float(os.getenv("AULABOT_LLM_RAFAGA_USUARIO", "6"))
+POR_MINUTO_USUARIO = float(os.getenv("AULABOT_LLM_POR_MINUTO_USUARIO", "6"))
+RAFAGA_GLOBAL = float(os.getenv("AULABOT_LLM_RAFAGA", "60"))
+POR_MINUTO_GLOBAL = float(os.getenv("AULABOT_LLM_POR_MINUTO", "600"))
+
+_usuario = contextvars.ContextVar("aulabot_usuario", default=None)
+
+
+class Saturado(Exception):
+    """No se admitió la llamada al LLM: usar la respuesta local."""
+
+
+def fijar_usuario(user_id):
+    """Se llama al empezar cada mensaje (generar_respuesta)."""
+    _usuario.set(user_id)
+
+
+class Admision:
+    def __init__(self, store, rafaga_usuario=RAFAGA_USUARIO, por_minuto_usuario=POR_MINUTO_USUARIO,
+                 rafaga_global=RAFAGA_GLOBAL, por_minuto_global=POR_MINUTO_GLOBAL):
+        self.store = store
+        self.usuario = (rafaga_usuario, por_minuto_usuario / 60)
+        self.total = (rafaga_global, por_minuto_global / 60)
+
+    def permitir(self, tipo, gateway=None) -> bool:
+        """
+        True si el mensaje en curso puede llamar al LLM. Primero la cola y el
+        usuario: quien ya agotó lo suyo no gasta fichas globales.
+        """
+        # Las preguntas abiertas ceden si la cola del gateway ya está llena
+        if tipo == "general" and gateway is not None and gateway.saturado():
+            llm_no_admitidas.inc(motivo="cola", tipo=tipo)
+            return False
+        user_id = _usuario.get()
+        if user_id is not None and self.usuario[0] > 0 and not self.store.consumir_fichas(f"usuario:{user_id}", *self.usuario):
+            llm_no_admitidas.inc(motivo="usuario", tipo=tipo)
+            return False
+        if self.total[0] > 0 and not self.store.consumir_fichas("global", *self.total):
+            llm_no_admitidas.inc(motivo="global", tipo=tipo)
+            return False
+        return True
+
+    def estado(self):
+        return {
+            "usuario": {"rafaga": self.usuario[0], "por_minuto": self.usuario[1] * 60},
+            "global": {"rafaga": self.total[0], "por_minuto": self.total[1] * 60},
+        }
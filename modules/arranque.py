@@ -0,0 +1,172 @@
+# ---------------------------------------------------------
+# Calentamiento del worker al arrancar (lifespan de la app)
+# ---------------------------------------------------------
+# Lo que antes pagaban las primeras peticiones se hace antes de recibir
+# tráfico:
+#   - catálogo del campus por defecto (índices, BM25, detector): obligatorio,
+#     si falla la app no arranca
+#   - aprendido.json leído e indexado
+#   - listas de carreras y materias renderizadas (caché de render)
+#   - cada rama de generar_respuesta recorrida una vez con un usuario de
+#     calentamiento, sin llamar al LLM (rapidfuzz, numpy, BM25, sesiones);
+#     esos mensajes no cuentan en /metrics y su sesión vive en un almacén
+#     propio en memoria: del almacén compartido solo se hace una lectura
+#   - cliente del LLM creado en un hilo (importar el SDK de Gemini tarda) y
+#     conexión abierta con una llamada corta (AULABOT_CALENTAR_LLM=0
+#     la omite; AULABOT_CALENTAR=0 omite todo salvo el catálogo)
+# /readyz responde 503 hasta que termina (y otra vez al apagarse, para que
+# el balanceador deje de mandar tráfico); /healthz solo dice que el proceso vive.
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+
+from modules.funciones import listar_carreras, materias_todas
+from modules.ia import fijar_sin_llm, generar_respuesta, obtener_gateway
+from modules.memoria import en_almacen, obtener_memoria, usar_store_propio
+from modules.metricas import Indicador, fijar_sin_metricas
+from modules.normalizacion import limpiar_texto
+
+CALENTAR = os.getenv("AULABOT_CALENTAR", "1") != "0"
+CALENTAR_LLM = os.getenv("AULABOT_CALENTAR_LLM", "1") != "0"
+PROMPT_PING = "Responde solo: ok"
+
+
+# Intenciones que se contestan antes del paso 9 (general.csv)
+_INTENCIONES_PREVIAS = {"saludo", "ayuda", "carreras_lista", "jefes", "materias"}
+
+
+def _llega_a_general(catalogo, texto):
+    intencion, carrera = catalogo.detector.detectar(limpiar_texto(texto))
+    return carrera is None and intencion not in _INTENCIONES_PREVIAS
+
+
+def _guion(catalogo):
+    """(rama, mensaje) en un orden que pasa por cada paso de la cascada."""
+    carrera = catalogo.carreras[0]["nombre"] if catalogo.carreras else "sistemas"
+    corto = carrera.replace("Ingeniería en ", "").replace("Ingeniería ", "")
+    materias = catalogo.nombres_materias(carrera)
+    semestres = [s for s in catalogo.semestres_de(carrera) if s.isdigit()]
+    # Una palabra clave de general.csv que no se confunda con una carrera...
+    palabra_clave = next((f["palabra_clave"] for f in catalogo.general if _llega_a_general(catalogo, f["palabra_clave"])
+                          and catalogo.detector_general.mejor(limpiar_texto(f["palabra_clave"]))[1] > 85), None)
+    # ...y el inicio de un pasaje del informe que solo encuentre BM25
+    pasaje = next((inicio for inicio in (" ".join(t.split()[:8]) for t, f in zip(catalogo.indice.textos, catalogo.indice.fuentes)
+                                         if f != "general.csv")
+                   if _llega_a_general(catalogo, inicio) and catalogo.detector_general.mejor(limpiar_texto(inicio))[1] <= 85),
+                  None)
+    guion = [
+        ("nombre", "hola"),
+        ("nombre", "Calentamiento"),
+        ("saludo", "hola"),
+        ("ayuda", "ayuda"),
+        ("carreras", "que carreras hay"),
+        ("jefes", f"jefe de division de {corto}"),
+        ("materias", f"materias de {carrera}"),
+        ("semestre", semestres[0] if semestres else "1"),
+        ("materia", materias[0] if materias else "calculo"),
+        ("info_carrera", f"info de {carrera}"),
+        ("afirmacion", "si"),
+        ("negacion", "no"),
+    ]
+    if palabra_clave:
+        guion.append(("general_csv", palabra_clave))
+    if pasaje:
+        guion.append(("recuperacion", pasaje))
+    guion.append(("reinicio", "reiniciar"))  # al final: borra la sesión de calentamiento
+    return guion
+
+
+class Calentamiento:
+    """Estado del arranque y tiempos por fase (lo que reporta /readyz)."""
+
+    def __init__(self):
+        self.estado = "iniciando"  # iniciando -> calentando -> listo -> deteniendo
+        self.fases = {}            # fase -> ms
+        self.ramas = {}            # rama de la cascada -> ms de su primer mensaje
+        self.avisos = []
+        self.creado_en = time.time()
+        self._inicio = time.perf_counter()
+        self.listo_en_s = None
+
+    @property
+    def listo(self) -> bool:
+        return self.estado == "listo"
+
+    @contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nombre] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    async def _opcional(self, nombre, trabajo):
+        # Las fases opcionales no impiden quedar listo: solo dejan un aviso
+        with self.fase(nombre):
+            try:
+                await trabajo
+            except Exception as e:
+                self.avisos.append(f"{nombre}: {e}")
+                print(f"⚠️ Calentamiento '{nombre}' falló: {e}")
+
+    # -----------------------------
+    # Fases
+    # -----------------------------
+    async def ejecutar(self, catalogo, calentar=CALENTAR):
+        """Corre en su propia tarea después de cargar el catálogo."""
+        self.estado = "calentando"
+        await self._opcional("llm_cliente", asyncio.to_thread(obtener_gateway))
+        gateway = obtener_gateway()
+        if calentar:
+            await self._opcional("conocimiento", self._conocimiento(catalogo))
+            await self._opcional("render", self._render(catalogo))
+            await self._opcional("ramas", self._ramas(catalogo))
+            if gateway is not None and CALENTAR_LLM:
+                await self._opcional("llm", self._llm(gateway))
+        if self.estado == "calentando":
+            self.estado = "listo"
+            self.listo_en_s = round(time.perf_counter() - self._inicio, 3)
+            print(f"🔥 Worker listo en {self.listo_en_s:.2f} s ({self.fases}).")
+
+    async def _conocimiento(self, catalogo):
+        await asyncio.to_thread(len, catalogo.conocimiento)  # carga perezosa de aprendido.json
+
+    async def _render(self, catalogo):
+        listar_carreras(catalogo)
+        for carrera in catalogo.carreras:
+            materias_todas(carrera["nombre"], catalogo)
+
+    async def _ramas(self, catalogo):
+        usuario = f"__calentamiento_{os.getpid()}__"
+        # Todo solo en esta tarea
+        fijar_sin_llm()
+        fijar_sin_metricas()
+        await en_almacen(obtener_memoria, usuario)  # abre el almacén compartido (SQLite: hilo y conexión)
+        usar_store_propio()
+        for rama, mensaje in _guion(catalogo):
+            inicio = time.perf_counter()
+            await generar_respuesta(mensaje, usuario, catalogo)
+            self.ramas.setdefault(rama, round((time.perf_counter() - inicio) * 1000, 2))
+
+    async def _llm(self, gateway):
+        # Fuera del control de admisión: abre la conexión (SDK / pool de httpx)
+        if not await gateway.generar(PROMPT_PING):
+            raise RuntimeError("el LLM no respondió (se seguirá con el CSV)")
+
+    def detener(self):
+        self.estado = "deteniendo"
+
+    def a_dict(self):
+        return {
+            "estado": self.estado,
+            "listo_en_s": self.listo_en_s,
+            "fases_ms": self.fases,
+            "ramas_ms": self.ramas,
+            "avisos": self.avisos,
+            "activo_s": round(time.time() - self.creado_en, 1),
+        }
+
+
+def indicadores(calentamiento):
+    Indicador("aulabot_listo", "1 si el worker terminó de calentar y recibe tráfico", lambda: int(calentamiento.listo))
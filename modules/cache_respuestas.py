@@ -0,0 +1,170 @@
+# ---------------------------------------------------------
+# Caché de respuestas del LLM (TTL + LRU)
+# ---------------------------------------------------------
+# La llave es (hash del contexto oficial normalizado, pregunta normalizada).
+# El nombre del alumno se reemplaza por un marcador antes de guardar, así
+# "Dile a Ana la lista" y "Dile a Luis la lista" comparten la misma entrada.
+# Solo se reemplaza el nombre como palabra completa: "Ing" no toca "Ingeniería"
+# ni "Ana" toca "Mariana Anaya".
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from modules.normalizacion import quitar_acentos
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin candado entre procesos
+    fcntl = None
+
+MARCADOR_NOMBRE = "⟨nombre⟩"
+
+_NO_ALFANUMERICO = re.compile(r"[^\w⟨⟩]+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos ni signos, espacios colapsados."""
+    return " ".join(_NO_ALFANUMERICO.sub(" ", quitar_acentos(texto.lower())).split())
+
+
+@lru_cache(maxsize=1024)
+def _huella(contexto):
+    """sha1 del contexto normalizado; los contextos salen del catálogo y se repiten."""
+    return hashlib.sha1(normalizar(contexto).encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1024)
+def _patron_nombre(nombre):
+    return re.compile(rf"\b{re.escape(nombre)}\b")
+
+
+def _sin_nombre(texto, nombre):
+    """Pone el marcador donde aparece el nombre como palabra; si no aparece, el texto queda igual."""
+    if nombre and len(nombre) > 1:
+        return _patron_nombre(nombre).sub(MARCADOR_NOMBRE, texto)
+    return texto
+
+
+def _con_nombre(texto, nombre):
+    if MARCADOR_NOMBRE not in texto:
+        return texto
+    return texto.replace(MARCADOR_NOMBRE, nombre or "")
+
+
+class CacheRespuestas:
+    """
+    Respuestas generadas por el LLM, acotadas en tamaño y con expiración.
+    Opcionalmente se persisten a disco (JSON, escritura atómica). Varios
+    workers pueden compartir la ruta: persistir() mezcla con lo que ya está
+    en el archivo en vez de pisarlo.
+    """
+
+    def __init__(self, max_entradas=2048, ttl=6 * 3600, ruta=None, guardar_cada=50):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.ruta = ruta
+        self.guardar_cada = guardar_cada
+        self._entradas = OrderedDict()  # llave -> (expira_en, texto con marcador)
+        self._sin_guardar = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expiradas = 0
+        self.desalojadas = 0
+        if ruta:
+            self.cargar()
+
+    @staticmethod
+    def llave(contexto, pregunta, nombre=None):
+        return f"{_huella(contexto or '')}:{normalizar(_sin_nombre(pregunta, nombre))}"
+
+    def obtener(self, contexto, pregunta, nombre=None):
+        llave = self.llave(contexto, pregunta, nombre)
+        entrada = self._entradas.get(llave)
+        if entrada is None:
+            self.fallos += 1
+            return None
+        expira_en, texto = entrada
+        if expira_en < time.time():
+            del self._entradas[llave]
+            self.expiradas += 1
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(llave)
+        self.aciertos += 1
+        return _con_nombre(texto, nombre)
+
+    def guardar(self, contexto, pregunta, texto, nombre=None):
+        llave = self.llave(contexto, pregunta, nombre)
+        self._entradas[llave] = (time.time() + self.ttl, _sin_nombre(texto, nombre))
+        self._entradas.move_to_end(llave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.desalojadas += 1
+        self._sin_guardar += 1
+        if self.ruta and self._sin_guardar >= self.guardar_cada:
+            self.persistir()
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    # -----------------------------
+    # Persistencia opcional
+    # -----------------------------
+    def _leer(self):
+        """Entradas vigentes del archivo, en el orden en que se guardaron."""
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return []
+        ahora = time.time()
+        return [(llave, expira_en, texto) for llave, expira_en, texto in datos if expira_en > ahora]
+
+    def _recortar(self):
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def cargar(self):
+        if not self.ruta:
+            return
+        for llave, expira_en, texto in self._leer():
+            self._entradas[llave] = (expira_en, texto)
+        self._recortar()
+
+    def persistir(self):
+        """Mezcla con el archivo (lo de otros workers queda) y lo reemplaza."""
+        if not self.ruta:
+            return
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        with open(f"{self.ruta}.lock", "a") as candado:
+            if fcntl:
+                fcntl.flock(candado, fcntl.LOCK_EX)
+            # Lo del disco va primero (más viejo en el LRU); lo propio gana si es más reciente
+            mezcla = OrderedDict()
+            for llave, expira_en, texto in self._leer():
+                mezcla[llave] = (expira_en, texto)
+            for llave, entrada in self._entradas.items():
+                if llave not in mezcla or mezcla[llave][0] <= entrada[0]:
+                    mezcla[llave] = entrada
+                mezcla.move_to_end(llave)
+            self._entradas = mezcla
+            self._recortar()
+            tmp = f"{self.ruta}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump([[llave, expira_en, texto] for llave, (expira_en, texto) in self._entradas.items()], f, ensure_ascii=False)
+            os.replace(tmp, self.ruta)
+        self._sin_guardar = 0
+
+    def estadisticas(self):
+        return {
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "expiradas": self.expiradas,
+            "desalojadas": self.desalojadas,
+        }
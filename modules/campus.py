@@ -0,0 +1,144 @@
+# ---------------------------------------------------------
+# Varios campus en un solo proceso
+# ---------------------------------------------------------
+# El campus por defecto es data/ (siempre cargado). Los demás viven en
+# data/campus/<id>/ con los mismos archivos (más sinonimos.json y campus.json
+# opcionales) y cada uno trae su propio Catálogo: índices, BM25, detector de
+# sinónimos, nombre de la institución y versión (la caché de render va por
+# versión). Lo aprendido y las preguntas sin respuesta también se guardan en
+# el directorio de cada campus.
+# Se cargan la primera vez que alguien los pide, en un hilo y con un candado
+# por campus para no cargarlos dos veces. Para acotar la memoria se descargan
+# por LRU cuando hay más de max_cargados y por inactividad (ttl).
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+
+from modules.funciones import invalidar_cache_render, soltar_almacenes
+from modules.metricas import Indicador
+from modules.recarga import INTERVALO_RECARGA, VigilanteCatalogo, firma_archivos
+
+CAMPUS_POR_DEFECTO = os.getenv("AULABOT_CAMPUS", "itsch")
+MAX_CAMPUS_CARGADOS = int(os.getenv("AULABOT_MAX_CAMPUS", "16"))
+# Segundos sin peticiones antes de descargar un campus (0 = solo LRU)
+TTL_CAMPUS = float(os.getenv("AULABOT_CAMPUS_TTL", "1800"))
+
+_ID_VALIDO = re.compile(r"^[a-z0-9_-]{1,40}$")
+
+
+class RegistroCampus:
+    def __init__(self, directorio_data, por_defecto=CAMPUS_POR_DEFECTO, max_cargados=MAX_CAMPUS_CARGADOS,
+                 ttl=TTL_CAMPUS, intervalo=INTERVALO_RECARGA):
+        self.directorio_data = directorio_data
+        self.por_defecto = por_defecto
+        self.max_cargados = max(max_cargados, 1)
+        self.ttl = ttl
+        self.intervalo = intervalo
+        self.principal = VigilanteCatalogo(directorio_data, intervalo)
+        self._cargados = OrderedDict()  # id -> VigilanteCatalogo (el más reciente al final)
+        self._ultimo_uso = {}
+        self._candados = {}
+        self.cargas = 0
+        self.descargas = 0
+
+    def directorio(self, campus):
+        return os.path.join(self.directorio_data, "campus", campus)
+
+    # -----------------------------
+    # Camino de la petición
+    # -----------------------------
+    async def obtener(self, campus=None):
+        """Catálogo del campus (cargándolo si hace falta); None si no existe."""
+        if not campus or campus == self.por_defecto:
+            return self.principal.actual
+
+        vigilante = self._cargados.get(campus)
+        if vigilante is None:
+            vigilante = await self._cargar(campus)
+            if vigilante is None:
+                return None
+        self._cargados.move_to_end(campus)
+        self._ultimo_uso[campus] = time.monotonic()
+        return vigilante.actual
+
+    async def _cargar(self, campus):
+        if not _ID_VALIDO.match(campus):
+            return None
+        directorio = self.directorio(campus)
+        if firma_archivos(directorio) is None:
+            return None
+
+        candado = self._candados.setdefault(campus, asyncio.Lock())
+        async with candado:
+            # Otra petición pudo cargarlo mientras se esperaba el candado
+            vigilante = self._cargados.get(campus)
+            if vigilante is not None:
+                return vigilante
+            vigilante = await asyncio.to_thread(VigilanteCatalogo, directorio, self.intervalo)
+            self._cargados[campus] = vigilante
+            self._ultimo_uso[campus] = time.monotonic()
+            self.cargas += 1
+            print(f"🏫 Campus '{campus}' cargado ({vigilante.duracion_carga * 1000:.0f} ms).")
+
+        while len(self._cargados) > self.max_cargados:
+            self._descargar(next(iter(self._cargados)))
+        return vigilante
+
+    def _descargar(self, campus):
+        vigilante = self._cargados.pop(campus, None)
+        self._ultimo_uso.pop(campus, None)
+        self._candados.pop(campus, None)
+        if vigilante is None:
+            return
+        # Las peticiones en curso conservan su referencia; aquí se sueltan los textos,
+        # el índice de lo aprendido y el hilo de preguntas sin respuesta
+        invalidar_cache_render(vigilante.actual.version)
+        soltar_almacenes(vigilante.directorio)
+        self.descargas += 1
+
+    def barrer(self):
+        """Descarga los campus sin uso en los últimos `ttl` segundos."""
+        if self.ttl <= 0:
+            return 0
+        limite = time.monotonic() - self.ttl
+        inactivos = [c for c, t in self._ultimo_uso.items() if t < limite]
+        for campus in inactivos:
+            self._descargar(campus)
+        return len(inactivos)
+
+    # -----------------------------
+    # Tarea de fondo
+    # -----------------------------
+    async def vigilar(self):
+        """Recarga en caliente de todos los campus cargados y barrido por inactividad."""
+        pausa = self.intervalo if self.intervalo > 0 else min(self.ttl, 60) or 60
+        while True:
+            await asyncio.sleep(pausa)
+            if self.intervalo > 0:
+                for vigilante in [self.principal, *self._cargados.values()]:
+                    try:
+                        await vigilante.revisar()
+                    except Exception as e:
+                        print(f"⚠️ Error revisando {vigilante.directorio}: {e}")
+            self.barrer()
+
+    def estado(self):
+        ahora = time.monotonic()
+        return {
+            "por_defecto": self.por_defecto,
+            "cargados": {
+                campus: {**v.estado(), "inactivo_s": round(ahora - self._ultimo_uso.get(campus, ahora), 1)}
+                for campus, v in self._cargados.items()
+            },
+            "max_cargados": self.max_cargados,
+            "ttl_s": self.ttl,
+            "cargas": self.cargas,
+            "descargas": self.descargas,
+        }
+
+
+def indicadores(registro):
+    Indicador("aulabot_campus_cargados", "Campus con catálogo en memoria (sin contar el por defecto)", lambda: len(registro._cargados))
+    Indicador("aulabot_campus_descargas", "Campus descargados por LRU o inactividad", lambda: registro.descargas)
@@ -0,0 +1,143 @@
+# ---------------------------------------------------------
+# Catálogo académico indexado (se construye una sola vez)
+# ---------------------------------------------------------
+# Los CSV llegan como listas de diccionarios. En lugar de recorrerlas en
+# cada mensaje, aquí se precalculan índices por carrera, semestre, nombre
+# de materia y clave para que cada consulta sea una búsqueda en dict.
+import itertools
+
+from rapidfuzz import fuzz, process
+
+from modules.coincidencias import DetectorGeneral, procesar_consulta, procesar_opcion
+from modules.funciones import almacenes_de
+from modules.normalizacion import limpiar_texto
+from modules.sinonimos import detector_por_defecto
+from modules.recuperacion import construir_indice
+
+# Cada catálogo construido recibe una versión nueva (sirve de llave de caché)
+_versiones = itertools.count(1)
+
+# Nombre con el que se presenta AulaBot si el campus no trae campus.json
+INSTITUCION_POR_DEFECTO = "ITSCH"
+
+
+def normalizar_clave(texto) -> str:
+    """Forma canónica para usar como llave de índice (sin espacios extra, en minúsculas)."""
+    return (texto or "").strip().lower()
+
+
+def orden_semestre(semestre: str):
+    """Primero los semestres numéricos en orden, luego los textos (ej. 'Especialidad')."""
+    return (0, int(semestre), "") if semestre.isdigit() else (1, 0, semestre)
+
+
+class Catalogo:
+    """
+    Vista indexada e inmutable de general.csv, carreras.csv, materias.csv
+    y del informe institucional.
+    """
+
+    def __init__(self, general, carreras, materias, informe="", indice=None, detector=None,
+                 institucion=None, directorio=None):
+        self.version = next(_versiones)
+        # Intención y carrera (sinónimos propios del campus o los compartidos)
+        self.detector = detector or detector_por_defecto()
+        self.institucion = institucion or INSTITUCION_POR_DEFECTO
+        # Lo aprendido y las preguntas sin respuesta son del campus (sobreviven a las recargas).
+        # Sin directorio (p. ej. al compilar el snapshot) no hay almacenes: ese catálogo no atiende mensajes
+        self.directorio = directorio
+        self.conocimiento, self.ignorancia = almacenes_de(directorio) if directorio else (None, None)
+        self.general = general
+        self.carreras = carreras
+        self.materias = materias
+
+        # Palabras clave de general.csv ya limpias (paso 9 de generar_respuesta)
+        self.detector_general = DetectorGeneral(
+            [limpiar_texto(item['palabra_clave']) for item in general],
+            [item['respuesta'] for item in general],
+        )
+
+        # Índice BM25 sobre general.csv + informe_institucional.txt (o el del snapshot)
+        self.indice = indice if indice is not None else construir_indice(general, informe)
+
+        # Carreras por nombre normalizado
+        self._carreras = {}
+        for carrera in carreras:
+            self._carreras.setdefault(normalizar_clave(carrera.get('nombre')), carrera)
+
+        # Materias agrupadas por carrera y por (carrera, semestre)
+        self._materias_carrera = {}
+        self._materias_semestre = {}
+        self._materias_nombre = {}
+        self._materias_clave = {}
+        for materia in materias:
+            carrera = normalizar_clave(materia.get('carrera'))
+            semestre = (materia.get('semestre') or '').strip()
+            self._materias_carrera.setdefault(carrera, []).append(materia)
+            self._materias_semestre.setdefault((carrera, semestre), []).append(materia)
+            self._materias_nombre.setdefault((carrera, normalizar_clave(materia.get('materia'))), materia)
+            if materia.get('clave'):
+                self._materias_clave.setdefault(normalizar_clave(materia['clave']), materia)
+
+        # Orden de semestres y listas ya ordenadas (sort estable, igual que antes)
+        self._semestres = {}
+        for carrera, filas in self._materias_carrera.items():
+            filas.sort(key=lambda m: orden_semestre((m.get('semestre') or '').strip()))
+            self._semestres[carrera] = sorted(
+                {(m.get('semestre') or '').strip() for m in filas}, key=orden_semestre
+            )
+
+        # Nombres de materias por carrera (para el fuzzy del contexto activo)
+        self._nombres_materias = {
+            carrera: [m['materia'] for m in filas]
+            for carrera, filas in self._materias_carrera.items()
+        }
+        # ...y ya preprocesados como lo haría thefuzz, para no repetirlo en cada mensaje
+        self._materias_procesadas = {
+            carrera: [procesar_opcion(nombre) for nombre in nombres]
+            for carrera, nombres in self._nombres_materias.items()
+        }
+
+    # -----------------------------
+    # Consultas
+    # -----------------------------
+    def carrera(self, nombre):
+        """Fila de carreras.csv para ese nombre, o None."""
+        return self._carreras.get(normalizar_clave(nombre))
+
+    def materias_de(self, carrera):
+        """Materias de una carrera, ya ordenadas por semestre."""
+        return self._materias_carrera.get(normalizar_clave(carrera), [])
+
+    def materias_en_semestre(self, carrera, semestre):
+        return self._materias_semestre.get((normalizar_clave(carrera), str(semestre).strip()), [])
+
+    def semestres_de(self, carrera):
+        """Semestres de la carrera en orden (numéricos primero)."""
+        return self._semestres.get(normalizar_clave(carrera), [])
+
+    def nombres_materias(self, carrera):
+        return self._nombres_materias.get(normalizar_clave(carrera), [])
+
+    def mejor_materia(self, carrera, mensaje_limpio):
+        """
+        (nombre, score) de la materia más parecida al mensaje; mismo resultado que
+        thefuzz.process.extractOne(mensaje, nombres_materias(carrera), scorer=token_set_ratio).
+        """
+        llave = normalizar_clave(carrera)
+        procesadas = self._materias_procesadas.get(llave)
+        if not procesadas:
+            return None, 0
+        _, score, i = process.extractOne(procesar_consulta(mensaje_limpio), procesadas,
+                                         scorer=fuzz.token_set_ratio, processor=None)
+        return self._nombres_materias[llave][i], int(round(score))
+
+    def materia(self, carrera, nombre):
+        return self._materias_nombre.get((normalizar_clave(carrera), normalizar_clave(nombre)))
+
+    def materia_por_clave(self, clave):
+        return self._materias_clave.get(normalizar_clave(clave))
+
+    def buscar_pasajes(self, consulta, k=3):
+        """Pasajes del informe / general.csv más relevantes para la consulta (BM25)."""
+        return self.indice.buscar(consulta, k)
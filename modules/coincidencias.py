@@ -0,0 +1,200 @@
+# ---------------------------------------------------------
+# Detector de intenciones y carreras (sinónimos precalculados)
+# ---------------------------------------------------------
+# Equivale a la referencia con thefuzz de benchmarks/bench_coincidencias.py
+# sobre INTENCIONES y sobre SINONIMOS_CARRERAS, pero los sinónimos se
+# normalizan y tokenizan una sola vez y cada mensaje se evalúa en una pasada
+# para ambos diccionarios.
+# Para lotes de mensajes se calcula la matriz completa con rapidfuzz.cdist
+# (numpy se importa solo en esa ruta: no pesa en el arranque del worker).
+import itertools
+from collections import OrderedDict, namedtuple
+
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+UMBRAL_COINCIDENCIA = 70
+
+# thefuzz elimina los caracteres 128-255 antes de comparar (force_ascii)
+_SOLO_ASCII = {i: None for i in range(128, 256)}
+
+Deteccion = namedtuple("Deteccion", ["intencion", "carrera"])
+
+
+def procesar_opcion(texto: str) -> str:
+    """Preprocesado que thefuzz aplica a cada sinónimo."""
+    return default_process(texto.translate(_SOLO_ASCII))
+
+
+def procesar_consulta(texto: str) -> str:
+    """Preprocesado que thefuzz aplica al mensaje (su processor corre dos veces)."""
+    return default_process(default_process(texto).translate(_SOLO_ASCII))
+
+
+class _CacheLRU:
+    """Resultados por mensaje, acotados (se puede sembrar desde los lotes)."""
+
+    def __init__(self, tam):
+        self.tam = tam
+        self._datos = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, llave):
+        valor = self._datos.get(llave)
+        if valor is None:
+            self.fallos += 1
+            return None
+        self._datos.move_to_end(llave)
+        self.aciertos += 1
+        return valor
+
+    def guardar(self, llave, valor):
+        self._datos[llave] = valor
+        self._datos.move_to_end(llave)
+        if len(self._datos) > self.tam:
+            self._datos.popitem(last=False)
+
+    def __contains__(self, llave):
+        return llave in self._datos
+
+    def estadisticas(self):
+        return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": len(self._datos)}
+
+
+class _TablaSinonimos:
+    """Sinónimos de un diccionario ya procesados y tokenizados."""
+
+    def __init__(self, diccionario):
+        self.claves = list(diccionario)
+        self.opciones = [[procesar_opcion(s) for s in sinonimos] for sinonimos in diccionario.values()]
+        self.tokens = [[frozenset(o.split()) for o in opciones] for opciones in self.opciones]
+        # Versión aplanada para cdist: columnas agrupadas por clave
+        self.planas = [o for opciones in self.opciones for o in opciones]
+        self.cortes = list(itertools.accumulate([0] + [len(o) for o in self.opciones[:-1]]))
+
+    def _primera_exacta(self, tokens_mensaje):
+        """
+        Índice de la primera clave con un sinónimo cuyos tokens están contenidos
+        en el mensaje (o al revés). Para token_set_ratio eso vale 100 sin calcular nada.
+        """
+        if not tokens_mensaje:
+            return None
+        for i, conjuntos in enumerate(self.tokens):
+            for tokens in conjuntos:
+                if tokens and (tokens <= tokens_mensaje or tokens_mensaje <= tokens):
+                    return i
+        return None
+
+    def mejor(self, consulta, tokens_mensaje, umbral=UMBRAL_COINCIDENCIA):
+        exacta = self._primera_exacta(tokens_mensaje)
+        limite = len(self.claves) if exacta is None else exacta
+
+        # Solo las claves anteriores a la exacta pueden ganarle (empate = gana la primera)
+        mejor_opcion, mejor_score = None, 0
+        for i in range(limite):
+            _, score, _ = process.extractOne(consulta, self.opciones[i], scorer=fuzz.token_set_ratio, processor=None)
+            score = int(round(score))
+            if score > mejor_score:
+                mejor_score = score
+                mejor_opcion = self.claves[i]
+        if exacta is not None and mejor_score < 100:
+            mejor_opcion, mejor_score = self.claves[exacta], 100
+        return mejor_opcion if mejor_score >= umbral else None
+
+    def mejor_lote(self, consultas, umbral=UMBRAL_COINCIDENCIA):
+        """Mismo resultado que mejor() para cada consulta, calculado como matriz."""
+        import numpy as np
+        matriz = process.cdist(consultas, self.planas, scorer=fuzz.token_set_ratio,
+                               processor=None, dtype=np.float64, workers=-1)
+        # Máximo por clave, redondeado como thefuzz; argmax devuelve la primera en empate
+        por_clave = np.round(np.maximum.reduceat(matriz, self.cortes, axis=1))
+        ganadoras = por_clave.argmax(axis=1)
+        puntajes = por_clave[np.arange(len(consultas)), ganadoras]
+        return [self.claves[g] if p >= umbral and p > 0 else None for g, p in zip(ganadoras, puntajes)]
+
+
+class DetectorCoincidencias:
+    """
+    Detecta intención y carrera de un mensaje ya limpio (ver limpiar_texto).
+    Los resultados se memorizan por mensaje.
+    """
+
+    def __init__(self, intenciones, carreras, tam_cache=4096):
+        self._intenciones = _TablaSinonimos(intenciones)
+        self._carreras = _TablaSinonimos(carreras)
+        self._cache = _CacheLRU(tam_cache)
+
+    def detectar(self, mensaje_limpio: str) -> Deteccion:
+        deteccion = self._cache.obtener(mensaje_limpio)
+        if deteccion is None:
+            deteccion = self._detectar(mensaje_limpio)
+            self._cache.guardar(mensaje_limpio, deteccion)
+        return deteccion
+
+    def _detectar(self, mensaje_limpio: str) -> Deteccion:
+        consulta = procesar_consulta(mensaje_limpio)
+        tokens = frozenset(consulta.split())
+        return Deteccion(
+            self._intenciones.mejor(consulta, tokens),
+            self._carreras.mejor(consulta, tokens),
+        )
+
+    def match_many(self, mensajes_limpios):
+        """
+        Versión por lotes: los mensajes que no están en caché se puntúan juntos
+        con una sola matriz (cdist) por diccionario. Devuelve una Deteccion por mensaje.
+        """
+        pendientes = list(dict.fromkeys(m for m in mensajes_limpios if m not in self._cache))
+        if pendientes:
+            consultas = [procesar_consulta(m) for m in pendientes]
+            intenciones = self._intenciones.mejor_lote(consultas)
+            carreras = self._carreras.mejor_lote(consultas)
+            for mensaje, intencion, carrera in zip(pendientes, intenciones, carreras):
+                self._cache.guardar(mensaje, Deteccion(intencion, carrera))
+        return [self.detectar(m) for m in mensajes_limpios]
+
+    def estadisticas(self):
+        return self._cache.estadisticas()
+
+
+class DetectorGeneral:
+    """
+    Mejor fila de general.csv para un mensaje (partial_ratio contra la
+    palabra clave ya limpia), con caché por mensaje y versión por lotes.
+    """
+
+    def __init__(self, palabras_clave_limpias, respuestas, tam_cache=4096):
+        self.palabras = list(palabras_clave_limpias)
+        self.respuestas = list(respuestas)
+        self._cache = _CacheLRU(tam_cache)
+
+    def mejor(self, mensaje_limpio):
+        """(respuesta, score) de la primera fila con mayor puntaje; (None, 0) si no hay filas."""
+        resultado = self._cache.obtener(mensaje_limpio)
+        if resultado is None:
+            mejor_match, mejor_score = None, 0
+            for palabra, respuesta in zip(self.palabras, self.respuestas):
+                score = int(round(fuzz.partial_ratio(palabra, mensaje_limpio)))
+                if score > mejor_score:
+                    mejor_score = score
+                    mejor_match = respuesta
+            resultado = (mejor_match, mejor_score)
+            self._cache.guardar(mensaje_limpio, resultado)
+        return resultado
+
+    def match_many(self, mensajes_limpios):
+        pendientes = list(dict.fromkeys(m for m in mensajes_limpios if m not in self._cache))
+        if pendientes and self.palabras:
+            import numpy as np
+            # filas = palabras clave, columnas = mensajes (mismo orden de argumentos que partial_ratio)
+            matriz = np.round(process.cdist(self.palabras, pendientes, scorer=fuzz.partial_ratio,
+                                            processor=None, dtype=np.float64, workers=-1))
+            ganadoras = matriz.argmax(axis=0)
+            for j, mensaje in enumerate(pendientes):
+                score = int(matriz[ganadoras[j], j])
+                self._cache.guardar(mensaje, (self.respuestas[ganadoras[j]], score) if score > 0 else (None, 0))
+        return [self.mejor(m) for m in mensajes_limpios]
+
+    def estadisticas(self):
+        return self._cache.estadisticas()
@@ -0,0 +1,206 @@
+# ---------------------------------------------------------
+# Conocimiento adquirido (aprendido.json) en memoria
+# ---------------------------------------------------------
+# Se carga una vez, se consulta con un índice preprocesado y las respuestas
+# nuevas se agregan a un log (una línea JSON por entrada). Cada cierto número
+# de entradas el log se compacta al JSON con escritura atómica (tmp + rename).
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from rapidfuzz import fuzz, process
+
+from modules.coincidencias import procesar_consulta, procesar_opcion
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin candado entre procesos
+    fcntl = None
+
+UMBRAL_CONOCIMIENTO = 85
+
+
+def _firma(procesada: str) -> str:
+    """Tokens ordenados: dos preguntas con la misma firma tienen token_sort_ratio 100."""
+    return " ".join(sorted(procesada.split()))
+
+
+class KnowledgeStore:
+    """
+    Preguntas aprendidas -> respuesta, con búsqueda fuzzy (token_sort_ratio).
+    Seguro para varios hilos; entre procesos se comparte a través del log.
+    """
+
+    def __init__(self, ruta_json, compactar_cada=100, intervalo_sync=5.0):
+        self.ruta_json = ruta_json
+        self.ruta_log = os.path.splitext(ruta_json)[0] + ".log"
+        self.ruta_candado = ruta_json + ".lock"
+        self.compactar_cada = compactar_cada
+        self.intervalo_sync = intervalo_sync
+
+        self._lock = threading.RLock()
+        self._cargado = False
+        self._datos = {}
+        self._preguntas = []
+        self._procesadas = []
+        self._firmas = {}
+        self._offset_log = 0
+        self._mtime_json = None
+        self._ultimo_sync = 0.0
+        self._pendientes = 0
+
+    # -----------------------------
+    # Carga e índice
+    # -----------------------------
+    def _indexar(self, pregunta, respuesta):
+        if pregunta not in self._datos:
+            procesada = procesar_opcion(pregunta)
+            self._preguntas.append(pregunta)
+            self._procesadas.append(procesada)
+            self._firmas.setdefault(_firma(procesada), pregunta)
+        self._datos[pregunta] = respuesta
+
+    def _leer_log(self, desde=0):
+        """Aplica las entradas del log a partir de `desde` bytes. Devuelve el nuevo offset."""
+        if not os.path.exists(self.ruta_log):
+            return 0
+        with open(self.ruta_log, "rb") as f:
+            f.seek(desde)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # línea a medio escribir por otro proceso
+                desde += len(linea)
+                try:
+                    entrada = json.loads(linea)
+                    self._indexar(entrada["p"], entrada["r"])
+                except (ValueError, KeyError):
+                    continue
+        return desde
+
+    def _mtime(self):
+        # Con el inodo: cada compactación instala un archivo nuevo (os.replace)
+        try:
+            st = os.stat(self.ruta_json)
+            return st.st_ino, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def _cargar(self):
+        self._mtime_json = self._mtime()
+        self._datos, self._preguntas, self._procesadas, self._firmas = {}, [], [], {}
+        if os.path.exists(self.ruta_json):
+            try:
+                with open(self.ruta_json, "r", encoding="utf-8") as f:
+                    for pregunta, respuesta in json.load(f).items():
+                        self._indexar(pregunta, respuesta)
+            except (OSError, ValueError):
+                pass
+        self._offset_log = self._leer_log()
+        self._ultimo_sync = time.monotonic()
+        self._cargado = True
+
+    def _sincronizar(self):
+        """Carga perezosa + lectura incremental de lo que otros procesos agregaron al log."""
+        if not self._cargado:
+            self._cargar()
+            return
+        if time.monotonic() - self._ultimo_sync < self.intervalo_sync:
+            return
+        self._ultimo_sync = time.monotonic()
+        self._ponerse_al_dia()
+
+    def _ponerse_al_dia(self):
+        """Recarga todo si otro proceso compactó; si no, lee lo nuevo del log."""
+        tam = os.path.getsize(self.ruta_log) if os.path.exists(self.ruta_log) else 0
+        if self._mtime() != self._mtime_json or tam < self._offset_log:
+            self._cargar()  # el offset ya no vale: el log se vació y el JSON es otro
+        elif tam > self._offset_log:
+            self._offset_log = self._leer_log(self._offset_log)
+
+    @contextmanager
+    def _candado(self):
+        """Candado entre procesos (workers de uvicorn) sobre el log."""
+        os.makedirs(os.path.dirname(self.ruta_json) or ".", exist_ok=True)
+        with open(self.ruta_candado, "a") as candado:
+            if fcntl:
+                fcntl.flock(candado, fcntl.LOCK_EX)
+            yield
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def buscar(self, mensaje, umbral=UMBRAL_CONOCIMIENTO):
+        """Respuesta aprendida más parecida al mensaje, o None."""
+        with self._lock:
+            self._sincronizar()
+            if not self._preguntas:
+                return None
+            consulta = procesar_consulta(mensaje)
+            exacta = self._firmas.get(_firma(consulta))
+            if exacta is not None:
+                return self._datos[exacta]
+            _, score, indice = process.extractOne(consulta, self._procesadas, scorer=fuzz.token_sort_ratio, processor=None)
+            if int(round(score)) > umbral:
+                return self._datos[self._preguntas[indice]]
+            return None
+
+    def agregar(self, pregunta, respuesta):
+        linea = json.dumps({"p": pregunta, "r": respuesta}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._sincronizar()
+            with self._candado():
+                # Antes de escribir: con una vista vieja el offset apuntaría más allá del log
+                self._ponerse_al_dia()
+                with open(self.ruta_log, "ab") as f:
+                    f.write(linea.encode("utf-8"))
+                # Incluye nuestra línea y lo que otros procesos hayan agregado
+                self._offset_log = self._leer_log(self._offset_log)
+            self._pendientes += 1
+            if self._pendientes >= self.compactar_cada:
+                self.compactar()
+
+    def compactar(self):
+        """Vuelca todo a aprendido.json (tmp + os.replace) y vacía el log."""
+        with self._lock:
+            with self._candado():
+                # Lo que otros procesos agregaron o compactaron: nunca volcar una vista vieja
+                self._ponerse_al_dia()
+                tmp = f"{self.ruta_json}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self._datos, f, ensure_ascii=False, indent=4)
+                os.replace(tmp, self.ruta_json)
+                open(self.ruta_log, "wb").close()
+                self._mtime_json = self._mtime()
+                self._offset_log = 0
+                self._pendientes = 0
+
+    def reemplazar(self, datos, vistas):
+        """
+        Instala un almacén depurado fuera de línea (modules/depuracion.py).
+        Las preguntas que llegaron después de leer `vistas` se conservan tal
+        cual. Devuelve cuántas fueron.
+        """
+        with self._lock:
+            with self._candado():
+                self._cargar()  # JSON + log completos, con lo que otros procesos agregaron
+                nuevas = {p: r for p, r in self._datos.items() if p not in vistas}
+                tmp = f"{self.ruta_json}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({**datos, **nuevas}, f, ensure_ascii=False, indent=4)
+                os.replace(tmp, self.ruta_json)
+                open(self.ruta_log, "wb").close()
+                self._cargar()
+                self._pendientes = 0
+            return len(nuevas)
+
+    def todo(self) -> dict:
+        with self._lock:
+            self._sincronizar()
+            return dict(self._datos)
+
+    def __len__(self):
+        with self._lock:
+            self._sincronizar()
+            return len(self._datos)
@@ -0,0 +1,268 @@
+# ---------------------------------------------------------
+# Depuración del conocimiento aprendido (trabajo fuera de línea)
+# ---------------------------------------------------------
+# `python -m modules.depuracion [data/aprendido.json]` junta las preguntas
+# casi repetidas ("cuanto cuesta la ficha" / "cuánto cuesta ficha?") en una
+# sola entrada y reescribe el almacén compactado. Pasos:
+#   1. Normalizar: minúsculas, sin acentos ni signos, sin artículos y
+#      preposiciones y plural simple. Las preguntas con las mismas palabras
+#      (en cualquier orden) ya son el mismo grupo.
+#   2. MinHash sobre trigramas de bytes de cada forma distinta (numpy, por
+#      bloques) y LSH por bandas: solo se comparan las formas que caen en la
+#      misma cubeta de alguna banda (subcuadrático en vez de n²).
+#   3. Verificar cada candidato con rapidfuzz (ratio en orden u ordenado,
+#      los números deben coincidir) y unir con union-find; dos grupos solo se
+#      unen si también sus raíces se parecen (sin cadenas largas).
+#   4. Por grupo: la pregunta canónica es la de la forma más común (y la
+#      más corta) y la respuesta, la más repetida (o la más reciente).
+# Las preguntas que lleguen mientras corre se conservan (KnowledgeStore.reemplazar).
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+from rapidfuzz import fuzz
+
+from modules.normalizacion import quitar_acentos
+
+UMBRAL_FUSION = 90
+PERMUTACIONES = 64
+FILAS_POR_BANDA = 4
+BLOQUE_MINHASH = 1024
+MAX_REPRESENTANTES = 8  # comparaciones por elemento dentro de una cubeta
+
+# Palabras que no cambian la pregunta; las interrogativas (cuándo/dónde) sí se quedan
+_RELLENO = frozenset("""
+a al ante con de del e el en la las le les lo los me mi mis o para por se su sus te u un una unas uno unos y
+es son esta estan favor porfa porfavor oye
+""".split())
+_NUMERO = re.compile(r"\d+")
+_PALABRA = re.compile(r"[^\W_]+")
+
+
+def forma_normalizada(pregunta: str) -> str:
+    """Palabras significativas en su orden (sin acentos, signos ni relleno)."""
+    tokens = []
+    for t in _PALABRA.findall(quitar_acentos(pregunta.lower())):
+        if len(t) > 4 and t.endswith("s"):
+            t = t[:-1]
+        if t not in _RELLENO:
+            tokens.append(t)
+    return " ".join(tokens)
+
+
+def _llave(forma: str) -> str:
+    """Mismas palabras en cualquier orden (y repetidas) -> misma llave."""
+    return " ".join(sorted(set(forma.split())))
+
+
+def _parecidas(a: str, b: str, umbral) -> bool:
+    # En orden (tolera erratas) u ordenadas (tolera cambios de orden)
+    return fuzz.ratio(a, b) >= umbral or fuzz.ratio(_llave(a), _llave(b)) >= umbral
+
+
+class _Conjuntos:
+    """Union-find con compresión de caminos."""
+
+    def __init__(self, n):
+        self.padre = list(range(n))
+
+    def raiz(self, i):
+        padre = self.padre
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    def unir(self, i, j):
+        ri, rj = self.raiz(i), self.raiz(j)
+        if ri != rj:
+            self.padre[max(ri, rj)] = min(ri, rj)
+            return True
+        return False
+
+
+# -----------------------------
+# MinHash + LSH
+# -----------------------------
+def firmas_minhash(formas, permutaciones=PERMUTACIONES, semilla=1, bloque=BLOQUE_MINHASH):
+    """
+    Matriz (n, permutaciones) de mínimos por forma, sobre trigramas de bytes.
+    Una forma vacía no tiene trigramas: su fila queda en el máximo de uint32.
+    """
+    import numpy as np
+
+    azar = np.random.default_rng(semilla)
+    a = azar.integers(1, 2**63, size=permutaciones, dtype=np.uint64) | np.uint64(1)  # impares
+    b = azar.integers(0, 2**63, size=permutaciones, dtype=np.uint64)
+    firmas = np.full((len(formas), permutaciones), np.iinfo(np.uint32).max, dtype=np.uint32)
+
+    for desde in range(0, len(formas), bloque):
+        # Espacio al inicio y al final: toda forma no vacía tiene al menos un trigrama
+        llenas = [i for i in range(desde, min(desde + bloque, len(formas))) if formas[i]]
+        if not llenas:
+            continue
+        crudos = [f" {formas[i]} ".encode("utf-8") for i in llenas]
+        largos = np.fromiter((len(c) for c in crudos), dtype=np.int64, count=len(crudos))
+        cuantos = largos - 2
+        inicios = np.concatenate(([0], np.cumsum(largos)[:-1]))
+        inicio_gramas = np.concatenate(([0], np.cumsum(cuantos)[:-1]))
+        total = int(cuantos.sum())
+        pos = np.repeat(inicios, cuantos) + (np.arange(total) - np.repeat(inicio_gramas, cuantos))
+
+        bytes_ = np.frombuffer(b"".join(crudos), dtype=np.uint8).astype(np.uint64)
+        gramas = (bytes_[pos] << np.uint64(16)) | (bytes_[pos + 1] << np.uint64(8)) | bytes_[pos + 2]
+        # Hash multiplicar-desplazar (mod 2**64, se queda con los 32 bits altos)
+        hashes = ((gramas[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)).astype(np.uint32)
+        # Sin formas vacías ningún tramo es de largo 0 (reduceat no sabe de tramos vacíos)
+        firmas[llenas] = np.minimum.reduceat(hashes, inicio_gramas, axis=0)
+    return firmas
+
+
+def cubetas_lsh(firmas, filas=FILAS_POR_BANDA):
+    """Por cada banda, los grupos de índices con la banda idéntica (solo los de 2 o más)."""
+    import numpy as np
+
+    n, permutaciones = firmas.shape
+    for banda in range(permutaciones // filas):
+        columnas = firmas[:, banda * filas:(banda + 1) * filas].astype(np.uint64)
+        llave = np.zeros(n, dtype=np.uint64)
+        for c in range(filas):
+            llave = llave * np.uint64(0x9E3779B97F4A7C15) + columnas[:, c]
+        orden = np.argsort(llave, kind="stable")
+        ordenadas = llave[orden]
+        cortes = np.flatnonzero(ordenadas[1:] != ordenadas[:-1]) + 1
+        for grupo in np.split(orden, cortes):
+            if len(grupo) > 1:
+                yield grupo.tolist()
+
+
+# -----------------------------
+# Agrupación
+# -----------------------------
+def agrupar(preguntas, umbral=UMBRAL_FUSION, estadisticas=None):
+    """
+    Devuelve los grupos (listas de índices de `preguntas`) y la forma
+    normalizada de cada pregunta. `estadisticas` recibe tiempos y conteos.
+    """
+    est = estadisticas if estadisticas is not None else {}
+    t = time.perf_counter()
+
+    formas, por_llave, indice_forma, forma_de = [], {}, [], []
+    for pregunta in preguntas:
+        forma = forma_normalizada(pregunta)
+        llave = _llave(forma)
+        k = por_llave.get(llave)
+        if k is None:
+            k = por_llave[llave] = len(formas)
+            formas.append(forma)
+        indice_forma.append(k)
+        forma_de.append(forma)
+    numeros = [tuple(_NUMERO.findall(f)) for f in formas]
+    est["formas_distintas"] = len(formas)
+    est["segundos_normalizar"] = round(time.perf_counter() - t, 3)
+
+    conjuntos = _Conjuntos(len(formas))
+    comparaciones = 0
+    if len(formas) > 1:
+        t = time.perf_counter()
+        firmas = firmas_minhash(formas)
+        est["segundos_minhash"] = round(time.perf_counter() - t, 3)
+
+        t = time.perf_counter()
+        for cubeta in cubetas_lsh(firmas):
+            # Contra pocos representantes por cubeta: lineal aunque la cubeta sea enorme
+            representantes = []
+            for i in cubeta:
+                if not formas[i]:
+                    continue
+                for r in representantes:
+                    ri, rr = conjuntos.raiz(i), conjuntos.raiz(r)
+                    if ri == rr:
+                        break
+                    comparaciones += 1
+                    # También las raíces deben parecerse: evita cadenas a-b-c-...-z
+                    if (numeros[i] == numeros[r] and _parecidas(formas[i], formas[r], umbral)
+                            and _parecidas(formas[ri], formas[rr], umbral)):
+                        conjuntos.unir(i, r)
+                        break
+                else:
+                    if len(representantes) < MAX_REPRESENTANTES:
+                        representantes.append(i)
+        est["segundos_lsh_y_verificacion"] = round(time.perf_counter() - t, 3)
+    est["comparaciones"] = comparaciones
+
+    grupos = {}
+    for i, k in enumerate(indice_forma):
+        grupos.setdefault(conjuntos.raiz(k), []).append(i)
+    return list(grupos.values()), forma_de
+
+
+def _canonica(preguntas, respuestas, formas, grupo):
+    comun = Counter(formas[i] for i in grupo).most_common(1)[0][0]
+    pregunta = min((preguntas[i] for i in grupo if formas[i] == comun), key=len)
+    # La respuesta más repetida; empate -> la más reciente (orden de llegada)
+    votos = Counter(" ".join(respuestas[i].split()) for i in grupo)
+    respuesta = max(grupo, key=lambda i: (votos[" ".join(respuestas[i].split())], i))
+    return pregunta, respuestas[respuesta]
+
+
+def depurar(datos: dict, umbral=UMBRAL_FUSION):
+    """{pregunta: respuesta} -> (almacén compactado, estadísticas)."""
+    inicio = time.perf_counter()
+    preguntas, respuestas = list(datos), list(datos.values())
+    est = {"entradas": len(preguntas)}
+    grupos, formas = agrupar(preguntas, umbral, est)
+
+    compactado = {}
+    for grupo in grupos:
+        pregunta, respuesta = _canonica(preguntas, respuestas, formas, grupo)
+        compactado[pregunta] = respuesta
+    est.update({
+        "grupos": len(grupos),
+        "eliminadas": len(preguntas) - len(compactado),
+        "mayor_grupo": max((len(g) for g in grupos), default=0),
+        "segundos_total": round(time.perf_counter() - inicio, 3),
+    })
+    return compactado, est
+
+
+def depurar_archivo(ruta_json, salida=None, umbral=UMBRAL_FUSION, simular=False):
+    """
+    Depura el almacén de `ruta_json` (JSON + log). Sin `salida` lo reemplaza
+    en su lugar con el candado del KnowledgeStore; con `simular` no escribe.
+    """
+    from modules.conocimiento import KnowledgeStore
+
+    almacen = KnowledgeStore(ruta_json)
+    datos = almacen.todo()
+    compactado, est = depurar(datos, umbral)
+    est["bytes_antes"] = len(json.dumps(datos, ensure_ascii=False, indent=4).encode("utf-8"))
+    est["bytes_despues"] = len(json.dumps(compactado, ensure_ascii=False, indent=4).encode("utf-8"))
+    if simular:
+        return est
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            json.dump(compactado, f, ensure_ascii=False, indent=4)
+    else:
+        est["llegadas_durante"] = almacen.reemplazar(compactado, vistas=datos.keys())
+    return est
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Junta preguntas aprendidas casi repetidas.")
+    parser.add_argument("ruta", nargs="?", default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "aprendido.json"))
+    parser.add_argument("--salida", help="escribir aquí en vez de reemplazar el almacén")
+    parser.add_argument("--umbral", type=int, default=UMBRAL_FUSION)
+    parser.add_argument("--simular", action="store_true", help="solo estadísticas")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta) and not os.path.exists(os.path.splitext(args.ruta)[0] + ".log"):
+        print(f"❌ No existe {args.ruta}")
+        sys.exit(1)
+    estadisticas = depurar_archivo(args.ruta, args.salida, args.umbral, args.simular)
+    print(json.dumps(estadisticas, ensure_ascii=False, indent=2))
@@ -1,11 +1,17 @@
+import asyncio
+import atexit
 import csv
-import json
 import os
+import threading
+
+from modules.conocimiento import KnowledgeStore
+from modules.ignorancia import RegistroIgnorancia
 
 # -----------------------------
 # Funciones de Soporte
 # -----------------------------
-RUTA_APRENDIZAJE = "data/aprendido.json"
+ARCHIVO_APRENDIZAJE = "aprendido.json"
+BASE_IGNORANCIA = "preguntas_sin_respuesta"
 
 def _parse_horas(horas_str):
     """Convierte '3-2-5' a '3T / 2P (5 Créditos)'"""
@@ -21,25 +27,54 @@ def _parse_horas(horas_str):
         return f"{teoricas}T / {practicas}P ({creditos} Créditos)"
     return f"{horas_str} hrs"
 
-def cargar_conocimiento_adquirido():
-    if not os.path.exists(RUTA_APRENDIZAJE): return {}
-    try:
-        with open(RUTA_APRENDIZAJE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except: return {}
-
-def guardar_nuevo_conocimiento(pregunta, respuesta):
-    conocimiento = cargar_conocimiento_adquirido()
-    conocimiento[pregunta] = respuesta
-    os.makedirs(os.path.dirname(RUTA_APRENDIZAJE), exist_ok=True)
-    with open(RUTA_APRENDIZAJE, "w", encoding="utf-8") as f:
-        json.dump(conocimiento, f, ensure_ascii=False, indent=4)
-
-def registrar_ignorancia(mensaje_usuario):
-    archivo = "data/preguntas_sin_respuesta.txt"
-    os.makedirs(os.path.dirname(archivo), exist_ok=True)
-    with open(archivo, "a", encoding="utf-8") as f:
-        f.write(f"{mensaje_usuario}\n")
+# Cada campus aprende y anota lo que no supo en su propio directorio
+# (data/ o data/campus/<id>/): uno por directorio en todo el proceso, así
+# las recargas del catálogo siguen usando el mismo índice y el mismo hilo.
+#   KnowledgeStore: índice en memoria + log de escritura diferida (ver modules/conocimiento.py)
+#   RegistroIgnorancia: cola + hilo escritor con conteos por pregunta (ver modules/ignorancia.py)
+_almacenes = {}  # directorio absoluto -> (KnowledgeStore, RegistroIgnorancia)
+_candado_almacenes = threading.Lock()
+
+def almacenes_de(directorio):
+    """(conocimiento, ignorancia) del campus que vive en `directorio`."""
+    clave = os.path.abspath(directorio)
+    with _candado_almacenes:
+        if clave not in _almacenes:
+            _almacenes[clave] = (
+                KnowledgeStore(os.path.join(directorio, ARCHIVO_APRENDIZAJE)),
+                RegistroIgnorancia(os.path.join(directorio, BASE_IGNORANCIA)),
+            )
+        return _almacenes[clave]
+
+def soltar_almacenes(directorio):
+    """El campus se descargó: su índice se libera y su registro termina de escribir y cierra el hilo."""
+    with _candado_almacenes:
+        par = _almacenes.pop(os.path.abspath(directorio), None)
+    if par is not None:
+        par[1].cerrar()
+
+def registros_ignorancia():
+    with _candado_almacenes:
+        return [registro for _, registro in _almacenes.values()]
+
+def vaciar_ignorancia():
+    for registro in registros_ignorancia():
+        registro.vaciar()
+
+atexit.register(vaciar_ignorancia)
+
+# En un hilo: el almacén puede esperar el candado entre procesos, recargar el
+# índice completo tras la compactación de otro worker o compactar él mismo
+async def buscar_conocimiento(mensaje, almacen):
+    """Respuesta aprendida para un mensaje parecido, o None."""
+    return await asyncio.to_thread(almacen.buscar, mensaje)
+
+async def guardar_nuevo_conocimiento(pregunta, respuesta, almacen):
+    await asyncio.to_thread(almacen.agregar, pregunta, respuesta)
+
+def registrar_ignorancia(mensaje_usuario, registro):
+    """Encola la pregunta sin respuesta (no toca el disco en la petición)."""
+    registro.registrar(mensaje_usuario)
 
 # -----------------------------
 # Leer CSV
@@ -55,13 +90,86 @@ def leer_csv(nombre_archivo):
         print(f"⚠️ Advertencia: No se encontró {nombre_archivo}")
     return datos
 
+# -----------------------------
+# Leer texto plano (informe institucional)
+# -----------------------------
+def leer_texto(nombre_archivo):
+    try:
+        with open(nombre_archivo, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        print(f"⚠️ Advertencia: No se encontró {nombre_archivo}")
+        return ""
+
+# -----------------------------
+# Caché de respuestas renderizadas
+# -----------------------------
+class CacheRender:
+    """
+    Memoriza textos ya armados (listas de carreras y materias).
+    La llave incluye la versión del catálogo, así un catálogo recargado
+    nunca devuelve un texto viejo.
+    """
+
+    def __init__(self):
+        self._textos = {}
+        self.aciertos = 0
+        self.fallos = 0
+
+    def buscar(self, llave):
+        """Texto guardado o None; cuenta el acierto o el fallo."""
+        texto = self._textos.get(llave)
+        if texto is not None:
+            self.aciertos += 1
+        else:
+            self.fallos += 1
+        return texto
+
+    def obtener(self, llave, construir):
+        texto = self.buscar(llave)
+        if texto is not None:
+            return texto
+        texto = construir()
+        self._textos[llave] = texto
+        return texto
+
+    def guardar(self, llave, texto):
+        self._textos[llave] = texto
+
+    def __contains__(self, llave):
+        return llave in self._textos
+
+    def invalidar(self, version=None):
+        """Sin versión se vacía todo; con versión solo se quitan los textos de ese catálogo."""
+        if version is None:
+            self._textos.clear()
+            return
+        for llave in [k for k in self._textos if k[0] == version]:
+            del self._textos[llave]
+
+    def estadisticas(self):
+        return {"entradas": len(self._textos), "aciertos": self.aciertos, "fallos": self.fallos}
+
+
+cache_render = CacheRender()
+
+def invalidar_cache_render(version=None):
+    """Se llama al recargar o descargar un catálogo (con su versión vieja)."""
+    cache_render.invalidar(version)
+
+def _linea_materia(m):
+    return f"  - {m['materia']} ({m['clave']}) - {_parse_horas(m.get('horas', 'N/A'))}\n"
+
 # -----------------------------
 # Listar carreras (Para el menú de "carreras")
 # -----------------------------
-def listar_carreras(carreras_data):
+def listar_carreras(catalogo):
     """Genera una lista formateada de todas las carreras."""
+    return cache_render.obtener((catalogo.version, "carreras", None, None), lambda: _render_carreras(catalogo))
+
+def _render_carreras(catalogo):
     lista = []
-    for i, carrera in enumerate(carreras_data):
+    for i, carrera in enumerate(catalogo.carreras):
         nombre_corto = carrera['nombre'].replace("Ingeniería en ", "").replace("Ingeniería ", "")
         lista.append(f"🎓 {i+1}. {nombre_corto} ({carrera['clave']})")
     return "\n".join(lista)
@@ -69,46 +177,54 @@ def listar_carreras(carreras_data):
 # -----------------------------
 # Materias de toda la carrera (Ahora con T-P-C)
 # -----------------------------
-def materias_todas(carrera, materias):
-    materias_carrera = [m for m in materias if m['carrera'].lower() == carrera.lower()]
-    if not materias_carrera:
+def materias_todas(carrera, catalogo):
+    llave = (catalogo.version, "materias", carrera.lower(), None)
+    return cache_render.obtener(llave, lambda: _render_materias_todas(carrera, catalogo))
+
+def _render_materias_todas(carrera, catalogo):
+    if not catalogo.materias_de(carrera):
         return "No se encontraron materias para esta carrera."
 
-    # Ordenar por semestre y asegurarse de que el parseo sea numérico
-    def sort_key(x):
-        try:
-            return int(x['semestre'])
-        except:
-            return float('inf') # Manda los no numéricos al final
-
-    materias_carrera.sort(key=sort_key)
-        
-    texto = ""
-    # Obtener lista de semestres únicos y ordenados (primero números, luego textos)
-    semestres = sorted(set(m['semestre'] for m in materias_carrera), key=lambda x: int(x) if x.isdigit() else float('inf'))
-    
-    for sem in semestres:
-        texto += f"**Semestre {sem}:**\n"
-        for m in materias_carrera:
-            if m['semestre'] == sem:
-                parsed_horas = _parse_horas(m.get('horas', 'N/A'))
-                texto += f"  - {m['materia']} ({m['clave']}) - {parsed_horas}\n"
-        texto += "\n"
-    
-    return texto
+    # El catálogo ya trae los semestres ordenados (primero números, luego textos)
+    partes = []
+    for sem in catalogo.semestres_de(carrera):
+        partes.append(f"**Semestre {sem}:**\n")
+        partes.extend(_linea_materia(m) for m in catalogo.materias_en_semestre(carrera, sem))
+        partes.append("\n")
+    return "".join(partes)
+
+def iterar_materias_todas(carrera, catalogo):
+    """
+    Igual que materias_todas() pero semestre por semestre (para streaming).
+    Si el texto ya está en caché se entrega completo de una vez.
+    """
+    llave = (catalogo.version, "materias", carrera.lower(), None)
+    texto = cache_render.buscar(llave)  # un fallo aquí también cuenta
+    if texto is not None:
+        yield texto
+        return
+    if not catalogo.materias_de(carrera):
+        yield "No se encontraron materias para esta carrera."
+        return
+
+    partes = []
+    for sem in catalogo.semestres_de(carrera):
+        bloque = f"**Semestre {sem}:**\n" + "".join(_linea_materia(m) for m in catalogo.materias_en_semestre(carrera, sem)) + "\n"
+        partes.append(bloque)
+        yield bloque
+    cache_render.guardar(llave, "".join(partes))
 
 # -----------------------------
 # Materias por semestre (Ahora con T-P-C)
 # -----------------------------
-def materias_por_semestre(carrera, semestre, materias):
-    semestre_str = str(semestre)
-    materias_carrera = [m for m in materias if m['carrera'].lower() == carrera.lower() and m['semestre'] == semestre_str]
-    if not materias_carrera:
+def materias_por_semestre(carrera, semestre, catalogo):
+    # Semestres inexistentes (ej. "2024") no se guardan: la caché queda acotada
+    if not catalogo.materias_en_semestre(carrera, semestre):
         return f"No se encontraron materias para el semestre {semestre}."
 
-    texto = f"**Semestre {semestre}:**\n"
-    for m in materias_carrera:
-        parsed_horas = _parse_horas(m.get('horas', 'N/A'))
-        texto += f"  - {m['materia']} ({m['clave']}) - {parsed_horas}\n"
-    
-    return texto
\ No newline at end of file
+    llave = (catalogo.version, "semestre", carrera.lower(), str(semestre))
+    return cache_render.obtener(llave, lambda: _render_materias_semestre(carrera, semestre, catalogo))
+
+def _render_materias_semestre(carrera, semestre, catalogo):
+    materias_carrera = catalogo.materias_en_semestre(carrera, semestre)
+    return f"**Semestre {semestre}:**\n" + "".join(_linea_materia(m) for m in materias_carrera)
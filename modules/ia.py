@@ -1,33 +1,84 @@
-import google.generativeai as genai
-from modules.funciones import listar_carreras, materias_por_semestre, materias_todas, registrar_ignorancia, cargar_conocimiento_adquirido, guardar_nuevo_conocimiento
-from modules.memoria import obtener_memoria, guardar_memoria, reset_memoria
-from thefuzz import process, fuzz 
-import unicodedata
+from modules.funciones import listar_carreras, materias_por_semestre, materias_todas, iterar_materias_todas, registrar_ignorancia, registros_ignorancia, buscar_conocimiento, guardar_nuevo_conocimiento, cache_render
+from modules.memoria import obtener_memoria, guardar_memoria, reset_memoria, actualizar_conversacion, en_almacen
+from modules.catalogo import INSTITUCION_POR_DEFECTO
+from modules.llm import PRIORIDAD_CSV, PRIORIDAD_GENERAL, StreamIncompleto, crear_gateway_desde_entorno
+from modules.admision import Admision, Saturado, fijar_usuario
+from modules.cache_respuestas import CacheRespuestas
+from modules.recuperacion import UMBRAL_RECUPERACION
+from modules.normalizacion import limpiar_texto
+from modules.metricas import Indicador, duracion_fuzzy, errores, duracion_io, duracion_llm, etapa, iniciar_cronometro, tramo
+from modules import memoria as _memoria
+import asyncio
+import contextvars
 import re
 import random
 import os
+import threading
+import time
 
 # =========================================================
 # 🤖 CONFIGURACIÓN DE GEMINI
 # =========================================================
-API_KEY = os.getenv("GEMINI_API_KEY") 
+# Gateway asíncrono (concurrencia limitada, plazos y agrupación de prompts).
+# Se elige con GEMINI_API_KEY / AULABOT_LLM_URL / AULABOT_LLM_FALSO.
+# Se crea al primer uso (el arranque lo hace en un hilo): con Gemini importar
+# google.generativeai tarda ~1 s y no debe pagarse en `import main`.
+_gateway = None
+_gateway_creado = False
+_candado_gateway = threading.Lock()
 
-try:
-    if API_KEY:
-        genai.configure(api_key=API_KEY)
-        model = genai.GenerativeModel('gemini-pro')
-        USAR_GEMINI = True
-    else:
-        USAR_GEMINI = False
-except Exception as e:
-    USAR_GEMINI = False
+def obtener_gateway():
+    """El GatewayLLM configurado (se crea la primera vez) o None si no hay LLM."""
+    global _gateway, _gateway_creado
+    if not _gateway_creado:
+        with _candado_gateway:
+            if not _gateway_creado:
+                _gateway = crear_gateway_desde_entorno()
+                _gateway_creado = True
+    return _gateway
+
+# El calentamiento del arranque (modules/arranque.py) recorre la cascada sin
+# llamar al LLM: solo en su propia tarea, las peticiones reales no se enteran
+_sin_llm = contextvars.ContextVar("aulabot_sin_llm", default=False)
+
+def fijar_sin_llm(valor=True):
+    _sin_llm.set(valor)
+
+def _llm_activo():
+    return not _sin_llm.get() and obtener_gateway() is not None
+
+# Fichas por usuario y globales (en el mismo almacén que las sesiones)
+admision = Admision(_memoria.store)
+
+# Respuestas ya generadas (el nombre del alumno se guarda como marcador).
+# AULABOT_CACHE_LLM=<ruta.json> la persiste entre reinicios.
+cache_llm = CacheRespuestas(
+    max_entradas=int(os.getenv("AULABOT_CACHE_LLM_MAX", "2048")),
+    ttl=float(os.getenv("AULABOT_CACHE_LLM_TTL", str(6 * 3600))),
+    ruta=os.getenv("AULABOT_CACHE_LLM"),
+)
+
+Indicador("aulabot_cache_llm_entradas", "Respuestas del LLM en caché", lambda: cache_llm.estadisticas()["entradas"])
+Indicador("aulabot_cache_llm_aciertos", "Aciertos acumulados de la caché del LLM", lambda: cache_llm.aciertos)
+Indicador("aulabot_cache_render_entradas", "Listas de carreras y materias ya renderizadas", lambda: cache_render.estadisticas()["entradas"])
+Indicador("aulabot_cache_render_aciertos", "Aciertos acumulados de la caché de render", lambda: cache_render.aciertos)
+Indicador("aulabot_cache_render_fallos", "Fallos acumulados de la caché de render", lambda: cache_render.fallos)
+Indicador("aulabot_sesiones", "Sesiones en el almacén", lambda: _memoria.store.conteo())
+Indicador("aulabot_sin_respuesta_en_cola", "Preguntas sin respuesta esperando escritura (todos los campus)",
+          lambda: sum(r.estadisticas()["en_cola"] for r in registros_ignorancia()))
+Indicador("aulabot_sin_respuesta_descartadas", "Preguntas sin respuesta descartadas por cola llena (todos los campus)",
+          lambda: sum(r.descartadas for r in registros_ignorancia()))
+# Sin gateway (todavía o sin LLM) la lambda falla y el indicador no se exporta
+Indicador("aulabot_llm_en_vuelo", "Llamadas al LLM en curso", lambda: _gateway.estadisticas()["en_vuelo"])
+Indicador("aulabot_llm_agrupadas", "Llamadas al LLM evitadas por agrupación", lambda: _gateway.estadisticas()["agrupadas"])
+Indicador("aulabot_llm_en_cola", "Llamadas al LLM esperando lugar", lambda: _gateway.estadisticas()["en_cola"])
 
 # =========================================================
 # 🧱 BANCO DE FRASES
 # =========================================================
 FRASES_SALUDO = [
     "¡Hola, {nombre}! 👋 Soy AulaBot. ¿En qué te puedo echar la mano hoy?",
-    "¡Qué tal, {nombre}! 🤖 Tu asistente del ITSCH listo. ¿Qué necesitas saber?",
+    "¡Qué tal, {nombre}! 🤖 Tu asistente del {institucion} listo. ¿Qué necesitas saber?",
     "¡Hola, hola, {nombre}! 😊 Aquí estoy para resolver tus dudas sobre el Tec.",
     "¡Buenas, {nombre}! 🎓 ¿Buscas información de alguna carrera o trámite?",
     "¡Hey, {nombre}! 👋 Cuéntame, ¿qué te interesa consultar?"
@@ -47,6 +98,14 @@ FRASES_NO_ENTENDI = [
     "¡Vaya! No encontré eso en mi base de datos oficial ni en internet."
 ]
 
+FRASES_SATURADO = [
+    "Ahorita tengo muchísimas consultas, {nombre}. 🙏 Pregúntame de carreras, materias o trámites, o inténtalo en un minuto.",
+    "¡Uf, hay fila, {nombre}! 😅 Esa pregunta la vemos en un momento; mientras, te ayudo con lo del Tec.",
+]
+
+# El stream del LLM se cortó a medias (no se guarda ni se aprende)
+AVISO_CORTADO = "\n\n⚠️ La respuesta se cortó; vuelve a preguntarme en un momento."
+
 FRASES_REINICIO = [
     "🔄 Conversación reiniciada. ¡Empecemos de cero! ¿Cómo te llamas?",
     "🧹 Memoria borrada. Hola de nuevo, ¿me recuerdas tu nombre?",
@@ -56,123 +115,335 @@ FRASES_REINICIO = [
 # =========================================================
 # 1. MAPA DE CONOCIMIENTO
 # =========================================================
-SINONIMOS_CARRERAS = {
-    "Ingeniería en Sistemas Computacionales": ["sistemas", "systemas", "programacion", "computacion", "desarrollo", "software", "codigo", "isc"],
-    "Ingeniería en Gestión Empresarial": ["gestion", "empresas", "administracion", "negocios", "ige", "gerencia"],
-    "Ingeniería Industrial": ["industrial", "industria", "procesos", "fabrica", "produccion", "ii"],
-    "Ingeniería Mecatrónica": ["mecatronica", "meca", "robotica", "automatizacion", "im"],
-    "Ingeniería Bioquímica": ["bioquimica", "biologia", "alimentos", "ibq"],
-    "Ingeniería en Nanotecnología": ["nanotecnologia", "nano", "materiales", "ina"],
-    "Ingeniería en Innovación Agrícola Sustentable": ["agricola", "agronomia", "campo", "cultivos", "iias"],
-    "Ingeniería en Tecnologías de la Información y Comunicaciones": ["tics", "tic", "redes", "telecom", "itic"],
-    "Ingeniería en Animación Digital y Efectos Visuales": ["animacion", "digital", "3d", "visuales", "iadev"],
-    "Ingeniería en Sistemas Automotrices": ["automotriz", "autos", "coches", "mecanica automotriz", "isau"]
-}
-
-INTENCIONES = {
-    "materias": ["materias", "materia", "clases", "asignaturas", "reticula", "plan", "curricula"],
-    "carreras_lista": ["carreras", "programas academicos", "que carreras tienen", "cuales son las carreras"],
-    "jefes": ["jefe de carrera", "jefe de division", "quien es el jefe"], 
-    "costos": ["cuanto cuesta", "precio", "costo", "pagar", "inscripcion", "mensualidad", "dinero", "ficha", "pago"],
-    "ubicacion": ["donde estan", "ubicacion", "mapa", "direccion", "llegar", "localizacion", "domicilio"],
-    "saludo": ["hola", "buenos dias", "buenas", "que tal", "hey", "hi", "inicio", "comenzar"],
-    "directorio": ["director", "jefe", "coordinador", "quien es", "encargado", "subdirector"],
-    "tramites": ["admision", "propedeutico", "examen", "becas", "servicio social", "residencias", "titulacion", "fechas", "convocatoria"],
-    "ayuda": ["que sabes hacer", "que puedes hacer", "ayuda", "instrucciones", "para que sirves", "menu", "opciones", "temas"],
-    # AQUÍ AGREGUÉ 'NORMATIVAS' y 'REGLAMENTO' 👇
-    "institucional": ["mision", "vision", "objetivos", "historia", "fundacion", "normativas", "reglamento", "normas", "reglas"],
-    "vida_estudiantil": ["deportes", "futbol", "cafeteria", "ingles", "centro de idiomas", "psicologia"],
-    "afirmacion": ["si", "claro", "por favor", "yes", "simon", "ok", "va", "me parece"],
-    "negacion": ["no", "nel", "asi dejalo", "gracias"]
-}
+# Sinónimos por defecto (ITSCH). Cada campus puede traer los suyos en
+# sinonimos.json; ver modules/sinonimos.py y Catalogo.detector.
 
 # =========================================================
 # 2. FUNCIONES DE INTELIGENCIA..
 # =========================================================
-def limpiar_texto(texto):
-    texto = texto.lower()
-    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-
-def detectar_mejor_coincidencia(texto_usuario, diccionario):
-    texto_usuario = limpiar_texto(texto_usuario)
-    mejor_opcion, mejor_score = None, 0
-    for clave, sinonimos in diccionario.items():
-        match, score = process.extractOne(texto_usuario, sinonimos, scorer=fuzz.token_set_ratio)
-        if score > mejor_score:
-            mejor_score = score
-            mejor_opcion = clave
-    return mejor_opcion if mejor_score >= 70 else None
-
-def consultar_gemini_oficial(contexto, pregunta_usuario):
-    """RAG: Responde usando SOLO datos oficiales del CSV."""
-    if not USAR_GEMINI: return contexto 
-    
-    prompt = f"""
-    Actúa como AulaBot del ITSCH.
+def _medir_llm(tipo, inicio, respuesta, resultado=None):
+    resultado = resultado or ("ok" if respuesta else "sin_respuesta")
+    duracion_llm.observar(time.perf_counter() - inicio, tipo=tipo, resultado=resultado)
+
+def _prompt_oficial(contexto, pregunta_usuario, institucion=INSTITUCION_POR_DEFECTO):
+    return f"""
+    Actúa como AulaBot del {institucion}.
     Usa esta INFORMACIÓN OFICIAL para responder: "{contexto}"
     El usuario pregunta: "{pregunta_usuario}"
     Respuesta breve, amable y directa.
     """
-    try:
-        return model.generate_content(prompt).text
-    except: return contexto 
 
-def consultar_gemini_general(pregunta_usuario):
-    """
-    CEREBRO GENERAL: Responde cualquier duda del mundo.
+def _prompt_general(pregunta_usuario, conversacion=""):
+    if conversacion:
+        return f"""
+    Eres un asistente útil y educativo.
+    Conversación previa (para entender a qué se refiere):
+    {conversacion}
+    El usuario pregunta: "{pregunta_usuario}"
+    Responde de forma clara, breve (máximo 3 párrafos) y amable.
     """
-    if not USAR_GEMINI: return None
-    
-    prompt = f"""
+    return f"""
     Eres un asistente útil y educativo.
     El usuario pregunta: "{pregunta_usuario}"
     Responde de forma clara, breve (máximo 3 párrafos) y amable.
     """
+
+# Preguntas que dependen de lo anterior ("¿y en qué año?", "explícame eso")
+# Se comparan palabras (\w+), no el texto: limpiar_texto deja "¿", "?" y "."
+_PALABRA = re.compile(r"\w+")
+_CONECTORES = {("y",), ("pero",), ("entonces",), ("tambien",), ("ademas",), ("o", "sea")}
+_REFERENCIAS = {"eso", "esa", "ese", "esto", "esta", "este", "ello", "anterior", "mismo", "misma"}
+
+def _es_seguimiento(mensaje_limpio):
+    """
+    Solo las preguntas de seguimiento llevan la conversación al prompt; las
+    demás se quedan sin ella para seguir aprovechando la caché y la agrupación.
+    """
+    palabras = _PALABRA.findall(mensaje_limpio)
+    if tuple(palabras[:1]) in _CONECTORES or tuple(palabras[:2]) in _CONECTORES:
+        return True
+    return not _REFERENCIAS.isdisjoint(palabras)
+
+async def consultar_gemini_oficial(contexto, pregunta_usuario, nombre=None, institucion=INSTITUCION_POR_DEFECTO):
+    """RAG: Responde usando SOLO datos oficiales del CSV."""
+    if not _llm_activo(): return contexto 
+
+    # El prompt lleva la institución: dos campus con el mismo dato no comparten respuesta
+    llave = f"{institucion}\n{contexto}"
+    guardada = cache_llm.obtener(llave, pregunta_usuario, nombre)
+    if guardada is not None: return guardada
+    if not await en_almacen(admision.permitir, "oficial"): return contexto
+
+    inicio = time.perf_counter()
+    respuesta = await obtener_gateway().generar(_prompt_oficial(contexto, pregunta_usuario, institucion), prioridad=PRIORIDAD_CSV)
+    _medir_llm("oficial", inicio, respuesta)
+    if not respuesta: return contexto
+    cache_llm.guardar(llave, pregunta_usuario, respuesta, nombre)
+    return respuesta
+
+async def consultar_gemini_general(pregunta_usuario, conversacion=""):
+    """
+    CEREBRO GENERAL: Responde cualquier duda del mundo.
+    Lanza Saturado si el control de admisión no deja llamar al LLM.
+    """
+    if not _llm_activo(): return None
+
+    # La conversación es parte del contexto: un seguimiento no reusa la respuesta de otro
+    guardada = cache_llm.obtener(conversacion, pregunta_usuario)
+    if guardada is not None: return guardada
+    if not await en_almacen(admision.permitir, "general", obtener_gateway()): raise Saturado()
+
+    inicio = time.perf_counter()
+    respuesta = await obtener_gateway().generar(_prompt_general(pregunta_usuario, conversacion), prioridad=PRIORIDAD_GENERAL)
+    _medir_llm("general", inicio, respuesta)
+    if respuesta: cache_llm.guardar(conversacion, pregunta_usuario, respuesta)
+    return respuesta
+
+async def consultar_gemini_oficial_stream(contexto, pregunta_usuario, nombre=None, institucion=INSTITUCION_POR_DEFECTO):
+    """Como consultar_gemini_oficial, pero entrega el texto a medida que llega."""
+    if not _llm_activo():
+        yield contexto
+        return
+
+    llave = f"{institucion}\n{contexto}"
+    guardada = cache_llm.obtener(llave, pregunta_usuario, nombre)
+    if guardada is not None:
+        yield guardada
+        return
+    if not await en_almacen(admision.permitir, "oficial"):
+        yield contexto
+        return
+
+    partes, inicio = [], time.perf_counter()
     try:
-        response = model.generate_content(prompt)
-        return response.text
-    except: return None
+        async for fragmento in obtener_gateway().generar_stream(_prompt_oficial(contexto, pregunta_usuario, institucion), prioridad=PRIORIDAD_CSV):
+            partes.append(fragmento)
+            yield fragmento
+    except StreamIncompleto:
+        # Cortada: no se guarda; el alumno recibe el dato oficial tal cual
+        _medir_llm("oficial_stream", inicio, partes, "incompleta")
+        yield f"\n\n{contexto}" if partes else contexto
+        return
+    _medir_llm("oficial_stream", inicio, partes)
+    if partes:
+        cache_llm.guardar(llave, pregunta_usuario, "".join(partes), nombre)
+    else:
+        yield contexto
+
+async def consultar_gemini_general_stream(pregunta_usuario, conversacion=""):
+    """
+    Como consultar_gemini_general; si no hay respuesta no entrega nada.
+    Si se corta a medias relanza StreamIncompleto (sin guardar en caché).
+    """
+    if not _llm_activo(): return
+
+    guardada = cache_llm.obtener(conversacion, pregunta_usuario)
+    if guardada is not None:
+        yield guardada
+        return
+    if not await en_almacen(admision.permitir, "general", obtener_gateway()): raise Saturado()
+
+    partes, inicio = [], time.perf_counter()
+    try:
+        async for fragmento in obtener_gateway().generar_stream(_prompt_general(pregunta_usuario, conversacion), prioridad=PRIORIDAD_GENERAL):
+            partes.append(fragmento)
+            yield fragmento
+    except StreamIncompleto:
+        _medir_llm("general_stream", inicio, partes, "incompleta")
+        raise
+    _medir_llm("general_stream", inicio, partes)
+    if partes:
+        cache_llm.guardar(conversacion, pregunta_usuario, "".join(partes))
 
 # =========================================================
 # 3. LÓGICA PRINCIPAL (CEREBRO FINAL)
 # =========================================================
-def generar_respuesta(mensaje, user_id, general, carreras, materias):
+async def generar_respuesta(mensaje, user_id, catalogo):
+    cronometro = iniciar_cronometro()
+    fijar_usuario(user_id)
+    with tramo(duracion_io, operacion="leer_sesion"):
+        memoria = await en_almacen(obtener_memoria, user_id)
+    respuesta = await _responder(mensaje, user_id, memoria, catalogo)
+    # Tras un reinicio la sesión ya se borró: no se vuelve a crear con este turno
+    if cronometro.terminar() != "reinicio":
+        actualizar_conversacion(memoria, mensaje, respuesta)
+    # Una sola escritura al almacén (y solo si la sesión cambió)
+    with tramo(duracion_io, operacion="guardar_sesion"):
+        await en_almacen(guardar_memoria, user_id, memoria)
+    return respuesta
+
+async def generar_respuesta_stream(mensaje, user_id, catalogo):
+    """
+    Igual que generar_respuesta() pero entrega la respuesta por fragmentos
+    (texto del LLM conforme llega, listados de materias por semestre).
+    """
+    cronometro = iniciar_cronometro()
+    fijar_usuario(user_id)
+    with tramo(duracion_io, operacion="leer_sesion"):
+        memoria = await en_almacen(obtener_memoria, user_id)
+    respuesta = await _responder(mensaje, user_id, memoria, catalogo, stream=True)
+    if isinstance(respuesta, str):
+        if cronometro.terminar() != "reinicio":
+            actualizar_conversacion(memoria, mensaje, respuesta)
+        with tramo(duracion_io, operacion="guardar_sesion"):
+            await en_almacen(guardar_memoria, user_id, memoria)
+        yield respuesta
+        return
+    # El estado de la sesión ya quedó decidido antes de empezar a emitir
+    with tramo(duracion_io, operacion="guardar_sesion"):
+        await en_almacen(guardar_memoria, user_id, memoria)
+    partes = []
+    try:
+        async for fragmento in respuesta:
+            partes.append(fragmento)
+            yield fragmento
+    finally:
+        # El mensaje termina con el último fragmento (o cuando el cliente se va):
+        # así cuentan el tiempo del LLM y un fallback marcado a media respuesta
+        cronometro.terminar()
+    # El turno se conoce completo hasta el final: segunda escritura, solo en streaming
+    actualizar_conversacion(memoria, mensaje, "".join(partes))
+    with tramo(duracion_io, operacion="guardar_sesion"):
+        await en_almacen(guardar_memoria, user_id, memoria)
+
+async def generar_respuestas_lote(mensajes, catalogo):
+    """
+    Procesa una lista de (mensaje, user_id) en una sola llamada.
+    La detección de intención/carrera y el fuzzy contra general.csv se
+    calculan por matriz para todo el lote; luego cada usuario avanza en
+    orden (sus mensajes son secuenciales) y usuarios distintos en paralelo.
+    """
+    limpios = [limpiar_texto(m) for m, _ in mensajes]
+    catalogo.detector.match_many(limpios)
+    catalogo.detector_general.match_many(limpios)
+
+    por_usuario = {}
+    for i, (_, user_id) in enumerate(mensajes):
+        por_usuario.setdefault(user_id, []).append(i)
+
+    respuestas = [None] * len(mensajes)
+
+    async def atender(user_id, indices):
+        for i in indices:
+            try:
+                respuestas[i] = await generar_respuesta(mensajes[i][0], user_id, catalogo)
+            except Exception as e:
+                print(f"Error interno en lote: {e}")  # None = error solo para ese mensaje
+                errores.inc(ruta="/chat/batch")
+
+    await asyncio.gather(*(atender(u, indices) for u, indices in por_usuario.items()))
+    return respuestas
+
+# -----------------------------
+# Piezas con versión streaming
+# -----------------------------
+# Con stream=True devuelven un generador asíncrono en lugar del texto.
+async def _oficial(catalogo, contexto, pregunta_usuario, nombre=None, stream=False):
+    if stream:
+        return consultar_gemini_oficial_stream(contexto, pregunta_usuario, nombre, catalogo.institucion)
+    return await consultar_gemini_oficial(contexto, pregunta_usuario, nombre, catalogo.institucion)
+
+async def _materias_stream(frase, carrera, catalogo, sufijo):
+    yield f"{frase}\n\n"
+    for bloque in iterar_materias_todas(carrera, catalogo):
+        yield bloque
+    if sufijo:
+        yield sufijo
+
+def _materias(frase, carrera, catalogo, sufijo="", stream=False):
+    if stream:
+        return _materias_stream(frase, carrera, catalogo, sufijo)
+    return f"{frase}\n\n{materias_todas(carrera, catalogo)}{sufijo}"
+
+def _no_entendi(mensaje_limpio, nombre_usuario, catalogo):
+    etapa("fallback")
+    if not _sin_llm.get():  # el calentamiento no ensucia las preguntas sin respuesta
+        with tramo(duracion_io, operacion="registrar_ignorancia"):
+            registrar_ignorancia(mensaje_limpio, catalogo.ignorancia)
+    return random.choice(FRASES_NO_ENTENDI).format(nombre=nombre_usuario)
+
+def _respuesta_local(pasajes, nombre_usuario):
+    """LLM no admitido: el mejor pasaje local si se parece algo; si no, un aviso (no es ignorancia)."""
+    etapa("saturado")
+    if pasajes and pasajes[0].score >= UMBRAL_RECUPERACION / 2:
+        return pasajes[0].texto
+    return random.choice(FRASES_SATURADO).format(nombre=nombre_usuario)
+
+async def _general_stream(mensaje, mensaje_limpio, nombre_usuario, pasajes, conversacion, catalogo):
+    partes = []
+    try:
+        async for fragmento in consultar_gemini_general_stream(mensaje, conversacion):
+            partes.append(fragmento)
+            yield fragmento
+    except Saturado:
+        yield _respuesta_local(pasajes, nombre_usuario)
+        return
+    except StreamIncompleto:
+        # Una respuesta a medias no se aprende
+        yield AVISO_CORTADO if partes else _no_entendi(mensaje_limpio, nombre_usuario, catalogo)
+        return
+    if partes:
+        # Una respuesta a un seguimiento depende de la plática: no es conocimiento general
+        if not conversacion:
+            with tramo(duracion_io, operacion="guardar_conocimiento"):
+                await guardar_nuevo_conocimiento(mensaje, "".join(partes), catalogo.conocimiento)
+    else:
+        yield _no_entendi(mensaje_limpio, nombre_usuario, catalogo)
+
+async def _general(mensaje, mensaje_limpio, nombre_usuario, pasajes, catalogo, conversacion="", stream=False):
+    if stream:
+        return _general_stream(mensaje, mensaje_limpio, nombre_usuario, pasajes, conversacion, catalogo)
+    try:
+        respuesta_inteligente = await consultar_gemini_general(mensaje, conversacion)
+    except Saturado:
+        return _respuesta_local(pasajes, nombre_usuario)
+    if respuesta_inteligente:
+        if not conversacion:
+            with tramo(duracion_io, operacion="guardar_conocimiento"):
+                await guardar_nuevo_conocimiento(mensaje, respuesta_inteligente, catalogo.conocimiento)
+        return respuesta_inteligente
+    return _no_entendi(mensaje_limpio, nombre_usuario, catalogo)
+
+async def _responder(mensaje, user_id, memoria, catalogo, stream=False):
+    etapa("deteccion")
     mensaje_limpio = limpiar_texto(mensaje)
-    memoria = obtener_memoria(user_id)
-    intencion = detectar_mejor_coincidencia(mensaje_limpio, INTENCIONES)
+    with tramo(duracion_fuzzy, tipo="intencion_carrera"):
+        intencion, posible_carrera = catalogo.detector.detectar(mensaje_limpio)
 
     # --- 0. REINICIO ---
+    etapa("reinicio")
     if 'reiniciar' in mensaje_limpio or 'salir' in mensaje_limpio:
-        reset_memoria(user_id)
+        await en_almacen(reset_memoria, user_id)
+        memoria.marcar(False)
         return random.choice(FRASES_REINICIO)
 
     # --- 1. FLUJO DE NOMBRE (PRIORIDAD MÁXIMA) ---
-    nombre_usuario = memoria.get('nombre_usuario', '')
+    etapa("nombre")
+    nombre_usuario = memoria.nombre_usuario
 
-    if memoria.get('esperando_nombre'):
+    if memoria.esperando_nombre:
         nombre_capturado = mensaje.strip().title()
-        memoria['nombre_usuario'] = nombre_capturado
-        memoria['esperando_nombre'] = False
-        guardar_memoria(user_id, memoria)
+        memoria.nombre_usuario = nombre_capturado
+        memoria.esperando_nombre = False
         return f"¡Mucho gusto, **{nombre_capturado}**! 🎓 Ya guardé tu nombre. Ahora sí, ¿en qué te ayudo? (Carreras, Materias, Costos...)"
 
     if not nombre_usuario:
-        memoria['esperando_nombre'] = True
-        guardar_memoria(user_id, memoria)
-        return "¡Hola! 👋 Soy AulaBot, tu asistente del ITSCH. Antes de empezar, ¿cómo te llamas?"
+        memoria.esperando_nombre = True
+        return f"¡Hola! 👋 Soy AulaBot, tu asistente del {catalogo.institucion}. Antes de empezar, ¿cómo te llamas?"
 
     # --- 2. MEMORIA ADQUIRIDA (AUTODIDACTA) ---
-    conocimiento_json = cargar_conocimiento_adquirido()
-    if conocimiento_json:
-        mejor_pregunta_guardada, score = process.extractOne(mensaje, list(conocimiento_json.keys()), scorer=fuzz.token_sort_ratio) or (None, 0)
-        if score > 85:
-            return f"{conocimiento_json[mejor_pregunta_guardada]}"
+    etapa("aprendida")
+    with tramo(duracion_fuzzy, tipo="conocimiento"):
+        respuesta_aprendida = await buscar_conocimiento(mensaje, catalogo.conocimiento)
+    if respuesta_aprendida is not None:
+        return f"{respuesta_aprendida}"
 
     # --- 3. SALUDO / AYUDA ---
+    etapa("saludo")
     if intencion == "ayuda" or intencion == "saludo":
         saludo_inicial = ""
         if intencion == "saludo":
-            frase = random.choice(FRASES_SALUDO).format(nombre=nombre_usuario)
+            frase = random.choice(FRASES_SALUDO).format(nombre=nombre_usuario, institucion=catalogo.institucion)
             saludo_inicial = f"{frase}\n\n"
 
         menu_completo = (
@@ -187,88 +458,83 @@ def generar_respuesta(mensaje, user_id, general, carreras, materias):
         return saludo_inicial + menu_completo
     
     # --- 4. LISTADO DE CARRERAS ---
+    etapa("carreras")
     if intencion == "carreras_lista":
-        lista = listar_carreras(carreras)
-        return consultar_gemini_oficial(f"Las carreras son:\n{lista}", f"Dile a {nombre_usuario} la lista amablemente.")
+        lista = listar_carreras(catalogo)
+        return await _oficial(catalogo, f"Las carreras son:\n{lista}", f"Dile a {nombre_usuario} la lista amablemente.", nombre_usuario, stream)
 
     # --- 5. JEFES ---
+    etapa("jefes")
     if intencion == "jefes":
-        posible_carrera = detectar_mejor_coincidencia(mensaje_limpio, SINONIMOS_CARRERAS)
         if posible_carrera:
-            info = next((c for c in carreras if c['nombre'] == posible_carrera), None)
+            info = catalogo.carrera(posible_carrera)
             if info and info.get('jefe_division'):
-                return consultar_gemini_oficial(f"Jefe de {info['nombre']}: {info['jefe_division']}", f"Dile a {nombre_usuario} quién es.")
+                return await _oficial(catalogo, f"Jefe de {info['nombre']}: {info['jefe_division']}", f"Dile a {nombre_usuario} quién es.", nombre_usuario, stream)
         return f"Para decirte el Jefe, dime de qué carrera, {nombre_usuario} (ej: 'Jefe de Sistemas')."
 
     # --- 6. MATERIAS ---
+    etapa("materias")
     if intencion == "materias":
-        posible_carrera = detectar_mejor_coincidencia(mensaje_limpio, SINONIMOS_CARRERAS)
         if posible_carrera:
-            memoria['carrera_seleccionada'] = posible_carrera
-            memoria['modo_materias'] = True 
-            guardar_memoria(user_id, memoria)
-            res = materias_todas(posible_carrera, materias)
-            
+            memoria.carrera_seleccionada = posible_carrera
+            memoria.modo_materias = True
             frase = random.choice(FRASES_MATERIAS).format(nombre=nombre_usuario, carrera=posible_carrera)
-            return f"{frase}\n\n{res}\n\n(Filtra escribiendo el número de semestre)."
+            return _materias(frase, posible_carrera, catalogo, "\n\n(Filtra escribiendo el número de semestre).", stream)
         return f"Para ver las materias, dime la carrera, {nombre_usuario}. (Ej: 'Materias de Industrial')."
 
     # --- 7. INFO CARRERA ---
-    posible_carrera = detectar_mejor_coincidencia(mensaje_limpio, SINONIMOS_CARRERAS)
+    etapa("info_carrera")
     if posible_carrera:
-        memoria['carrera_seleccionada'] = posible_carrera
-        memoria['modo_materias'] = False
-        guardar_memoria(user_id, memoria)
-        info = next((c for c in carreras if c['nombre'] == posible_carrera), None)
+        memoria.carrera_seleccionada = posible_carrera
+        memoria.modo_materias = False
+        info = catalogo.carrera(posible_carrera)
         if info:
             ctx = f"Carrera: {info['nombre']} ({info['clave']}). Jefe: {info.get('jefe_division','N/A')}. Descripción: {info['descripcion']}. Perfil: {info.get('perfil_ingreso','')}. Campo: {info.get('perfil_egreso','')}."
-            return consultar_gemini_oficial(ctx, f"Presenta esta carrera a {nombre_usuario} y pregunta si quiere ver materias.")
+            return await _oficial(catalogo, ctx, f"Presenta esta carrera a {nombre_usuario} y pregunta si quiere ver materias.", nombre_usuario, stream)
 
     # --- 8. CONTEXTO ACTIVO ---
-    if memoria.get('carrera_seleccionada'):
-        carrera_sel = memoria['carrera_seleccionada']
+    etapa("contexto")
+    if memoria.carrera_seleccionada:
+        carrera_sel = memoria.carrera_seleccionada
         
-        if intencion == "afirmacion" and not memoria.get('modo_materias'):
-             memoria['modo_materias'] = True
-             guardar_memoria(user_id, memoria)
-             res = materias_todas(carrera_sel, materias)
+        if intencion == "afirmacion" and not memoria.modo_materias:
+             memoria.modo_materias = True
              frase = random.choice(FRASES_MATERIAS).format(nombre=nombre_usuario, carrera=carrera_sel)
-             return f"{frase}\n\n{res}"
+             return _materias(frase, carrera_sel, catalogo, stream=stream)
         
         if intencion == "negacion":
-            del memoria['carrera_seleccionada']
-            if 'modo_materias' in memoria: del memoria['modo_materias']
-            guardar_memoria(user_id, memoria)
+            memoria.carrera_seleccionada = None
+            memoria.modo_materias = False
             return f"Entendido, {nombre_usuario}. ¿Qué más deseas consultar?"
 
-        if memoria.get('modo_materias'):
+        if memoria.modo_materias:
             nums = re.findall(r'\d+', mensaje_limpio)
-            if nums: return materias_por_semestre(carrera_sel, int(nums[0]), materias)
+            if nums: return materias_por_semestre(carrera_sel, int(nums[0]), catalogo)
             
-            nombres = [m['materia'] for m in materias if m['carrera'] == carrera_sel]
-            match, score = process.extractOne(mensaje_limpio, nombres, scorer=fuzz.token_set_ratio) if nombres else (None, 0)
+            with tramo(duracion_fuzzy, tipo="materia"):
+                match, score = catalogo.mejor_materia(carrera_sel, mensaje_limpio)
             if score > 75:
-                m = next(x for x in materias if x['materia'] == match and x['carrera'] == carrera_sel)
+                m = catalogo.materia(carrera_sel, match)
                 datos = f"Materia: {m['materia']}, Semestre: {m['semestre']}, Créditos: {m.get('horas','N/A')}."
-                return consultar_gemini_oficial(datos, f"Explícale la materia a {nombre_usuario}.")
+                return await _oficial(catalogo, datos, f"Explícale la materia a {nombre_usuario}.", nombre_usuario, stream)
 
     # --- 9. GENERAL (CSV) ---
-    mejor_match, mejor_score = None, 0
-    for item in general:
-        score = fuzz.partial_ratio(limpiar_texto(item['palabra_clave']), mensaje_limpio)
-        if score > mejor_score:
-            mejor_score = score
-            mejor_match = item['respuesta']
+    etapa("general_csv")
+    with tramo(duracion_fuzzy, tipo="general_csv"):
+        mejor_match, mejor_score = catalogo.detector_general.mejor(mensaje_limpio)
     if mejor_score > 85:
-        return consultar_gemini_oficial(mejor_match, mensaje)
+        return await _oficial(catalogo, mejor_match, mensaje, stream=stream)
 
-    # --- 10. APRENDIZAJE AUTOMÁTICO ---
-    respuesta_inteligente = consultar_gemini_general(mensaje)
-    if respuesta_inteligente:
-        guardar_nuevo_conocimiento(mensaje, respuesta_inteligente)
-        return respuesta_inteligente
+    # --- 10. RECUPERACIÓN LOCAL (informe + general.csv, BM25) ---
+    etapa("recuperacion")
+    with tramo(duracion_fuzzy, tipo="bm25"):
+        pasajes = catalogo.buscar_pasajes(mensaje)
+    if pasajes and pasajes[0].score >= UMBRAL_RECUPERACION:
+        if not _llm_activo(): return pasajes[0].texto
+        relevantes = [p.texto for p in pasajes if p.score >= UMBRAL_RECUPERACION / 2]
+        return await _oficial(catalogo, "\n\n".join(relevantes), mensaje, stream=stream)
 
-    # --- 11. FALLBACK TOTAL ---
-    registrar_ignorancia(mensaje_limpio) 
-    frase_error = random.choice(FRASES_NO_ENTENDI).format(nombre=nombre_usuario)
-    return f"{frase_error}"
\ No newline at end of file
+    # --- 11. APRENDIZAJE AUTOMÁTICO (y 12. FALLBACK TOTAL si no hay respuesta) ---
+    etapa("llm_general")
+    conversacion = memoria.contexto_conversacion() if _es_seguimiento(mensaje_limpio) else ""
+    return await _general(mensaje, mensaje_limpio, nombre_usuario, pasajes, catalogo, conversacion, stream)
\ No newline at end of file
@@ -0,0 +1,178 @@
+# ---------------------------------------------------------
+# Preguntas sin respuesta (registro asíncrono y agrupado)
+# ---------------------------------------------------------
+# registrar() solo encola (cola acotada, nunca bloquea la petición). Un hilo
+# escritor vacía la cola cada pocos segundos y, bajo un candado entre
+# procesos, agrega el lote al log crudo (rotado por tamaño) y suma los
+# conteos por pregunta normalizada en un JSON compartido por los workers:
+#   <base>.log   una línea JSON por evento {"q", "t"}
+#   <base>.json  {pregunta: {"veces", "primera", "ultima", "ejemplo"}}
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from modules.cache_respuestas import normalizar
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin candado entre procesos
+    fcntl = None
+
+
+class RegistroIgnorancia:
+    def __init__(self, ruta_base, max_cola=10000, intervalo=2.0, max_bytes_log=5 * 1024 * 1024,
+                 logs_conservados=3, max_preguntas=20000):
+        self.ruta_log = f"{ruta_base}.log"
+        self.ruta_json = f"{ruta_base}.json"
+        self.ruta_candado = f"{ruta_base}.lock"
+        self.intervalo = intervalo
+        self.max_bytes_log = max_bytes_log
+        self.logs_conservados = logs_conservados
+        self.max_preguntas = max_preguntas
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._cerrado = False
+        self._lock = threading.Lock()  # un solo vaciado a la vez dentro del proceso
+        self.registradas = 0
+        self.descartadas = 0
+        self.escrituras = 0
+
+    # -----------------------------
+    # Camino de la petición
+    # -----------------------------
+    def registrar(self, mensaje):
+        """Encola la pregunta; si la cola está llena se descarta (y se cuenta)."""
+        try:
+            self._cola.put_nowait((mensaje, time.time()))
+            self.registradas += 1
+        except queue.Full:
+            self.descartadas += 1
+            return
+        if self._hilo is None:
+            self._arrancar()
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._escritor, name="aulabot-ignorancia", daemon=True)
+                self._hilo.start()
+
+    # -----------------------------
+    # Hilo escritor
+    # -----------------------------
+    def _escritor(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            try:
+                self.vaciar()
+            except Exception as e:
+                print(f"⚠️ No se pudo guardar preguntas sin respuesta: {e}")
+            if self._cerrado:
+                with self._lock:
+                    self._hilo = None
+                # Una petición en curso pudo encolar algo más: otro hilo lo escribe y también sale
+                if not self._cola.empty():
+                    self._arrancar()
+                return
+
+    def cerrar(self):
+        """
+        Sin esperar: el hilo escritor hace un último vaciado y termina (el
+        campus se descargó). Lo que llegue después sale en un hilo de una vuelta.
+        """
+        self._cerrado = True
+        self._despertar.set()
+
+    def vaciar(self):
+        """Escribe todo lo encolado (un lote por llamada). Se puede llamar desde cualquier hilo."""
+        with self._lock:
+            lote = []
+            while True:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            if not lote:
+                return 0
+            with self._candado():
+                self._rotar_si_hace_falta()
+                with open(self.ruta_log, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps({"q": q, "t": t}, ensure_ascii=False) + "\n" for q, t in lote))
+                datos = self._leer_conteos()
+                for original, t in lote:
+                    llave = normalizar(original)
+                    if not llave:
+                        continue
+                    entrada = datos.get(llave)
+                    if entrada is None:
+                        datos[llave] = {"veces": 1, "primera": t, "ultima": t, "ejemplo": original}
+                    else:
+                        entrada["veces"] += 1
+                        entrada["ultima"] = max(entrada["ultima"], t)
+                self._escribir_conteos(self._recortar(datos))
+            self.escrituras += 1
+            return len(lote)
+
+    @contextmanager
+    def _candado(self):
+        os.makedirs(os.path.dirname(self.ruta_json) or ".", exist_ok=True)
+        with open(self.ruta_candado, "a") as candado:
+            if fcntl:
+                fcntl.flock(candado, fcntl.LOCK_EX)
+            yield
+
+    def _rotar_si_hace_falta(self):
+        try:
+            if os.path.getsize(self.ruta_log) < self.max_bytes_log:
+                return
+        except FileNotFoundError:
+            return
+        # log.2 -> log.3, log.1 -> log.2, log -> log.1 (el más viejo se pierde)
+        for i in range(self.logs_conservados - 1, 0, -1):
+            if os.path.exists(f"{self.ruta_log}.{i}"):
+                os.replace(f"{self.ruta_log}.{i}", f"{self.ruta_log}.{i + 1}")
+        os.replace(self.ruta_log, f"{self.ruta_log}.1")
+
+    def _leer_conteos(self):
+        try:
+            with open(self.ruta_json, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _recortar(self, datos):
+        """Si hay demasiadas preguntas distintas, se quedan las más frecuentes/recientes."""
+        if len(datos) <= self.max_preguntas:
+            return datos
+        orden = sorted(datos.items(), key=lambda x: (x[1]["veces"], x[1]["ultima"]), reverse=True)
+        return dict(orden[:self.max_preguntas])
+
+    def _escribir_conteos(self, datos):
+        tmp = f"{self.ruta_json}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False)
+        os.replace(tmp, self.ruta_json)
+
+    # -----------------------------
+    # Consulta
+    # -----------------------------
+    def top(self, n=20):
+        """Las n preguntas sin respuesta más repetidas (todos los workers)."""
+        self.vaciar()
+        datos = self._leer_conteos()
+        orden = sorted(datos.items(), key=lambda x: (x[1]["veces"], x[1]["ultima"]), reverse=True)
+        return [{"pregunta": e["ejemplo"], "normalizada": llave, **{k: e[k] for k in ("veces", "primera", "ultima")}}
+                for llave, e in orden[:n]]
+
+    def estadisticas(self):
+        return {
+            "en_cola": self._cola.qsize(),
+            "registradas": self.registradas,
+            "descartadas": self.descartadas,
+            "escrituras": self.escrituras,
+        }
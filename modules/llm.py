@@ -0,0 +1,260 @@
+# ---------------------------------------------------------
+# Gateway asíncrono hacia el LLM (Gemini u otro backend)
+# ---------------------------------------------------------
+# - Límite de llamadas simultáneas (semáforo con prioridad: cuando hay cola,
+#   las respuestas basadas en el CSV pasan antes que las preguntas abiertas)
+# - Plazo por llamada: si se vence, el que llama usa su respuesta local
+# - Prompts idénticos en vuelo se agrupan en una sola llamada al backend
+import asyncio
+import heapq
+import itertools
+import os
+from contextlib import asynccontextmanager
+
+# Menor número = se atiende primero
+PRIORIDAD_CSV = 0
+PRIORIDAD_GENERAL = 1
+
+
+class StreamIncompleto(Exception):
+    """El stream se cortó (plazo vencido o error del backend) antes de terminar."""
+
+
+class BackendGemini:
+    """Cliente oficial de Gemini (reutiliza la conexión del SDK)."""
+
+    def __init__(self, api_key, modelo="gemini-pro"):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._modelo = genai.GenerativeModel(modelo)
+
+    async def generar(self, prompt):
+        respuesta = await self._modelo.generate_content_async(prompt)
+        return respuesta.text
+
+    async def generar_stream(self, prompt):
+        respuesta = await self._modelo.generate_content_async(prompt, stream=True)
+        async for fragmento in respuesta:
+            if fragmento.text:
+                yield fragmento.text
+
+
+class BackendHTTP:
+    """
+    LLM detrás de un endpoint HTTP propio: POST {"prompt": ...} -> {"texto": ...}.
+    Sirve para probar contra el servidor falso de benchmarks/llm_falso.py.
+    """
+
+    def __init__(self, url, timeout=30.0):
+        import httpx
+        self.url = url
+        self._cliente = httpx.AsyncClient(timeout=timeout)  # pool de conexiones keep-alive
+
+    async def generar(self, prompt):
+        respuesta = await self._cliente.post(self.url, json={"prompt": prompt})
+        respuesta.raise_for_status()
+        return respuesta.json()["texto"]
+
+    async def generar_stream(self, prompt):
+        # El endpoint propio no transmite por partes: un solo fragmento
+        yield await self.generar(prompt)
+
+
+class BackendFalso:
+    """
+    LLM en proceso con latencia inyectada (pruebas y benchmarks).
+    En modo streaming entrega la primera palabra tras `latencia` y el resto
+    cada `latencia_fragmento` segundos.
+    """
+
+    def __init__(self, latencia=0.0, latencia_fragmento=0.02):
+        self.latencia = latencia
+        self.latencia_fragmento = latencia_fragmento
+        self.llamadas = 0
+
+    @staticmethod
+    def _texto(prompt):
+        return f"[LLM falso] {' '.join(prompt.split())[:200]}"
+
+    async def generar(self, prompt):
+        self.llamadas += 1
+        await asyncio.sleep(self.latencia)
+        return self._texto(prompt)
+
+    async def generar_stream(self, prompt):
+        self.llamadas += 1
+        await asyncio.sleep(self.latencia)
+        for i, palabra in enumerate(self._texto(prompt).split(" ")):
+            if i:
+                await asyncio.sleep(self.latencia_fragmento)
+            yield palabra if i == 0 else f" {palabra}"
+
+
+class SemaforoPrioridad:
+    """
+    Como asyncio.Semaphore, pero al liberarse un lugar lo recibe quien tenga
+    la prioridad más baja (y entre iguales, el que llegó primero).
+    """
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.ocupados = 0
+        self._espera = []  # heap de (prioridad, orden, futuro)
+        self._orden = itertools.count()
+
+    async def adquirir(self, prioridad=PRIORIDAD_CSV):
+        if self.ocupados < self.capacidad and not self.en_espera():
+            self.ocupados += 1
+            return
+        futuro = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._espera, (prioridad, next(self._orden), futuro))
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            # Se le asignó el lugar justo cuando se canceló: pasarlo al siguiente
+            if futuro.done() and not futuro.cancelled():
+                self.liberar()
+            raise
+
+    def liberar(self):
+        while self._espera:
+            _, _, futuro = heapq.heappop(self._espera)
+            if not futuro.done():
+                futuro.set_result(True)  # el lugar pasa directo (ocupados no cambia)
+                return
+        self.ocupados -= 1
+
+    def en_espera(self, prioridad=None):
+        return sum(1 for p, _, f in self._espera if not f.done() and (prioridad is None or p == prioridad))
+
+
+class GatewayLLM:
+    """
+    Punto único de acceso al LLM. `generar()` nunca lanza excepción:
+    devuelve None si el backend falla o si se vence el plazo.
+    """
+
+    def __init__(self, backend, max_concurrencia=8, timeout=8.0, max_cola=None):
+        self.backend = backend
+        self.max_concurrencia = max_concurrencia
+        self.timeout = timeout
+        # Preguntas abiertas en espera a partir de las cuales se considera saturado
+        self.max_cola = max_concurrencia * 2 if max_cola is None else max_cola
+        self._semaforo = SemaforoPrioridad(max_concurrencia)
+        self._por_entrar = [0, 0]  # llamadas creadas sin lugar todavía, por prioridad
+        self._en_vuelo = {}
+        self.llamadas = 0
+        self.agrupadas = 0
+        self.vencidas = 0
+        self.errores = 0
+
+    def saturado(self):
+        """True si ya hay demasiadas preguntas abiertas esperando lugar."""
+        libres = self._semaforo.capacidad - self._semaforo.ocupados
+        return self._por_entrar[PRIORIDAD_GENERAL] - libres >= self.max_cola
+
+    @asynccontextmanager
+    async def _lugar(self, prioridad):
+        # Se cuenta desde antes de que la tarea corra: así saturado() ve
+        # también las llamadas recién creadas en el mismo ciclo del loop
+        try:
+            await self._semaforo.adquirir(prioridad)
+        finally:
+            self._por_entrar[prioridad] -= 1
+        try:
+            yield
+        finally:
+            self._semaforo.liberar()
+
+    async def _llamar(self, prompt, prioridad):
+        async with self._lugar(prioridad):
+            self.llamadas += 1
+            return await asyncio.wait_for(self.backend.generar(prompt), self.timeout)
+
+    def _olvidar(self, prompt, tarea):
+        if self._en_vuelo.get(prompt) is tarea:
+            del self._en_vuelo[prompt]
+        # Marca el error como leído aunque todos los que esperaban ya se hayan ido
+        if not tarea.cancelled() and tarea.exception() is not None:
+            self.errores += 1
+
+    async def generar(self, prompt, timeout=None, prioridad=PRIORIDAD_CSV):
+        tarea = self._en_vuelo.get(prompt)
+        if tarea is None:
+            self._por_entrar[prioridad] += 1
+            tarea = asyncio.ensure_future(self._llamar(prompt, prioridad))
+            self._en_vuelo[prompt] = tarea
+            tarea.add_done_callback(lambda t: self._olvidar(prompt, t))
+        else:
+            self.agrupadas += 1
+
+        try:
+            # shield: si este cliente se rinde, la llamada sigue para los demás
+            return await asyncio.wait_for(asyncio.shield(tarea), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.vencidas += 1
+            return None
+        except Exception:
+            return None
+
+    async def generar_stream(self, prompt, timeout=None, prioridad=PRIORIDAD_CSV):
+        """
+        Fragmentos del LLM a medida que llegan. El plazo aplica a cada fragmento;
+        si el backend falla o se vence se lanza StreamIncompleto (lo ya entregado
+        no es una respuesta completa: no se debe guardar).
+        """
+        limite = timeout or self.timeout
+        self._por_entrar[prioridad] += 1
+        async with self._lugar(prioridad):
+            self.llamadas += 1
+            fragmentos = self.backend.generar_stream(prompt).__aiter__()
+            try:
+                while True:
+                    yield await asyncio.wait_for(fragmentos.__anext__(), limite)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError as e:
+                self.vencidas += 1
+                raise StreamIncompleto("plazo vencido") from e
+            except Exception as e:
+                self.errores += 1
+                raise StreamIncompleto(str(e)) from e
+
+    def estadisticas(self):
+        return {
+            "llamadas": self.llamadas,
+            "agrupadas": self.agrupadas,
+            "vencidas": self.vencidas,
+            "errores": self.errores,
+            "en_vuelo": len(self._en_vuelo),
+            "en_cola": self._semaforo.en_espera(),
+            "en_cola_general": self._semaforo.en_espera(PRIORIDAD_GENERAL),
+        }
+
+
+def crear_gateway_desde_entorno():
+    """
+    Elige el backend según variables de entorno:
+      AULABOT_LLM_FALSO=<latencia>  -> BackendFalso (sin red)
+      AULABOT_LLM_URL=<url>         -> BackendHTTP
+      GEMINI_API_KEY=<clave>        -> BackendGemini
+    Devuelve None si no hay ninguno configurado.
+    """
+    max_concurrencia = int(os.getenv("AULABOT_LLM_CONCURRENCIA", "8"))
+    timeout = float(os.getenv("AULABOT_LLM_TIMEOUT", "8"))
+    max_cola = os.getenv("AULABOT_LLM_MAX_COLA")
+    max_cola = int(max_cola) if max_cola else None
+
+    if os.getenv("AULABOT_LLM_FALSO"):
+        backend = BackendFalso(float(os.getenv("AULABOT_LLM_FALSO")))
+    elif os.getenv("AULABOT_LLM_URL"):
+        backend = BackendHTTP(os.getenv("AULABOT_LLM_URL"))
+    elif os.getenv("GEMINI_API_KEY"):
+        try:
+            backend = BackendGemini(os.getenv("GEMINI_API_KEY"))
+        except Exception as e:
+            print(f"⚠️ No se pudo configurar Gemini: {e}")
+            return None
+    else:
+        return None
+    return GatewayLLM(backend, max_concurrencia=max_concurrencia, timeout=timeout, max_cola=max_cola)
@@ -1,50 +1,436 @@
 # ---------------------------------------------------------
-# Memoria de sesión en RAM (Soporte Multi-usuario)
+# Memoria de sesión (Soporte Multi-usuario)
 # ---------------------------------------------------------
+# Las sesiones viven detrás de un SessionStore intercambiable:
+#   - MemoriaLRU: en el proceso, con tope de sesiones y expiración (TTL)
+#   - MemoriaSQLite: archivo SQLite en modo WAL compartido entre workers
+# Se elige con AULABOT_SESIONES ("memoria" o "sqlite:<ruta>").
+# SQLite bloquea (hasta `timeout` s si otro worker tiene el candado de
+# escritura): sus llamadas van a un pool de hilos propio vía en_almacen(),
+# así una espera de candado frena ese mensaje y no todo el event loop.
+# El mismo almacén guarda las cubetas de fichas del control de admisión
+# (modules/admision.py): con SQLite el límite es compartido entre workers.
+#
+# Historial de conversación: los últimos turnos en un anillo de tamaño fijo
+# y, de los que ya salieron, un resumen incremental (temas con peso que se
+# desvanece). Ambos tienen tope: la sesión y el bloque que va al prompt no
+# crecen por mucho que dure la plática.
+import asyncio
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-# Diccionario global para almacenar las sesiones
-_memorias_usuarios = {}
+from modules.recuperacion import tokenizar
 
-def obtener_memoria(user_id: str) -> dict:
+TTL_SESION = float(os.getenv("AULABOT_SESIONES_TTL", str(6 * 3600)))
+MAX_SESIONES = int(os.getenv("AULABOT_SESIONES_MAX", "50000"))
+# Hilos (y conexiones SQLite) para las operaciones del almacén bloqueante
+HILOS_ALMACEN = int(os.getenv("AULABOT_SESIONES_HILOS", "4"))
+TURNOS_HISTORIAL = int(os.getenv("AULABOT_HISTORIAL_TURNOS", "4"))
+MAX_CARACTERES_TURNO = 240
+MAX_TEMAS = 8
+DESVANECER_TEMAS = 0.7
+
+
+class Anillo:
     """
-    Devuelve la memoria actual de un usuario específico.
-    Si no existe, devuelve un diccionario vacío con estructura completa.
+    Búfer circular de capacidad fija (como deque(maxlen=n)), sobre una lista
+    reservada una sola vez: agregar no realoja, solo reemplaza una casilla.
     """
-    global _memorias_usuarios
-    if user_id not in _memorias_usuarios:
-        _memorias_usuarios[user_id] = {
-            'carrera_seleccionada': None,
-            'modo_materias': False,
-            'ultimo_tema': None,
-            'conversacion': [],  # Historial de últimos mensajes
-            'contexto_anterior': None
-        }
-    return _memorias_usuarios[user_id].copy()
 
-def guardar_memoria(user_id: str, datos: dict):
+    __slots__ = ('_datos', '_inicio', '_n')
+
+    def __init__(self, capacidad, elementos=()):
+        self._datos = [None] * capacidad
+        self._inicio = 0
+        self._n = 0
+        for elemento in elementos:
+            self.agregar(elemento)
+
+    def agregar(self, elemento):
+        """Agrega al final; si ya estaba lleno devuelve el elemento más viejo que salió."""
+        capacidad = len(self._datos)
+        if self._n < capacidad:
+            self._datos[(self._inicio + self._n) % capacidad] = elemento
+            self._n += 1
+            return None
+        saliente = self._datos[self._inicio]
+        self._datos[self._inicio] = elemento
+        self._inicio = (self._inicio + 1) % capacidad
+        return saliente
+
+    def __iter__(self):
+        capacidad = len(self._datos)
+        for i in range(self._n):
+            yield self._datos[(self._inicio + i) % capacidad]
+
+    def __len__(self):
+        return self._n
+
+
+def _recortar(texto, limite=MAX_CARACTERES_TURNO):
+    texto = " ".join(texto.split())
+    return texto if len(texto) <= limite else texto[:limite - 1] + "…"
+
+
+class Sesion:
     """
-    Guarda o actualiza los datos de sesión de un usuario.
+    Estado de conversación de un usuario.
+    Con __slots__ (sin __dict__ por instancia) y marca de cambios: solo se
+    escribe de vuelta al almacén si algún campo cambió durante el mensaje.
     """
-    global _memorias_usuarios
-    _memorias_usuarios[user_id] = datos
+
+    CAMPOS = ('nombre_usuario', 'esperando_nombre', 'carrera_seleccionada', 'modo_materias', 'historial', 'temas')
+    __slots__ = CAMPOS + ('_sucia',)
+
+    def __init__(self, nombre_usuario='', esperando_nombre=False, carrera_seleccionada=None, modo_materias=False,
+                 historial=None, temas=None):
+        object.__setattr__(self, 'nombre_usuario', nombre_usuario)
+        object.__setattr__(self, 'esperando_nombre', esperando_nombre)
+        object.__setattr__(self, 'carrera_seleccionada', carrera_seleccionada)
+        object.__setattr__(self, 'modo_materias', modo_materias)
+        # El anillo se crea con el primer turno: una sesión sin plática no lo paga
+        if historial is not None and not isinstance(historial, Anillo):
+            historial = Anillo(TURNOS_HISTORIAL, (tuple(t) for t in historial))
+        object.__setattr__(self, 'historial', historial)
+        object.__setattr__(self, 'temas', temas or None)
+        object.__setattr__(self, '_sucia', False)
+
+    def __setattr__(self, campo, valor):
+        if getattr(self, campo) != valor:
+            object.__setattr__(self, campo, valor)
+            object.__setattr__(self, '_sucia', True)
+
+    @property
+    def sucia(self) -> bool:
+        return self._sucia
+
+    def marcar(self, sucia=True):
+        object.__setattr__(self, '_sucia', sucia)
+
+    # -----------------------------
+    # Historial y resumen
+    # -----------------------------
+    def anotar_turno(self, mensaje, respuesta):
+        """Guarda el turno en el anillo; el que sale se pliega en el resumen."""
+        if self.historial is None:
+            object.__setattr__(self, 'historial', Anillo(TURNOS_HISTORIAL))
+        saliente = self.historial.agregar((_recortar(mensaje), _recortar(respuesta)))
+        if saliente is not None:
+            self._plegar(saliente)
+        self.marcar()
+
+    def _plegar(self, turno):
+        # Resumen incremental: los temas del turno que sale suman peso y los
+        # anteriores se desvanecen; solo quedan los MAX_TEMAS más pesados
+        temas = {t: p * DESVANECER_TEMAS for t, p in (self.temas or {}).items()}
+        for token in tokenizar(turno[0]):
+            if not token.isdigit():
+                temas[token] = temas.get(token, 0.0) + 1.0
+        mejores = sorted(temas.items(), key=lambda x: x[1], reverse=True)[:MAX_TEMAS]
+        object.__setattr__(self, 'temas', {t: round(p, 3) for t, p in mejores})
+
+    def contexto_conversacion(self) -> str:
+        """Bloque para el prompt: temas previos y últimos turnos (tamaño acotado)."""
+        partes = []
+        if self.temas:
+            partes.append("Temas anteriores: " + ", ".join(self.temas))
+        for mensaje, respuesta in self.historial or ():
+            partes.append(f"Alumno: {mensaje}\nAulaBot: {respuesta}")
+        return "\n".join(partes)
+
+    def a_dict(self) -> dict:
+        datos = {campo: getattr(self, campo) for campo in self.CAMPOS}
+        datos['historial'] = list(self.historial) if self.historial is not None else None
+        return datos
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> "Sesion":
+        return cls(**{campo: datos[campo] for campo in cls.CAMPOS if campo in datos})
+
+    def __repr__(self):
+        return f"Sesion({self.a_dict()})"
+
+
+class SessionStore:
+    """Interfaz común de los almacenes de sesión."""
+
+    # True si sus operaciones pueden esperar E/S o candados (van fuera del event loop)
+    bloqueante = False
+
+    def obtener(self, user_id: str):
+        """Sesion del usuario o None si no existe / expiró."""
+        raise NotImplementedError
+
+    def guardar(self, user_id: str, sesion: "Sesion"):
+        raise NotImplementedError
+
+    def borrar(self, user_id: str):
+        raise NotImplementedError
+
+    def consumir_fichas(self, llave: str, capacidad: float, por_segundo: float, costo: float = 1.0) -> bool:
+        """
+        Cubeta de fichas: se rellena a `por_segundo` hasta `capacidad`.
+        Descuenta `costo` y devuelve True si alcanzaba; si no, no descuenta nada.
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def conteo(self) -> int:
+        """Número de sesiones para /metrics: se llama desde el event loop, no debe bloquear."""
+        return len(self)
+
+
+def _rellenar(fichas, actualizado, ahora, capacidad, por_segundo):
+    return min(capacidad, fichas + (ahora - actualizado) * por_segundo)
+
+
+class MemoriaLRU(SessionStore):
+    """Sesiones en RAM: las menos usadas se desalojan al llegar al tope."""
+
+    def __init__(self, max_sesiones=MAX_SESIONES, ttl=TTL_SESION):
+        self.max_sesiones = max_sesiones
+        self.ttl = ttl
+        self._sesiones = OrderedDict()  # user_id -> [expira_en, Sesion] (sin copias)
+        self._cubetas = OrderedDict()   # llave -> (fichas, actualizado)
+        self._lock = threading.Lock()
+        self.desalojadas = 0
+
+    def obtener(self, user_id):
+        with self._lock:
+            entrada = self._sesiones.get(user_id)
+            if entrada is None:
+                return None
+            ahora = time.monotonic()
+            if entrada[0] < ahora:
+                del self._sesiones[user_id]
+                return None
+            entrada[0] = ahora + self.ttl
+            self._sesiones.move_to_end(user_id)
+            return entrada[1]
+
+    def guardar(self, user_id, sesion):
+        with self._lock:
+            self._sesiones[user_id] = [time.monotonic() + self.ttl, sesion]
+            self._sesiones.move_to_end(user_id)
+            while len(self._sesiones) > self.max_sesiones:
+                self._sesiones.popitem(last=False)
+                self.desalojadas += 1
+
+    def borrar(self, user_id):
+        with self._lock:
+            self._sesiones.pop(user_id, None)
+
+    def consumir_fichas(self, llave, capacidad, por_segundo, costo=1.0):
+        with self._lock:
+            ahora = time.monotonic()
+            fichas, actualizado = self._cubetas.get(llave, (capacidad, ahora))
+            fichas = _rellenar(fichas, actualizado, ahora, capacidad, por_segundo)
+            permitido = fichas >= costo
+            if permitido:
+                fichas -= costo
+            self._cubetas[llave] = (fichas, ahora)
+            self._cubetas.move_to_end(llave)
+            # Una cubeta desalojada vuelve llena: solo se pierde límite de los inactivos
+            while len(self._cubetas) > self.max_sesiones:
+                self._cubetas.popitem(last=False)
+            return permitido
+
+    def __len__(self):
+        return len(self._sesiones)
+
+
+class MemoriaSQLite(SessionStore):
+    """
+    Sesiones en un archivo SQLite (WAL): todos los workers de uvicorn ven
+    el mismo estado, sin necesidad de sticky sessions.
+    """
+
+    bloqueante = True
+
+    def __init__(self, ruta, max_sesiones=MAX_SESIONES, ttl=TTL_SESION, purgar_cada=500, contar_cada=30.0):
+        self.ruta = ruta
+        self.max_sesiones = max_sesiones
+        self.ttl = ttl
+        self.purgar_cada = purgar_cada
+        self.contar_cada = contar_cada
+        self._local = threading.local()
+        self._escrituras = 0
+        self._conteo = 0
+        self._contado_en = 0.0
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        con = self._conexion()
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS sesiones ("
+            " user_id TEXT PRIMARY KEY, datos TEXT NOT NULL, expira_en REAL NOT NULL)"
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS idx_sesiones_expira ON sesiones(expira_en)")
+        self._contar()
+        # lleno_en: a partir de cuándo la cubeta estaría llena (se puede borrar)
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS cubetas ("
+            " llave TEXT PRIMARY KEY, fichas REAL NOT NULL, actualizado REAL NOT NULL, lleno_en REAL NOT NULL)"
+        )
+
+    def _conexion(self):
+        # sqlite3 no comparte conexiones entre hilos: una por hilo
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def obtener(self, user_id):
+        con = self._conexion()
+        ahora = time.time()
+        fila = con.execute(
+            "SELECT datos, expira_en FROM sesiones WHERE user_id = ? AND expira_en >= ?", (user_id, ahora)
+        ).fetchone()
+        if not fila:
+            return None
+        # Renovar el TTL solo cuando ya pasó la mitad (evita una escritura por lectura)
+        if fila[1] - ahora < self.ttl / 2:
+            con.execute("UPDATE sesiones SET expira_en = ? WHERE user_id = ?", (ahora + self.ttl, user_id))
+        return Sesion.desde_dict(json.loads(fila[0]))
+
+    def guardar(self, user_id, sesion):
+        self._conexion().execute(
+            "INSERT OR REPLACE INTO sesiones (user_id, datos, expira_en) VALUES (?, ?, ?)",
+            (user_id, json.dumps(sesion.a_dict(), ensure_ascii=False), time.time() + self.ttl),
+        )
+        self._escrituras += 1
+        if self._escrituras % self.purgar_cada == 0:
+            self.purgar()
+        elif time.time() - self._contado_en >= self.contar_cada:
+            self._contar()
+
+    def borrar(self, user_id):
+        self._conexion().execute("DELETE FROM sesiones WHERE user_id = ?", (user_id,))
+
+    def consumir_fichas(self, llave, capacidad, por_segundo, costo=1.0):
+        con = self._conexion()
+        # BEGIN IMMEDIATE: leer y descontar sin que otro worker se cuele en medio
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            ahora = time.time()
+            fila = con.execute("SELECT fichas, actualizado FROM cubetas WHERE llave = ?", (llave,)).fetchone()
+            fichas = _rellenar(*fila, ahora, capacidad, por_segundo) if fila else capacidad
+            permitido = fichas >= costo
+            if permitido:
+                fichas -= costo
+            lleno_en = ahora + (capacidad - fichas) / por_segundo if por_segundo > 0 else float("inf")
+            con.execute(
+                "INSERT OR REPLACE INTO cubetas (llave, fichas, actualizado, lleno_en) VALUES (?, ?, ?, ?)",
+                (llave, fichas, ahora, lleno_en),
+            )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        return permitido
+
+    def purgar(self):
+        """Elimina sesiones vencidas y, si sobran, las de expiración más próxima."""
+        con = self._conexion()
+        con.execute("DELETE FROM sesiones WHERE expira_en < ?", (time.time(),))
+        con.execute("DELETE FROM cubetas WHERE lleno_en < ?", (time.time(),))
+        exceso = len(self) - self.max_sesiones
+        if exceso > 0:
+            con.execute(
+                "DELETE FROM sesiones WHERE user_id IN"
+                " (SELECT user_id FROM sesiones ORDER BY expira_en LIMIT ?)", (exceso,)
+            )
+        self._contar()
+
+    def _contar(self):
+        # Lo llaman guardar()/purgar(), que ya corren fuera del event loop
+        self._conteo = len(self)
+        self._contado_en = time.time()
+
+    def conteo(self):
+        # El COUNT(*) puede esperar el busy timeout: /metrics lee el último conteo
+        return self._conteo
+
+    def __len__(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+
+
+def crear_store(config=None) -> SessionStore:
+    """'memoria' (por defecto) o 'sqlite:<ruta>'."""
+    config = config or os.getenv("AULABOT_SESIONES", "memoria")
+    if config.startswith("sqlite:"):
+        return MemoriaSQLite(config[len("sqlite:"):])
+    return MemoriaLRU()
+
+
+# Almacén global de sesiones
+store = crear_store()
+
+# Una tarea puede usar su propio almacén (el calentamiento no escribe en el global)
+_store_propio = contextvars.ContextVar("aulabot_store_propio", default=None)
+
+def usar_store_propio(almacen=None):
+    """Desde aquí, esta tarea usa `almacen` (uno pequeño en memoria si no se da)."""
+    _store_propio.set(almacen if almacen is not None else MemoriaLRU(max_sesiones=16))
+
+def _store():
+    propio = _store_propio.get()
+    return store if propio is None else propio
+
+_ejecutor = None
+
+async def en_almacen(funcion, *args):
+    """
+    Corre una operación que toca el almacén (sesión, fichas) desde código async.
+    En memoria es una llamada directa; con SQLite va al pool de hilos del
+    almacén (con las contextvars del mensaje, p. ej. el usuario de admisión).
+    """
+    if not _store().bloqueante:
+        return funcion(*args)
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = ThreadPoolExecutor(max_workers=HILOS_ALMACEN, thread_name_prefix="aulabot-sesiones")
+    contexto = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_ejecutor, contexto.run, funcion, *args)
+
+def obtener_memoria(user_id: str) -> Sesion:
+    """
+    Devuelve la sesión de un usuario específico (sin copiarla).
+    Si no existe, devuelve una nueva marcada como modificada; se guarda
+    con guardar_memoria() al terminar el mensaje.
+    """
+    sesion = _store().obtener(user_id)
+    if sesion is None:
+        sesion = Sesion()
+        sesion.marcar()
+    return sesion
+
+def guardar_memoria(user_id: str, sesion: Sesion):
+    """
+    Escribe la sesión en el almacén solo si cambió (una escritura por mensaje como máximo).
+    """
+    if sesion.sucia:
+        _store().guardar(user_id, sesion)
+        sesion.marcar(False)
 
 def reset_memoria(user_id: str):
     """
     Borra la memoria de un usuario (ej. cuando dice 'menu' o 'salir').
     """
-    global _memorias_usuarios
-    if user_id in _memorias_usuarios:
-        del _memorias_usuarios[user_id]
-
-def actualizar_conversacion(user_id: str, mensaje: str, respuesta: str):
-    """Guarda el contexto de la conversación"""
-    memoria = obtener_memoria(user_id)
-    if 'conversacion' not in memoria:
-        memoria['conversacion'] = []
-    
-    memoria['conversacion'].append({'usuario': mensaje, 'bot': respuesta})
-    # Mantener solo los últimos 5 mensajes
-    if len(memoria['conversacion']) > 5:
-        memoria['conversacion'] = memoria['conversacion'][-5:]
-    
-    guardar_memoria(user_id, memoria)
\ No newline at end of file
+    _store().borrar(user_id)
+
+def actualizar_conversacion(sesion: Sesion, mensaje: str, respuesta: str):
+    """
+    Anota el turno en el historial de la sesión (anillo + resumen, sin copias).
+    Se escribe al almacén junto con el resto en guardar_memoria().
+    """
+    sesion.anotar_turno(mensaje, respuesta)
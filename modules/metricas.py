@@ -0,0 +1,241 @@
+# ---------------------------------------------------------
+# Métricas (formato de texto de Prometheus) y perfilador por muestreo
+# ---------------------------------------------------------
+# Sin dependencias: contadores e histogramas con etiquetas, tramos de tiempo
+# (`with tramo(...)`) y un cronómetro por mensaje que mide cada etapa de la
+# cascada de generar_respuesta. /metrics expone todo con exportar().
+import bisect
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Cubetas en segundos: del fuzzy (µs) a las llamadas al LLM (segundos)
+CUBETAS_RAPIDAS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+CUBETAS_LENTAS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRO = []
+
+# Las tareas marcadas (el calentamiento) no cuentan en ninguna serie
+_sin_metricas = contextvars.ContextVar("aulabot_sin_metricas", default=False)
+
+
+def fijar_sin_metricas(valor=True):
+    _sin_metricas.set(valor)
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    pares = ",".join(f'{n}="{str(v).replace(chr(34), chr(39))}"' for n, v in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self._valores = Counter()
+        self._lock = threading.Lock()
+        _REGISTRO.append(self)
+
+    def inc(self, cantidad=1, **etiquetas):
+        if _sin_metricas.get():
+            return
+        llave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._lock:
+            self._valores[llave] += cantidad
+
+    def valor(self, **etiquetas):
+        return self._valores[tuple(etiquetas.get(n, "") for n in self.etiquetas)]
+
+    def exportar(self):
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} counter"
+        for llave, valor in sorted(self._valores.items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, llave)} {valor}"
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS_LENTAS):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self.cubetas = tuple(cubetas)
+        self._series = {}  # etiquetas -> [conteos por cubeta..., +Inf, suma]
+        self._lock = threading.Lock()
+        _REGISTRO.append(self)
+
+    def observar(self, segundos, **etiquetas):
+        if _sin_metricas.get():
+            return
+        llave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        i = bisect.bisect_left(self.cubetas, segundos)
+        with self._lock:
+            serie = self._series.get(llave)
+            if serie is None:
+                serie = self._series[llave] = [0] * (len(self.cubetas) + 1) + [0.0]
+            serie[i] += 1
+            serie[-1] += segundos
+
+    def exportar(self):
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} histogram"
+        for llave, serie in sorted(self._series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.cubetas + ("+Inf",), serie[:-1]):
+                acumulado += conteo
+                yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas + ('le',), llave + (limite,))} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, llave)} {serie[-1]:.6f}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, llave)} {acumulado}"
+
+
+class Indicador:
+    """Valor instantáneo leído al exportar (tamaños de caché, sesiones...)."""
+
+    def __init__(self, nombre, ayuda, funcion):
+        self.nombre, self.ayuda, self.funcion = nombre, ayuda, funcion
+        _REGISTRO.append(self)
+
+    def exportar(self):
+        try:
+            valor = self.funcion()
+        except Exception:
+            return
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} gauge"
+        yield f"{self.nombre} {valor}"
+
+
+def exportar() -> str:
+    return "\n".join(linea for metrica in _REGISTRO for linea in metrica.exportar()) + "\n"
+
+
+# -----------------------------
+# Métricas de AulaBot
+# -----------------------------
+respuestas = Contador("aulabot_respuestas_total", "Mensajes respondidos por etapa de la cascada", ("etapa",))
+errores = Contador("aulabot_errores_total", "Excepciones atrapadas por ruta", ("ruta",))
+duracion_respuesta = Histograma("aulabot_respuesta_segundos", "Tiempo total de generar_respuesta", ("etapa",))
+duracion_etapa = Histograma("aulabot_etapa_segundos", "Tiempo dentro de cada etapa de la cascada", ("etapa",), CUBETAS_RAPIDAS)
+duracion_fuzzy = Histograma("aulabot_fuzzy_segundos", "Latencia de las coincidencias (fuzzy y BM25)", ("tipo",), CUBETAS_RAPIDAS)
+duracion_llm = Histograma("aulabot_llm_segundos", "Latencia de las consultas al LLM", ("tipo", "resultado"))
+llm_no_admitidas = Contador("aulabot_llm_no_admitidas_total", "Llamadas al LLM rechazadas por el control de admisión", ("motivo", "tipo"))
+duracion_io = Histograma("aulabot_io_segundos", "Latencia de lecturas/escrituras a disco y al almacén de sesiones", ("operacion",), CUBETAS_RAPIDAS)
+duracion_http = Histograma("aulabot_http_segundos", "Latencia por ruta HTTP", ("ruta", "codigo"))
+
+
+@contextmanager
+def tramo(histograma, **etiquetas):
+    """Mide el bloque y lo observa en `histograma` (también con await dentro)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograma.observar(time.perf_counter() - inicio, **etiquetas)
+
+
+# -----------------------------
+# Cronómetro de etapas (uno por mensaje)
+# -----------------------------
+class Cronometro:
+    """
+    Cada vuelta(etapa) cierra la etapa anterior; la última marcada es la que
+    respondió. Así la cascada se instrumenta con una línea por etapa.
+    """
+
+    __slots__ = ("inicio", "marca", "etapa")
+
+    def __init__(self):
+        self.inicio = self.marca = time.perf_counter()
+        self.etapa = None
+
+    def vuelta(self, etapa):
+        ahora = time.perf_counter()
+        if self.etapa is not None:
+            duracion_etapa.observar(ahora - self.marca, etapa=self.etapa)
+        self.marca, self.etapa = ahora, etapa
+
+    def terminar(self):
+        """Cierra la última etapa (la que respondió) y registra el total."""
+        respondio = self.etapa or "desconocida"
+        self.vuelta(None)
+        respuestas.inc(etapa=respondio)
+        duracion_respuesta.observar(self.marca - self.inicio, etapa=respondio)
+        return respondio
+
+
+_cronometro = contextvars.ContextVar("cronometro", default=None)
+
+
+def iniciar_cronometro() -> Cronometro:
+    cronometro = Cronometro()
+    _cronometro.set(cronometro)
+    return cronometro
+
+
+def etapa(nombre):
+    """Marca el inicio de una etapa en el mensaje en curso (sin cronómetro no hace nada)."""
+    cronometro = _cronometro.get()
+    if cronometro is not None:
+        cronometro.vuelta(nombre)
+
+
+# -----------------------------
+# Perfilador por muestreo (se enciende y apaga en caliente)
+# -----------------------------
+class Perfilador:
+    """
+    Un hilo toma cada `intervalo` segundos la pila del hilo observado y cuenta
+    pilas en formato "colapsado" (una línea por pila, apto para flamegraph.pl
+    o speedscope). Apagado no cuesta nada.
+    """
+
+    def __init__(self):
+        self._hilo = None
+        self._detener = threading.Event()
+        self.muestras = Counter()
+        self.intervalo = 0.005
+        self.objetivo = None
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self, intervalo=0.005, hilo_id=None):
+        if self.activo:
+            return False
+        self.intervalo = intervalo
+        self.objetivo = hilo_id or threading.get_ident()
+        self.muestras = Counter()
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._muestrear, name="aulabot-perfilador", daemon=True)
+        self._hilo.start()
+        return True
+
+    def detener(self):
+        if not self.activo:
+            return False
+        self._detener.set()
+        self._hilo.join()
+        return True
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            marco = sys._current_frames().get(self.objetivo)
+            if marco is None:
+                continue
+            pila = []
+            while marco is not None:
+                codigo = marco.f_code
+                pila.append(f"{codigo.co_filename.rsplit('/', 1)[-1]}:{codigo.co_name}:{marco.f_lineno}")
+                marco = marco.f_back
+            self.muestras[";".join(reversed(pila))] += 1
+
+    def colapsado(self, limite=None) -> str:
+        return "\n".join(f"{pila} {n}" for pila, n in self.muestras.most_common(limite)) + "\n"
+
+    def estado(self):
+        return {"activo": self.activo, "intervalo_s": self.intervalo, "muestras": sum(self.muestras.values()), "pilas": len(self.muestras)}
+
+
+perfilador = Perfilador()
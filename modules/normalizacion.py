@@ -0,0 +1,46 @@
+# ---------------------------------------------------------
+# Normalización de texto compartida
+# ---------------------------------------------------------
+# Quitar acentos con NFD + unicodedata.category() recorre el texto carácter
+# por carácter en Python. Aquí se precalcula una tabla para str.translate
+# (una sola pasada en C) con todas las letras latinas acentuadas; solo si
+# queda algo fuera de ASCII se recurre al camino NFD, con el mismo resultado.
+# Los mensajes de usuario se repiten mucho: limpiar_texto() tiene LRU.
+import unicodedata
+from functools import lru_cache
+
+
+def _sin_acentos_lento(texto):
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+
+
+def _construir_tabla():
+    tabla = {}
+    # Latin-1, Latin Extended-A/B y Latin Extended Additional (ẽ, ỳ...)
+    for codigo in list(range(0xC0, 0x250)) + list(range(0x1E00, 0x1F00)):
+        c = chr(codigo)
+        sin_acento = _sin_acentos_lento(c)
+        if sin_acento != c:
+            tabla[codigo] = sin_acento
+    # Marcas combinantes sueltas (texto que ya venía descompuesto)
+    for codigo in range(0x300, 0x370):
+        if unicodedata.category(chr(codigo)) == 'Mn':
+            tabla[codigo] = None
+    return tabla
+
+
+_TABLA_SIN_ACENTOS = _construir_tabla()
+
+
+def quitar_acentos(texto: str) -> str:
+    """Igual que NFD sin marcas (Mn), pero con str.translate para el caso común."""
+    resultado = texto.translate(_TABLA_SIN_ACENTOS)
+    if resultado.isascii():
+        return resultado
+    return _sin_acentos_lento(resultado)
+
+
+@lru_cache(maxsize=8192)
+def limpiar_texto(texto):
+    """Minúsculas y sin acentos (á -> a, ñ -> n). Memorizado por mensaje."""
+    return quitar_acentos(texto.lower())
@@ -0,0 +1,198 @@
+# ---------------------------------------------------------
+# Recarga en caliente del catálogo (sin reiniciar workers)
+# ---------------------------------------------------------
+# Se revisa data/ por mtime cada pocos segundos. Si un archivo cambió, el
+# Catálogo nuevo (CSV + índices) se construye en un hilo aparte y luego se
+# reemplaza la referencia de un solo golpe. Cada petición toma el catálogo
+# al entrar, así que las que están en curso terminan con el anterior.
+# Si existe data/catalogo.snap y corresponde a los archivos actuales, se
+# carga de ahí (ver modules/snapshot.py) en lugar de parsear los CSV.
+import asyncio
+import json
+import os
+import time
+
+from modules.catalogo import Catalogo
+from modules.funciones import invalidar_cache_render, leer_csv, leer_texto
+from modules.sinonimos import cargar_detector
+from modules.snapshot import Snapshot, escribir_snapshot
+
+ARCHIVOS_CATALOGO = {
+    "general": "general.csv",
+    "carreras": "carreras.csv",
+    "materias": "materias.csv",
+    "informe": "informe_institucional.txt",
+}
+
+# Opcionales: si faltan se usan los valores por defecto
+#   campus.json: {"institucion": "ITSCH"}
+ARCHIVOS_OPCIONALES = {
+    "sinonimos": "sinonimos.json",
+    "campus": "campus.json",
+}
+
+ARCHIVO_SNAPSHOT = "catalogo.snap"
+
+INTERVALO_RECARGA = float(os.getenv("AULABOT_RECARGA_INTERVALO", "2.0"))
+USAR_SNAPSHOT = os.getenv("AULABOT_SNAPSHOT", "1") != "0"
+
+
+def firma_archivos(directorio):
+    """(mtime_ns, tamaño) de cada archivo del catálogo; None si falta alguno obligatorio."""
+    firma = []
+    for archivo in ARCHIVOS_CATALOGO.values():
+        try:
+            st = os.stat(os.path.join(directorio, archivo))
+        except FileNotFoundError:
+            return None
+        firma.append((st.st_mtime_ns, st.st_size))
+    for archivo in ARCHIVOS_OPCIONALES.values():
+        try:
+            st = os.stat(os.path.join(directorio, archivo))
+            firma.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            firma.append((0, 0))
+    return tuple(firma)
+
+
+def _leer_fuentes(directorio):
+    rutas = {nombre: os.path.join(directorio, archivo) for nombre, archivo in ARCHIVOS_CATALOGO.items()}
+    return (
+        leer_csv(rutas["general"]),
+        leer_csv(rutas["carreras"]),
+        leer_csv(rutas["materias"]),
+        leer_texto(rutas["informe"]),
+    )
+
+
+def _snapshot_vigente(directorio):
+    """El snapshot de `directorio` si existe y coincide con los archivos actuales."""
+    ruta = os.path.join(directorio, ARCHIVO_SNAPSHOT)
+    if not USAR_SNAPSHOT or not os.path.exists(ruta):
+        return None
+    try:
+        snapshot = Snapshot(ruta)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ No se pudo abrir {ruta}: {e}")
+        return None
+    if snapshot.firma != firma_archivos(directorio):
+        print(f"⚠️ {ruta} es anterior a los archivos de data/; se leen los CSV (recompila con python -m modules.snapshot).")
+        return None
+    return snapshot
+
+
+def _leer_campus(directorio):
+    """Datos propios del campus (campus.json); vacío si no existe."""
+    ruta = os.path.join(directorio, ARCHIVOS_OPCIONALES["campus"])
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cargar_catalogo(directorio) -> Catalogo:
+    """Construye un Catálogo completo desde el snapshot o, si no sirve, desde los archivos."""
+    detector = cargar_detector(os.path.join(directorio, ARCHIVOS_OPCIONALES["sinonimos"]))
+    propios = dict(detector=detector, institucion=_leer_campus(directorio).get("institucion"), directorio=directorio)
+    snapshot = _snapshot_vigente(directorio)
+    if snapshot is not None:
+        return Catalogo(
+            snapshot.filas("general"),
+            snapshot.filas("carreras"),
+            snapshot.filas("materias"),
+            indice=snapshot.indice(),
+            **propios,
+        )
+    return Catalogo(*_leer_fuentes(directorio), **propios)
+
+
+def compilar_snapshot(directorio) -> str:
+    """Paso de build: escribe data/catalogo.snap a partir de los archivos actuales."""
+    firma = firma_archivos(directorio)
+    if firma is None:
+        raise FileNotFoundError(f"Faltan archivos del catálogo en {directorio}")
+    general, carreras, materias, informe = _leer_fuentes(directorio)
+    catalogo = Catalogo(general, carreras, materias, informe)  # sin directorio: solo se usa su índice
+    ruta = os.path.join(directorio, ARCHIVO_SNAPSHOT)
+    escribir_snapshot(
+        ruta,
+        {"general": general, "carreras": carreras, "materias": materias},
+        informe, catalogo.indice, firma,
+    )
+    return ruta
+
+
+class VigilanteCatalogo:
+    """
+    Mantiene el catálogo vigente y lo reemplaza cuando cambian los archivos.
+    `actual` siempre apunta a un Catálogo completo (nunca a uno a medio construir).
+    """
+
+    def __init__(self, directorio, intervalo=INTERVALO_RECARGA):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self.recargas = 0
+        self.errores = 0
+        self.ultimo_error = None
+        self._pendiente = None
+        self._firma = firma_archivos(directorio)
+        inicio = time.perf_counter()
+        self._instalar(cargar_catalogo(directorio), inicio)
+
+    def _instalar(self, catalogo, inicio):
+        self.actual = catalogo
+        self.cargado_en = time.time()
+        self.duracion_carga = time.perf_counter() - inicio
+
+    async def revisar(self) -> bool:
+        """Recarga si algo cambió. Devuelve True si se instaló un catálogo nuevo."""
+        firma = firma_archivos(self.directorio)
+        if firma is None or firma == self._firma:
+            self._pendiente = None
+            return False
+        # Esperar una revisión más con la misma firma: el archivo pudo estar a medio escribir
+        if firma != self._pendiente:
+            self._pendiente = firma
+            return False
+        return await self.recargar(firma)
+
+    async def recargar(self, firma=None) -> bool:
+        inicio = time.perf_counter()
+        try:
+            nuevo = await asyncio.to_thread(cargar_catalogo, self.directorio)
+        except Exception as e:
+            # Un CSV roto no tumba el servidor: se sigue con el catálogo anterior
+            self.errores += 1
+            self.ultimo_error = str(e)
+            print(f"⚠️ No se pudo recargar el catálogo: {e}")
+            return False
+        self._firma = firma or firma_archivos(self.directorio)
+        self._pendiente = None
+        version_vieja = self.actual.version
+        self._instalar(nuevo, inicio)
+        self.recargas += 1
+        # Los textos renderizados llevan la versión en la llave; soltar solo los
+        # de este catálogo (otros campus comparten la caché)
+        invalidar_cache_render(version_vieja)
+        print(f"🔄 Catálogo recargado (versión {nuevo.version}).")
+        return True
+
+    async def vigilar(self):
+        """Bucle de revisión (se lanza como tarea en el arranque de la app)."""
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.revisar()
+            except Exception as e:
+                print(f"⚠️ Error revisando data/: {e}")
+
+    def estado(self):
+        return {
+            "version": self.actual.version,
+            "cargado_en": self.cargado_en,
+            "duracion_carga_s": round(self.duracion_carga, 4),
+            "recargas": self.recargas,
+            "errores": self.errores,
+            "ultimo_error": self.ultimo_error,
+            "intervalo_s": self.intervalo,
+        }
@@ -0,0 +1,125 @@
+# ---------------------------------------------------------
+# Recuperación local (BM25) sobre el informe institucional y general.csv
+# ---------------------------------------------------------
+# El texto se parte en pasajes de ~80 palabras y se construye un índice
+# invertido compacto: las listas de aparición viven en arreglos planos
+# (array) en lugar de miles de listas/dicts de Python.
+import heapq
+import math
+import re
+from array import array
+from collections import Counter, namedtuple
+
+from modules.normalizacion import quitar_acentos
+
+Pasaje = namedtuple("Pasaje", ["score", "texto", "fuente"])
+
+# Por debajo de este puntaje BM25 los pasajes suelen ser ruido
+UMBRAL_RECUPERACION = 5.0
+
+_PALABRA = re.compile(r"\w+")
+# El informe viene de un PDF con palabras pegadas ("ProcesosPara", "Filosofía2.1")
+_PEGADAS = re.compile(r"(?<=[a-záéíóúñ0-9.])(?=[A-ZÁÉÍÓÚÑ])|(?<=[a-záéíóúñ])(?=[0-9])")
+
+STOPWORDS = frozenset("""
+a al ante bajo con contra de del desde durante e el en entre es esta este esto hacia hasta la las le les lo los
+mas me mi mis muy no o os para pero por que se si sin sobre su sus te tu tus un una unas uno unos y ya yo
+cual cuales cuando como donde quien quienes cuanto cuanta cuantos cuantas hay son ser fue han ha tiene tienen
+""".split())
+
+
+def tokenizar(texto: str):
+    """Minúsculas, sin acentos, sin stopwords y con un plural muy simple (-s)."""
+    tokens = []
+    for t in _PALABRA.findall(quitar_acentos(texto.lower())):
+        if len(t) > 4 and t.endswith("s"):
+            t = t[:-1]
+        if len(t) < 2 or t in STOPWORDS:
+            continue
+        tokens.append(t)
+    return tokens
+
+
+def partir_en_pasajes(texto: str, palabras=80, traslape=20):
+    """Ventanas de `palabras` palabras con `traslape` palabras compartidas."""
+    todas = _PEGADAS.sub(" ", texto).split()
+    if not todas:
+        return []
+    paso = max(1, palabras - traslape)
+    return [" ".join(todas[i:i + palabras]) for i in range(0, max(1, len(todas) - traslape), paso)]
+
+
+class IndiceBM25:
+    """Índice invertido BM25 de solo lectura."""
+
+    def __init__(self, pasajes, k1=1.5, b=0.75):
+        """`pasajes`: lista de (texto, fuente, claves); las claves solo se indexan."""
+        self.k1 = k1
+        self.b = b
+        self.textos = [t for t, _, _ in pasajes]
+        self.fuentes = [f for _, f, _ in pasajes]
+
+        apariciones = {}  # término -> [(doc, tf), ...] (solo durante la construcción)
+        self.longitudes = array("I")
+        for doc, (texto, _, claves) in enumerate(pasajes):
+            conteo = Counter(tokenizar(f"{claves} {texto}"))
+            self.longitudes.append(sum(conteo.values()))
+            for termino, tf in conteo.items():
+                apariciones.setdefault(termino, []).append((doc, tf))
+
+        n = len(self.textos)
+        self.promedio = (sum(self.longitudes) / n) if n else 0.0
+        self.vocabulario = {}
+        self.inicio = array("I", [0])
+        self.docs = array("I")
+        self.tfs = array("H")
+        self.idf = array("f")
+        for termino, lista in apariciones.items():
+            self.vocabulario[termino] = len(self.idf)
+            df = len(lista)
+            self.idf.append(math.log(1 + (n - df + 0.5) / (df + 0.5)))
+            for doc, tf in lista:
+                self.docs.append(doc)
+                self.tfs.append(min(tf, 65535))
+            self.inicio.append(len(self.docs))
+
+    @classmethod
+    def desde_arreglos(cls, textos, fuentes, vocabulario, inicio, docs, tfs, idf, longitudes, promedio, k1=1.5, b=0.75):
+        """
+        Índice ya construido (ej. leído de un snapshot): los arreglos pueden ser
+        array o memoryview sobre un mmap, solo se indexan.
+        """
+        indice = cls.__new__(cls)
+        indice.k1, indice.b = k1, b
+        indice.textos, indice.fuentes = textos, fuentes
+        indice.vocabulario = vocabulario
+        indice.inicio, indice.docs, indice.tfs = inicio, docs, tfs
+        indice.idf, indice.longitudes = idf, longitudes
+        indice.promedio = promedio
+        return indice
+
+    def __len__(self):
+        return len(self.textos)
+
+    def buscar(self, consulta: str, k=3):
+        """Los k pasajes con mayor puntaje BM25 (puede devolver menos)."""
+        puntajes = {}
+        k1, b, promedio = self.k1, self.b, self.promedio or 1.0
+        for termino in set(tokenizar(consulta)):
+            t = self.vocabulario.get(termino)
+            if t is None:
+                continue
+            idf = self.idf[t]
+            for i in range(self.inicio[t], self.inicio[t + 1]):
+                doc, tf = self.docs[i], self.tfs[i]
+                norma = k1 * (1 - b + b * self.longitudes[doc] / promedio)
+                puntajes[doc] = puntajes.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norma)
+        mejores = heapq.nlargest(k, puntajes.items(), key=lambda x: x[1])
+        return [Pasaje(score, self.textos[doc], self.fuentes[doc]) for doc, score in mejores]
+
+
+def construir_indice(general, informe=""):
+    """Pasajes de general.csv (una fila = un pasaje) + el informe partido en ventanas."""
+    pasajes = [(fila['respuesta'], "general.csv", fila['palabra_clave']) for fila in general]
+    pasajes += [(p, "informe_institucional.txt", "") for p in partir_en_pasajes(informe)]
+    return IndiceBM25(pasajes)
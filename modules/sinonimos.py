@@ -0,0 +1,57 @@
+# ---------------------------------------------------------
+# Sinónimos de carreras e intenciones
+# ---------------------------------------------------------
+# Los de abajo son los del ITSCH y sirven de valor por defecto. Un campus
+# puede poner un sinonimos.json junto a sus CSV:
+#   {"carreras": {"Nombre oficial": ["sinonimo", ...]}, "intenciones": {...}}
+# Lo que no defina se toma de aquí. Los catálogos sin sinonimos.json
+# comparten un solo detector (y su caché).
+import json
+import os
+from functools import lru_cache
+
+from modules.coincidencias import DetectorCoincidencias
+
+SINONIMOS_CARRERAS = {
+    "Ingeniería en Sistemas Computacionales": ["sistemas", "systemas", "programacion", "computacion", "desarrollo", "software", "codigo", "isc"],
+    "Ingeniería en Gestión Empresarial": ["gestion", "empresas", "administracion", "negocios", "ige", "gerencia"],
+    "Ingeniería Industrial": ["industrial", "industria", "procesos", "fabrica", "produccion", "ii"],
+    "Ingeniería Mecatrónica": ["mecatronica", "meca", "robotica", "automatizacion", "im"],
+    "Ingeniería Bioquímica": ["bioquimica", "biologia", "alimentos", "ibq"],
+    "Ingeniería en Nanotecnología": ["nanotecnologia", "nano", "materiales", "ina"],
+    "Ingeniería en Innovación Agrícola Sustentable": ["agricola", "agronomia", "campo", "cultivos", "iias"],
+    "Ingeniería en Tecnologías de la Información y Comunicaciones": ["tics", "tic", "redes", "telecom", "itic"],
+    "Ingeniería en Animación Digital y Efectos Visuales": ["animacion", "digital", "3d", "visuales", "iadev"],
+    "Ingeniería en Sistemas Automotrices": ["automotriz", "autos", "coches", "mecanica automotriz", "isau"]
+}
+
+INTENCIONES = {
+    "materias": ["materias", "materia", "clases", "asignaturas", "reticula", "plan", "curricula"],
+    "carreras_lista": ["carreras", "programas academicos", "que carreras tienen", "cuales son las carreras"],
+    "jefes": ["jefe de carrera", "jefe de division", "quien es el jefe"], 
+    "costos": ["cuanto cuesta", "precio", "costo", "pagar", "inscripcion", "mensualidad", "dinero", "ficha", "pago"],
+    "ubicacion": ["donde estan", "ubicacion", "mapa", "direccion", "llegar", "localizacion", "domicilio"],
+    "saludo": ["hola", "buenos dias", "buenas", "que tal", "hey", "hi", "inicio", "comenzar"],
+    "directorio": ["director", "jefe", "coordinador", "quien es", "encargado", "subdirector"],
+    "tramites": ["admision", "propedeutico", "examen", "becas", "servicio social", "residencias", "titulacion", "fechas", "convocatoria"],
+    "ayuda": ["que sabes hacer", "que puedes hacer", "ayuda", "instrucciones", "para que sirves", "menu", "opciones", "temas"],
+    # AQUÍ AGREGUÉ 'NORMATIVAS' y 'REGLAMENTO' 👇
+    "institucional": ["mision", "vision", "objetivos", "historia", "fundacion", "normativas", "reglamento", "normas", "reglas"],
+    "vida_estudiantil": ["deportes", "futbol", "cafeteria", "ingles", "centro de idiomas", "psicologia"],
+    "afirmacion": ["si", "claro", "por favor", "yes", "simon", "ok", "va", "me parece"],
+    "negacion": ["no", "nel", "asi dejalo", "gracias"]
+}
+
+
+@lru_cache(maxsize=1)
+def detector_por_defecto() -> DetectorCoincidencias:
+    return DetectorCoincidencias(INTENCIONES, SINONIMOS_CARRERAS)
+
+
+def cargar_detector(ruta_json) -> DetectorCoincidencias:
+    """Detector para los sinónimos de `ruta_json`; el compartido si el archivo no existe."""
+    if not os.path.exists(ruta_json):
+        return detector_por_defecto()
+    with open(ruta_json, encoding="utf-8") as f:
+        datos = json.load(f)
+    return DetectorCoincidencias(datos.get("intenciones") or INTENCIONES, datos.get("carreras") or SINONIMOS_CARRERAS)
@@ -0,0 +1,227 @@
+# ---------------------------------------------------------
+# Snapshot binario del catálogo (arranque rápido de workers)
+# ---------------------------------------------------------
+# `python -m modules.snapshot [data/]` compila los CSV, el informe y el índice
+# BM25 a data/catalogo.snap. Cada texto distinto se guarda una sola vez (tabla
+# de cadenas) y las filas son arreglos de índices a esa tabla. Los workers
+# abren el archivo con mmap de solo lectura: el sistema operativo comparte
+# esas páginas entre procesos, los arreglos del índice se usan sin copiarlos
+# y no hay que volver a tokenizar el informe al arrancar.
+#
+# Formato: MAGIA | u32 largo | cabecera JSON | secciones alineadas a 8 bytes.
+import json
+import mmap
+import os
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+
+from modules.recuperacion import IndiceBM25
+
+MAGIA = b"AULASNP1"
+FORMATO = 1
+NULO = 0xFFFFFFFF  # celda vacía (DictReader da None si faltan columnas)
+_ALINEACION = 8
+
+
+def _alinear(n):
+    return (n + _ALINEACION - 1) // _ALINEACION * _ALINEACION
+
+
+# -----------------------------
+# Escritura
+# -----------------------------
+class _TablaCadenas:
+    """Asigna un id a cada texto distinto (los repetidos se guardan una vez)."""
+
+    def __init__(self):
+        self.ids = {}
+        self.cadenas = []
+
+    def id(self, texto):
+        if texto is None:
+            return NULO
+        i = self.ids.get(texto)
+        if i is None:
+            i = self.ids[texto] = len(self.cadenas)
+            self.cadenas.append(texto)
+        return i
+
+
+def escribir_snapshot(ruta, tablas, informe, indice, firma):
+    """
+    `tablas`: {"general": filas, ...} tal como las entrega leer_csv().
+    `indice`: IndiceBM25 ya construido. `firma`: de los archivos fuente,
+    para detectar al abrir si el snapshot quedó viejo.
+    """
+    cadenas = _TablaCadenas()
+    secciones = {}
+    meta_tablas = {}
+    for nombre, filas in tablas.items():
+        columnas = [c for c in (filas[0].keys() if filas else []) if c is not None]
+        ids = array("I")
+        for fila in filas:
+            ids.extend(cadenas.id(fila.get(c)) for c in columnas)
+        secciones[f"tabla_{nombre}"] = ids
+        meta_tablas[nombre] = {"columnas": columnas, "filas": len(filas)}
+
+    terminos = sorted(indice.vocabulario, key=indice.vocabulario.get)
+    secciones["bm25_terminos"] = array("I", (cadenas.id(t) for t in terminos))
+    secciones["bm25_textos"] = array("I", (cadenas.id(t) for t in indice.textos))
+    secciones["bm25_fuentes"] = array("I", (cadenas.id(f) for f in indice.fuentes))
+    secciones["bm25_inicio"] = array("I", indice.inicio)
+    secciones["bm25_docs"] = array("I", indice.docs)
+    secciones["bm25_tfs"] = array("H", indice.tfs)
+    secciones["bm25_idf"] = array("f", indice.idf)
+    secciones["bm25_longitudes"] = array("I", indice.longitudes)
+    id_informe = cadenas.id(informe or "")
+
+    codificadas = [c.encode("utf-8") for c in cadenas.cadenas]
+    limites = array("Q", [0])
+    for c in codificadas:
+        limites.append(limites[-1] + len(c))
+    secciones["limites"] = limites
+    secciones["cadenas"] = array("B", b"".join(codificadas))
+
+    indice_secciones, desplazamiento = {}, 0
+    for nombre, datos in secciones.items():
+        largo = len(datos) * datos.itemsize
+        indice_secciones[nombre] = [desplazamiento, largo, datos.typecode]
+        desplazamiento = _alinear(desplazamiento + largo)
+
+    cabecera = json.dumps({
+        "formato": FORMATO,
+        "orden": sys.byteorder,
+        "firma": firma,
+        "tablas": meta_tablas,
+        "informe": id_informe,
+        "bm25": {"k1": indice.k1, "b": indice.b, "promedio": indice.promedio},
+        "secciones": indice_secciones,
+    }).encode("utf-8")
+
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIA)
+        f.write(len(cabecera).to_bytes(4, "little"))
+        f.write(cabecera)
+        f.write(b"\0" * (_alinear(f.tell()) - f.tell()))
+        base = f.tell()
+        for nombre, datos in secciones.items():
+            f.write(b"\0" * (base + indice_secciones[nombre][0] - f.tell()))
+            datos.tofile(f)
+    # Los workers que ya tienen mapeado el archivo anterior lo siguen viendo intacto
+    os.replace(tmp, ruta)
+
+
+# -----------------------------
+# Lectura (mmap)
+# -----------------------------
+class FilaSnapshot(Mapping):
+    """Fila de una tabla del snapshot; se lee como el dict de DictReader."""
+
+    __slots__ = ("_tabla", "_inicio")
+
+    def __init__(self, tabla, i):
+        self._tabla = tabla
+        self._inicio = i * len(tabla.columnas)
+
+    def __getitem__(self, columna):
+        tabla = self._tabla
+        valor = tabla.ids[self._inicio + tabla.posiciones[columna]]
+        return None if valor == NULO else tabla.snapshot.cadena(valor)
+
+    def __iter__(self):
+        return iter(self._tabla.columnas)
+
+    def __len__(self):
+        return len(self._tabla.columnas)
+
+    def __repr__(self):
+        return f"FilaSnapshot({dict(self)})"
+
+
+class _Tabla:
+    def __init__(self, snapshot, columnas, ids):
+        self.snapshot = snapshot
+        self.columnas = columnas
+        self.posiciones = {c: j for j, c in enumerate(columnas)}
+        self.ids = ids
+
+
+class _ListaCadenas(Sequence):
+    """Lista de textos decodificados al primer acceso."""
+
+    def __init__(self, snapshot, ids):
+        self._snapshot = snapshot
+        self._ids = ids
+
+    def __getitem__(self, i):
+        return self._snapshot.cadena(self._ids[i])
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class Snapshot:
+    """Snapshot abierto en modo lectura. Lanza ValueError si no es compatible."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        vista = memoryview(self._mmap)
+        if bytes(vista[:len(MAGIA)]) != MAGIA:
+            raise ValueError(f"{ruta} no es un snapshot de AulaBot")
+        largo = int.from_bytes(vista[len(MAGIA):len(MAGIA) + 4], "little")
+        inicio = len(MAGIA) + 4
+        self.cabecera = json.loads(bytes(vista[inicio:inicio + largo]))
+        if self.cabecera["formato"] != FORMATO or self.cabecera["orden"] != sys.byteorder:
+            raise ValueError(f"{ruta}: formato u orden de bytes incompatible")
+
+        base = _alinear(inicio + largo)
+        self._secciones = {
+            nombre: vista[base + desde:base + desde + tam].cast(tipo)
+            for nombre, (desde, tam, tipo) in self.cabecera["secciones"].items()
+        }
+        self._limites = self._secciones["limites"]
+        self._bytes = self._secciones["cadenas"]
+        self._decodificadas = [None] * (len(self._limites) - 1)
+
+    @property
+    def firma(self):
+        return tuple(tuple(par) for par in self.cabecera["firma"])
+
+    def cadena(self, i) -> str:
+        texto = self._decodificadas[i]
+        if texto is None:
+            texto = sys.intern(str(self._bytes[self._limites[i]:self._limites[i + 1]], "utf-8"))
+            self._decodificadas[i] = texto
+        return texto
+
+    def filas(self, nombre):
+        meta = self.cabecera["tablas"][nombre]
+        tabla = _Tabla(self, meta["columnas"], self._secciones[f"tabla_{nombre}"])
+        return [FilaSnapshot(tabla, i) for i in range(meta["filas"])]
+
+    @property
+    def informe(self) -> str:
+        return self.cadena(self.cabecera["informe"])
+
+    def indice(self) -> IndiceBM25:
+        s = self._secciones
+        parametros = self.cabecera["bm25"]
+        vocabulario = {self.cadena(t): i for i, t in enumerate(s["bm25_terminos"])}
+        return IndiceBM25.desde_arreglos(
+            _ListaCadenas(self, s["bm25_textos"]), _ListaCadenas(self, s["bm25_fuentes"]), vocabulario,
+            s["bm25_inicio"], s["bm25_docs"], s["bm25_tfs"], s["bm25_idf"], s["bm25_longitudes"],
+            parametros["promedio"], parametros["k1"], parametros["b"],
+        )
+
+
+if __name__ == "__main__":
+    from modules.recarga import compilar_snapshot
+
+    directorio = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    ruta = compilar_snapshot(directorio)
+    print(f"✅ Snapshot escrito en {ruta} ({os.path.getsize(ruta)} bytes).")